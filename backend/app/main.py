@@ -1,14 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from .routes import tax_routes, file_routes
+from .utils.compression import CompressionMiddleware
+from .utils.database import async_engine
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks for shared resources"""
+    # Off the event loop: a cold tiktoken cache downloads the encoding
+    await tax_routes.chatgpt_service.evidence_builder.aload_encoding()
+    await tax_routes.job_queue.start()
+    yield
+    # End open event streams
+    file_routes.document_service.events.close()
+    await tax_routes.job_queue.stop()
+    await file_routes.classifier.aclose()
+    await tax_routes.model_registry.aclose()
+    # Release pooled outbound connections
+    await tax_routes.azure_service.aclose()
+    await tax_routes.chatgpt_service.aclose()
+    await async_engine.dispose()
+
+# Low-confidence auto-classification falls back to Azure's read model
+file_routes.classifier.azure_service = tax_routes.azure_service
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Document Analyzer API",
     description="Azure Document Intelligence + ChatGPT verification for tax documents",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -18,8 +42,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# gzip/brotli for large JSON responses
+app.add_middleware(CompressionMiddleware)
+
 # Setup templates
 templates = Jinja2Templates(directory="app/templates")
 
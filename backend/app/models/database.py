@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, BigInteger, Text, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, String, DateTime, BigInteger, Integer, Text, Boolean, ForeignKey, JSON, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -11,6 +11,8 @@ class User(Base):
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     email = Column(String, unique=True, nullable=True)  # Optional for Phase 1
+    # Bumped with every change to the user's documents; the listing ETag
+    documents_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class DocumentCategory(Base):
@@ -32,15 +34,38 @@ class Document(Base):
     file_path = Column(String, nullable=False)  # Path to actual file
     file_size = Column(BigInteger, nullable=True)
     mime_type = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True)  # SHA-256 of the file content
+    blob_hash = Column(String(64), nullable=True)  # Blob backing file_path in content-addressed storage
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
     status = Column(String, default="uploaded")  # 'uploaded', 'processing', 'completed', 'failed'
     status_message = Column(String, nullable=True, default="Uploaded")
+    # Background analysis: the worker holding the job, when its lease was
+    # last renewed, and how many times the job has been started
+    job_claimed_by = Column(String, nullable=True)
+    job_claimed_at = Column(DateTime(timezone=True), nullable=True)
+    job_attempts = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relationships
     user = relationship("User", backref="documents")
     category = relationship("DocumentCategory", backref="documents")
+    
+    __table_args__ = (
+        Index("ix_documents_user_id_created_at", "user_id", "created_at"),
+        Index("ix_documents_user_id_category_id", "user_id", "category_id"),
+        Index("ix_documents_blob_hash", "blob_hash"),
+        Index("ix_documents_status", "status"),
+    )
+
+class Blob(Base):
+    __tablename__ = "blobs"
+    
+    hash = Column(String(64), primary_key=True)  # SHA-256 of the content
+    path = Column(String, nullable=False)  # Location in the content-addressed store
+    size = Column(BigInteger, nullable=True)
+    refcount = Column(Integer, nullable=False, default=0)  # Documents linked to this blob
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class DocumentStatusHistory(Base):
     __tablename__ = "document_status_history"
@@ -48,8 +73,21 @@ class DocumentStatusHistory(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     document_id = Column(String, ForeignKey("documents.id"), nullable=False)
     status = Column(String, nullable=False)
-    details = Column(JSON, nullable=True)  # Analysis results, error messages, etc.
+    details = Column(JSON, nullable=True)  # Error messages, verdicts; a summary when payload_size is set
+    payload_size = Column(Integer, nullable=True)  # Bytes of full details in document_status_payloads
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationship
-    document = relationship("Document", backref="status_history") 
\ No newline at end of file
+    document = relationship("Document", backref="status_history")
+    
+    __table_args__ = (
+        Index("ix_document_status_history_document_id_created_at", "document_id", "created_at"),
+    )
+
+class DocumentStatusPayload(Base):
+    __tablename__ = "document_status_payloads"
+    
+    # Full details of a history entry (e.g. analysis results), compressed
+    history_id = Column(String, ForeignKey("document_status_history.id"), primary_key=True)
+    codec = Column(String, nullable=False)  # 'zstd' or 'zlib'
+    data = Column(LargeBinary, nullable=False) 
\ No newline at end of file
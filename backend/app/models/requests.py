@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
+from ..utils.config import Config
+
+class BulkDeleteRequest(BaseModel):
+    document_ids: Optional[List[str]] = Field(default=None, min_length=1, max_length=1000)
+    user_id: Optional[str] = None
+    category_id: Optional[str] = None
+    
+    @model_validator(mode="after")
+    def check_selector(self):
+        if (self.document_ids is None) == (self.user_id is None):
+            raise ValueError("Provide either document_ids or user_id")
+        if self.category_id is not None and self.user_id is None:
+            raise ValueError("category_id requires user_id")
+        return self
+
+class VerifyBatchRequest(BaseModel):
+    contents: Optional[List[str]] = Field(default=None, min_length=1, max_length=Config.VERIFY_BATCH_MAX_ITEMS)
+    document_ids: Optional[List[str]] = Field(default=None, min_length=1, max_length=Config.VERIFY_BATCH_MAX_ITEMS)
+    timeout: Optional[float] = Field(default=None, ge=1, le=Config.VERIFY_BATCH_MAX_TIMEOUT)
+    
+    @model_validator(mode="after")
+    def check_selector(self):
+        if (self.contents is None) == (self.document_ids is None):
+            raise ValueError("Provide either contents or document_ids")
+        return self
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from datetime import datetime
 
 class ValidationResult(BaseModel):
@@ -22,6 +22,34 @@ class ModelsResponse(BaseModel):
 class UploadResponse(BaseModel):
     message: str
     filename: str
+    category_id: Optional[str] = None
+    confidence: Optional[float] = None
+    # The category may still change once the file has been read remotely
+    classification_pending: bool = False
+
+class BatchUploadItem(BaseModel):
+    original_filename: str
+    category_id: str
+    success: bool
+    document_id: Optional[str] = None
+    filename: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchUploadResponse(BaseModel):
+    message: str
+    uploaded: int
+    failed: int
+    results: List[BatchUploadItem]
+
+class FileRemovalFailure(BaseModel):
+    file_path: str
+    error: str
+
+class BulkDeleteResponse(BaseModel):
+    message: str
+    deleted: int
+    files_removed: int
+    failures: List[FileRemovalFailure]
 
 class DocumentResponse(BaseModel):
     id: str
@@ -35,4 +63,31 @@ class DocumentResponse(BaseModel):
     status: str
     status_message: Optional[str] = None
     created_at: datetime
-    updated_at: Optional[datetime] = None 
\ No newline at end of file
+    updated_at: Optional[datetime] = None 
+
+class JobResponse(BaseModel):
+    document_id: str
+    status: str
+    status_message: Optional[str] = None
+    status_url: str
+
+class StatusHistoryEntry(BaseModel):
+    status: str
+    details: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+
+class JobStatusResponse(BaseModel):
+    document_id: str
+    status: str
+    status_message: Optional[str] = None
+    history: List[StatusHistoryEntry]
+    validation: Optional[ValidationResult] = None
+    analysis: Optional[Dict[str, Any]] = None
+
+class BatchVerificationItem(BaseModel):
+    """One NDJSON line of POST /tax/verify/batch"""
+    index: int
+    document_id: Optional[str] = None
+    validation: Optional[ValidationResult] = None
+    error: Optional[str] = None
+    elapsed_ms: Optional[float] = None
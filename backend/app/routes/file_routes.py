@@ -1,19 +1,48 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Form
-from typing import List
+import asyncio
+import json
+import os
+import time
+from fastapi import APIRouter, File, UploadFile, HTTPException, Form, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ..services.classifier_service import DocumentClassifier
 from ..services.file_service import FileService
-from ..services.document_service import DocumentService
-from ..models.responses import UploadResponse, DocumentResponse
+from ..services.document_service import AsyncDocumentService
+from ..models.requests import BulkDeleteRequest
+from ..models.responses import UploadResponse, DocumentResponse, BatchUploadItem, BatchUploadResponse, BulkDeleteResponse
+from ..utils.config import Config
+from ..utils.database import get_async_db
+from ..utils.responses import ZeroCopyFileResponse, etag_matches
 
 router = APIRouter(prefix="/files", tags=["files"])
 
 # Initialize services
 file_service = FileService()
-document_service = DocumentService()
+document_service = AsyncDocumentService()
+# main.py attaches the Azure service for the low-confidence fallback
+classifier = DocumentClassifier()
+
+async def store_document(user_id: str, category_id: str, file: UploadFile, db: AsyncSession):
+    """Stream an upload to disk and record it, removing the file if the insert fails"""
+    stored_file = await file_service.store_upload(
+        file, file_service.upload_directory(user_id, category_id)
+    )
+    async with file_service.interned([stored_file]) as (stored_file,):
+        try:
+            return await document_service.create_document(
+                user_id, category_id, file.filename, stored_file, session=db
+            )
+        except Exception:
+            await run_in_threadpool(file_service.discard_upload, stored_file)
+            raise
 
 @router.post('/upload', response_model=UploadResponse)
 async def upload_file_auto_classify(
     file: UploadFile = File(...),
-    user_id: str = Form(default="default")
+    user_id: str = Form(default="default"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Auto-classify File Upload API
@@ -26,26 +55,128 @@ async def upload_file_auto_classify(
     Returns:
     - **message**: Success message
     - **filename**: Name of uploaded file
+    - **category_id**: The category the file was classified into
+    - **confidence**: Classifier confidence between 0 and 1
+    - **classification_pending**: The local result was not confident, so the
+      PDF's first pages are being read with Azure in the background; a
+      "category" event on GET /files/documents/{user_id}/events reports a change
     """
     try:
-        # Basic file validation
+        # Basic file validation (size is checked before parsing the content)
         file_service.validate_file_type(file)
         file_service.validate_file_size(file)
         
-        # For now, hardcode category as "balance-sheet"
-        # TODO: Replace with actual classification logic
-        category_id = "balance-sheet"
+        classification = await classifier.classify_upload(file)
+        category_id = classification.category_id or Config.CLASSIFIER_DEFAULT_CATEGORY
         
         # Store file and metadata in database
-        document = document_service.create_document(
-            user_id=user_id,
-            category_id=category_id,
-            file=file
-        )
+        document = await store_document(user_id, category_id, file, db)
+        
+        pending = classifier.needs_remote(classification, file.filename)
+        if pending:
+            classifier.reclassify_in_background(
+                document.id, document.file_path, file.filename, classification, document_service
+            )
         
         return UploadResponse(
             message="File uploaded and classified",
-            filename=document.filename
+            filename=document.filename,
+            category_id=category_id,
+            confidence=classification.confidence,
+            classification_pending=pending
+        )
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.post('/upload/batch', response_model=BatchUploadResponse)
+async def upload_files_batch(
+    files: List[UploadFile] = File(...),
+    category_ids: List[str] = Form(default=[]),
+    category_id: str = Form(default="balance-sheet"),
+    user_id: str = Form(default="default"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Batch File Upload API
+    
+    Upload several files in one request. Files are streamed to disk
+    concurrently and recorded in a single transaction.
+    
+    - **files**: The files to upload (required, repeat the field per file)
+    - **category_ids**: Category per file, in the same order as files (optional; blank or missing entries use category_id)
+    - **category_id**: Default category (optional, defaults to "balance-sheet")
+    - **user_id**: The user ID (optional, defaults to "default")
+    
+    Returns:
+    - **uploaded** / **failed**: Number of files stored / rejected
+    - **results**: Per-file outcome with document_id or error
+    """
+    try:
+        if len(files) > Config.BATCH_UPLOAD_MAX_FILES:
+            raise ValueError(f"Too many files ({len(files)}). Maximum per batch is {Config.BATCH_UPLOAD_MAX_FILES}")
+        if len(category_ids) > len(files):
+            raise ValueError("More category_ids than files")
+        
+        categories = [c or category_id for c in category_ids]
+        categories += [category_id] * (len(files) - len(categories))
+        existing_categories = await document_service.get_existing_category_ids(categories, session=db)
+        semaphore = asyncio.Semaphore(Config.BATCH_UPLOAD_CONCURRENCY)
+        
+        async def store(file: UploadFile, file_category: str):
+            if file_category not in existing_categories:
+                raise ValueError(f"Invalid category_id: '{file_category}'. Category does not exist.")
+            file_service.validate_file_type(file)
+            async with semaphore:
+                return await file_service.store_upload(
+                    file, file_service.upload_directory(user_id, file_category)
+                )
+        
+        outcomes = await asyncio.gather(
+            *(store(file, file_category) for file, file_category in zip(files, categories)),
+            return_exceptions=True
+        )
+        
+        results = []
+        stored = []
+        for file, file_category, outcome in zip(files, categories, outcomes):
+            item = BatchUploadItem(original_filename=file.filename or "", category_id=file_category, success=False)
+            if isinstance(outcome, ValueError):
+                item.error = str(outcome)
+            elif isinstance(outcome, BaseException):
+                item.error = f"Unexpected error: {str(outcome)}"
+            else:
+                stored.append((item, outcome))
+            results.append(item)
+        
+        if stored:
+            async with file_service.interned([stored_file for _, stored_file in stored]) as stored_files:
+                try:
+                    documents = await document_service.create_documents(
+                        user_id,
+                        [
+                            (item.category_id, item.original_filename, stored_file)
+                            for (item, _), stored_file in zip(stored, stored_files)
+                        ],
+                        session=db
+                    )
+                except Exception:
+                    for stored_file in stored_files:
+                        await run_in_threadpool(file_service.discard_upload, stored_file)
+                    raise
+            
+            for (item, _), document in zip(stored, documents):
+                item.success = True
+                item.document_id = document.id
+                item.filename = document.filename
+        
+        return BatchUploadResponse(
+            message=f"Uploaded {len(stored)} of {len(files)} files",
+            uploaded=len(stored),
+            failed=len(files) - len(stored),
+            results=results
         )
         
     except ValueError as e:
@@ -57,7 +188,8 @@ async def upload_file_auto_classify(
 async def upload_file_with_category(
     category_id: str,
     file: UploadFile = File(...),
-    user_id: str = Form(default="default")
+    user_id: str = Form(default="default"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Pre-classified File Upload API
@@ -71,29 +203,28 @@ async def upload_file_with_category(
     Returns:
     - **message**: Success message
     - **filename**: Name of uploaded file
+    - **category_id**: The category the file was stored under
+    - **confidence**: Always 1, as the category was given
     """
     try:
         # Validate category exists
-        if not document_service.validate_category(category_id):
+        if not await document_service.validate_category(category_id, session=db):
             raise HTTPException(
                 status_code=400, 
                 detail=f"Invalid category_id: '{category_id}'. Category does not exist."
             )
         
-        # Basic file validation
+        # Basic file validation (size is enforced while streaming to disk)
         file_service.validate_file_type(file)
-        file_service.validate_file_size(file)
         
         # Store file and metadata in database
-        document = document_service.create_document(
-            user_id=user_id,
-            category_id=category_id,
-            file=file
-        )
+        document = await store_document(user_id, category_id, file, db)
         
         return UploadResponse(
             message="File uploaded to specified category",
-            filename=document.filename
+            filename=document.filename,
+            category_id=category_id,
+            confidence=1.0
         )
         
     except ValueError as e:
@@ -102,23 +233,146 @@ async def upload_file_with_category(
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 @router.get('/documents/{user_id}', response_model=List[DocumentResponse])
-async def get_user_documents(user_id: str):
+async def get_user_documents(
+    user_id: str,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1, le=Config.DOCUMENTS_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Get all documents for a user
+    Get documents for a user, newest first
+    
+    The weak ETag is the user's documents version, which changes whenever
+    one of their documents is created, deleted or changes status. Pollers
+    that send it back in If-None-Match get 304 Not Modified without the
+    documents being loaded.
     
     - **user_id**: The user ID to retrieve documents for
+    - **limit**: Page size (optional; all documents are returned when omitted)
+    - **cursor**: The X-Next-Cursor value from the previous page (optional)
     
     Returns:
     - List of documents with metadata
+    - **X-Next-Cursor** header when another page is available
     """
     try:
-        documents = document_service.get_user_documents(user_id)
-        return documents
+        version = await document_service.get_documents_version(user_id, session=db)
+        tag = f"documents-{version}" if limit is None and cursor is None else f"documents-{version}-{limit}-{cursor or ''}"
+        headers = {"ETag": f'W/"{tag}"', "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        
+        if limit is None and cursor is None:
+            return await document_service.get_user_documents(user_id, session=db)
+        
+        page = await document_service.get_user_documents_page(
+            user_id, limit or Config.DOCUMENTS_PAGE_MAX_LIMIT, cursor, session=db
+        )
+        if page.next_cursor:
+            response.headers["X-Next-Cursor"] = page.next_cursor
+        return page.documents
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving documents: {str(e)}")
 
+@router.get('/documents/{user_id}/events')
+async def stream_document_events(user_id: str, request: Request):
+    """
+    Stream a User's Document Changes (Server-Sent Events)
+    
+    Replaces polling the document listing: changes are pushed as they are
+    committed. The first event, ready, carries the listing's current ETag;
+    reload the listing if it differs from yours, then apply events. A
+    resync event means events were missed and the listing should be
+    reloaded. Comment lines are sent as heartbeats, and the server ends the
+    stream after EVENTS_MAX_STREAM_SECONDS so EventSource reconnects.
+    
+    - **user_id**: The user whose documents to watch
+    
+    Returns (text/event-stream):
+    - **ready**: documents_version and etag of the listing
+    - **created**: document_id, category_id, original_filename, status, status_message
+    - **status**: document_id, status, status_message and the new history entry
+    - **category**: document_id and its new category_id, after background classification
+    - **deleted**: document_ids
+    - **resync**: Reload the listing
+    """
+    async def stream():
+        # Subscribe before reading the version so no change falls in between
+        async with document_service.events.subscribe(user_id) as queue:
+            version = await document_service.get_documents_version(user_id)
+            ready = {"documents_version": version, "etag": f'W/"documents-{version}"'}
+            yield f"retry: 3000\nevent: ready\ndata: {json.dumps(ready)}\n\n"
+            deadline = time.monotonic() + Config.EVENTS_MAX_STREAM_SECONDS
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    event = await asyncio.wait_for(queue.get(), min(Config.EVENTS_HEARTBEAT_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get('/documents/{document_id}/content')
+async def get_document_content(document_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Download a stored document
+    
+    Supports Range requests so viewers can load parts of large PDFs, and
+    conditional requests: the ETag is the content hash, so a matching
+    If-None-Match is answered with 304 Not Modified.
+    
+    - **document_id**: The document ID to download
+    
+    Returns:
+    - The file content (inline), or the requested byte range
+    """
+    try:
+        document = await document_service.get_document(document_id, session=db)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found.")
+        
+        try:
+            stat_result = await run_in_threadpool(os.stat, document.file_path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Document file not found.")
+        
+        # Content never changes for a document, but clients should revalidate after deletes
+        headers = {"Cache-Control": "private, no-cache"}
+        if document.content_hash:
+            etag = f'"{document.content_hash}"'
+            headers["ETag"] = etag
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=headers)
+        
+        return ZeroCopyFileResponse(
+            document.file_path,
+            stat_result=stat_result,
+            media_type=document.mime_type,
+            filename=document.original_filename,
+            content_disposition_type="inline",
+            headers=headers
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving document content: {str(e)}")
+
 @router.delete('/documents/{document_id}')
-async def delete_document(document_id: str):
+async def delete_document(document_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Delete a document and all associated metadata and file from disk.
     - **document_id**: The document ID to delete
@@ -126,10 +380,42 @@ async def delete_document(document_id: str):
     - **message**: Success or not found
     """
     try:
-        deleted = document_service.delete_document(document_id)
+        deleted = await document_service.delete_document(document_id, session=db)
         if deleted:
             return {"message": "Document deleted successfully."}
         else:
             raise HTTPException(status_code=404, detail="Document not found.")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}")
+
+@router.post('/documents/bulk-delete', response_model=BulkDeleteResponse)
+async def bulk_delete_documents(request: BulkDeleteRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Delete many documents in one request
+    
+    Send either:
+    - **document_ids**: The document IDs to delete
+    - **user_id**: Delete every document of this user, optionally only those in **category_id**
+    
+    Returns:
+    - **deleted**: Number of documents deleted
+    - **files_removed**: Number of files removed from disk
+    - **failures**: Files that could not be removed
+    """
+    try:
+        result = await document_service.delete_documents(
+            document_ids=request.document_ids,
+            user_id=request.user_id,
+            category_id=request.category_id,
+            session=db
+        )
+        return BulkDeleteResponse(
+            message=f"Deleted {result.deleted} documents.",
+            deleted=result.deleted,
+            files_removed=result.files_removed,
+            failures=result.failures
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting documents: {str(e)}")
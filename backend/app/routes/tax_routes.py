@@ -1,80 +1,423 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from ..services.azure_service import AzureDocumentIntelligenceService
+from fastapi import APIRouter, File, UploadFile, HTTPException, Form, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Literal, Optional
+import asyncio
+import math
+import time
+from contextlib import aclosing
+from ..services.azure_service import AsyncAzureDocumentIntelligenceService
 from ..services.chatgpt_service import ChatGPTService
 from ..services.file_service import FileService
-from ..models.responses import AnalysisResponse, ModelsResponse
+from ..services.document_service import AsyncDocumentService
+from ..services.analysis_view import shape_analysis
+from ..services.job_service import AnalysisJobQueue
+from ..services.model_registry import ModelRegistry
+from ..services.packet_service import PacketAnalyzer
+from ..services.rate_limiter import UpstreamUnavailableError, azure_limits, openai_limits
+from ..utils.database import get_async_db
+from ..utils.responses import FastJSONResponse, encode_json, etag_matches
+from .file_routes import store_document
+from ..models.requests import VerifyBatchRequest
+from ..models.responses import (
+    AnalysisResponse, ModelsResponse, JobResponse, JobStatusResponse, StatusHistoryEntry,
+    BatchVerificationItem
+)
 
 router = APIRouter(prefix="/tax", tags=["tax"])
 
 # Initialize services
-azure_service = AzureDocumentIntelligenceService()
+azure_service = AsyncAzureDocumentIntelligenceService()
 chatgpt_service = ChatGPTService()
 file_service = FileService()
+document_service = AsyncDocumentService()
+model_registry = ModelRegistry(azure_service)
+packet_analyzer = PacketAnalyzer(azure_service, registry=model_registry)
+job_queue = AnalysisJobQueue(azure_service, chatgpt_service, document_service, packet_analyzer=packet_analyzer)
 
 @router.post('/analyze', response_model=AnalysisResponse)
-async def analyze_tax_document(file: UploadFile = File(...)):
+async def analyze_tax_document(
+    file: UploadFile = File(...),
+    model_id: Optional[str] = Form(default=None),
+    category_id: Optional[str] = Form(default=None),
+    view: Literal["full", "compact"] = Query(default="full"),
+    fields: Optional[str] = Query(default=None)
+):
     """
     Analyze Tax Document with Azure Document Intelligence and verify with ChatGPT
     
     Upload a PDF tax document for analysis using Azure Document Intelligence
-    and ChatGPT verification.
+    and ChatGPT verification. Combined PDFs (e.g. a 1040, an 1120 and a PFS)
+    are split into forms that are analyzed in parallel, each with a model
+    suited to it; the per-form page ranges are listed under analysis.segments.
+    Single documents use the model routed for their category (see
+    /tax/models/routing), detected from the text layer unless given.
     
     - **file**: PDF tax document to analyze (Form 1040, etc.) (required)
+    - **model_id**: Analyze the whole file with this Azure model instead of
+      splitting; one of GET /tax/models (optional)
+    - **category_id**: Document category that picks the model (optional)
+    - **view** (query): 'full' for the raw Azure result, 'compact' for content,
+      document fields with confidences and key-value pairs only (optional)
+    - **fields** (query): Comma-separated paths within analyzeResult to return,
+      e.g. `content,documents.fields.TaxYear` (optional)
     
     Returns:
     - **success**: Whether the operation was successful
     - **message**: Status message
     - **validation**: ChatGPT verification results
-    - **analysis**: Full Azure Document Intelligence analysis
+    - **analysis**: Azure Document Intelligence analysis, shaped by view and fields
     """
     try:
         # Validate file type
         file_service.validate_pdf_file(file)
+        if model_id is not None:
+            await model_registry.require_model(model_id)
         
         # Read file content
-        pdf_content = file_service.read_file_content(file)
+        pdf_content = await file_service.read_file_content(file)
         
         # Analyze with Azure
-        analysis_result = azure_service.analyze_tax_document(pdf_content)
+        analysis_result = await packet_analyzer.analyze_document(
+            pdf_content, model_id=model_id, category_id=category_id
+        )
         
-        # Extract content for ChatGPT verification
-        content = azure_service.extract_content(analysis_result)
+        # Verify fields and text with ChatGPT
+        validation_result = await chatgpt_service.averify_analysis(analysis_result)
         
-        # Verify with ChatGPT
-        validation_result = chatgpt_service.verify_tax_document(content)
+        # Already-valid Azure JSON: skip response_model validation, encode off the loop
+        return await FastJSONResponse.render_async({
+            "success": True,
+            "message": 'Document analysis and verification completed successfully',
+            "validation": validation_result,
+            "analysis": shape_analysis(analysis_result, view, fields)
+        })
         
-        return AnalysisResponse(
-            success=True,
-            message='Document analysis and verification completed successfully',
-            validation=validation_result,
-            analysis=analysis_result
+    except UpstreamUnavailableError as e:
+        raise _unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+@router.post('/analyze/stream')
+async def analyze_tax_document_stream(
+    file: UploadFile = File(...),
+    model_id: Optional[str] = Form(default=None),
+    category_id: Optional[str] = Form(default=None),
+    view: Literal["full", "compact"] = Query(default="full"),
+    fields: Optional[str] = Query(default=None)
+):
+    """
+    Analyze Tax Document, Streaming Progress
+    
+    Same analysis as POST /tax/analyze, but progress is reported as
+    newline-delimited JSON while the work happens instead of in one
+    response at the end. Every line has an **event** and **elapsed_ms**
+    since the upload was accepted.
+    
+    - **file**, **model_id**, **category_id**, **view**, **fields**: As for POST /tax/analyze
+    
+    Returns (one JSON object per line, in order):
+    - **accepted**: filename and size of the upload
+    - **segments**: Forms found in a combined PDF and their models (packets only)
+    - **submitted**/**poll**/**cached**/**throttled**: Azure progress per model_id;
+      poll carries the operation status
+    - **content**: Extracted text and page count
+    - **token**: A piece of the ChatGPT verification as it is generated (text)
+    - **result**: success, message, validation and analysis, as from POST /tax/analyze
+    - **error**: status_code, detail and retry_after (when throttled) if a stage failed
+    """
+    try:
+        file_service.validate_pdf_file(file)
+        if model_id is not None:
+            await model_registry.require_model(model_id)
+        pdf_content = await file_service.read_file_content(file)
+    except UpstreamUnavailableError as e:
+        raise _unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+    started = time.monotonic()
+    
+    def line(event: str, data: Dict[str, Any]) -> bytes:
+        elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+        return encode_json({"event": event, "elapsed_ms": elapsed_ms, **data}) + b"\n"
+    
+    async def stream():
+        yield line("accepted", {"filename": file.filename, "size": len(pdf_content)})
+        queue: asyncio.Queue = asyncio.Queue()
+        analysis = asyncio.create_task(packet_analyzer.analyze_document(
+            pdf_content, model_id=model_id, category_id=category_id,
+            progress=lambda event, data: queue.put_nowait(line(event, data))
+        ))
+        analysis.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (progress := await queue.get()) is not None:
+                yield progress
+            analysis_result = analysis.result()
+            
+            analyze_result = analysis_result.get('analyzeResult', {})
+            yield line("content", {
+                "content": analyze_result.get('content', ''),
+                "page_count": len(analyze_result.get('pages') or [])
+            })
+            
+            validation_result = None
+            async with aclosing(chatgpt_service.astream_verify_analysis(analysis_result)) as pieces:
+                async for piece in pieces:
+                    if isinstance(piece, str):
+                        yield line("token", {"text": piece})
+                    else:
+                        validation_result = piece
+            
+            # Shaping and encoding a large result both run off the event loop
+            yield await run_in_threadpool(lambda: line("result", {
+                "success": True,
+                "message": 'Document analysis and verification completed successfully',
+                "validation": validation_result,
+                "analysis": shape_analysis(analysis_result, view, fields)
+            }))
+        except UpstreamUnavailableError as e:
+            yield line("error", {"status_code": e.status_code, "detail": str(e), "retry_after": math.ceil(e.retry_after)})
+        except ValueError as e:
+            yield line("error", {"status_code": 400, "detail": str(e)})
+        except Exception as e:
+            yield line("error", {"status_code": 500, "detail": f"Unexpected error: {str(e)}"})
+        finally:
+            # The client went away mid-analysis
+            analysis.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+@router.post('/jobs', response_model=JobResponse, status_code=202)
+async def submit_analysis_job(
+    file: UploadFile = File(...),
+    user_id: str = Form(default="default"),
+    category_id: str = Form(default="personal-tax-returns"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Submit a Tax Document for Background Analysis
+    
+    Stores the upload and returns immediately with 202 Accepted. A worker
+    runs the Azure + ChatGPT pipeline; poll the status URL for progress.
+    
+    - **file**: PDF tax document to analyze (required)
+    - **user_id**: The user ID (optional, defaults to "default")
+    - **category_id**: The document category (optional, defaults to "personal-tax-returns")
+    
+    Returns:
+    - **document_id**: ID of the stored document, which is also the job ID
+    - **status**: Current job status
+    - **status_url**: Endpoint reporting job progress
+    """
+    try:
+        file_service.validate_pdf_file(file)
+        
+        if not await document_service.validate_category(category_id, session=db):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid category_id: '{category_id}'. Category does not exist."
+            )
+        
+        document = await store_document(user_id, category_id, file, db)
+        await job_queue.enqueue(document.id)
+        
+        return JobResponse(
+            document_id=document.id,
+            status="queued",
+            status_message="Queued for analysis",
+            status_url=f"/tax/jobs/{document.id}"
         )
         
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+@router.get('/jobs/{document_id}', response_model=JobStatusResponse)
+async def get_analysis_job(
+    document_id: str,
+    view: Literal["full", "compact"] = Query(default="full"),
+    fields: Optional[str] = Query(default=None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Background Analysis Job Status
+    
+    - **document_id**: The ID returned when the job was submitted
+    - **view**/**fields**: Shape the analysis as for POST /tax/analyze (optional)
+    
+    Returns:
+    - **status**: 'queued', 'processing', 'completed' or 'failed'
+    - **status_message**: Latest progress message
+    - **history**: Status transitions, oldest first
+    - **validation**/**analysis**: Results once the job has completed
+    """
+    document = await document_service.get_document(document_id, session=db)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    
+    history = await document_service.get_status_history(document_id, session=db)
+    result = await document_service.get_completed_details(document_id, session=db)
+    
+    response = JobStatusResponse(
+        document_id=document.id,
+        status=document.status,
+        status_message=document.status_message,
+        history=[
+            StatusHistoryEntry(
+                status=entry.status,
+                # Results are returned once below rather than per entry
+                details=None if entry.status == "completed" else entry.details,
+                created_at=entry.created_at
+            )
+            for entry in history
+        ],
+        validation=result.get("validation")
+    ).model_dump()
+    response["analysis"] = shape_analysis(result.get("analysis"), view, fields)
+    return await FastJSONResponse.render_async(response)
+
+@router.post('/verify/batch')
+async def verify_batch(request: VerifyBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Verify Many Documents with ChatGPT Concurrently
+    
+    Verifies either extracted texts or the completed analyses of stored
+    documents (e.g. a borrower's whole packet). Items run concurrently, so
+    the batch takes about as long as its slowest item. Results stream back
+    as newline-delimited JSON in completion order, one line per item.
+    
+    - **contents**: Extracted document texts (either this or document_ids)
+    - **document_ids**: Documents whose completed analyses to re-verify
+    - **timeout**: Seconds allowed per item, 1 to VERIFY_BATCH_MAX_TIMEOUT (optional, defaults to OPENAI_ITEM_TIMEOUT)
+    
+    Returns (one JSON object per line):
+    - **index**: Position of the item in the request
+    - **document_id**: The document, when verifying document_ids
+    - **validation**: ChatGPT verification result
+    - **error**: Why the item could not be verified (e.g. no completed analysis)
+    - **elapsed_ms**: Time the item took
+    """
+    items: List[Any] = []
+    indexes: List[int] = []
+    document_ids: List[Optional[str]] = []
+    missing: List[BatchVerificationItem] = []
+    if request.contents is not None:
+        items = list(request.contents)
+        indexes = list(range(len(items)))
+        document_ids = [None] * len(items)
+    else:
+        # Loaded before streaming starts; the session closes with the handler
+        for index, document_id in enumerate(request.document_ids):
+            result = await document_service.get_completed_details(document_id, session=db)
+            analysis = result.get("analysis")
+            if analysis is None:
+                missing.append(BatchVerificationItem(
+                    index=index, document_id=document_id, error="No completed analysis for document"
+                ))
+                continue
+            items.append(analysis)
+            indexes.append(index)
+            document_ids.append(document_id)
+    
+    async def stream():
+        for item in missing:
+            yield item.model_dump_json(exclude_none=True) + "\n"
+        async for position, validation, elapsed in chatgpt_service.verify_batch(items, request.timeout):
+            yield BatchVerificationItem(
+                index=indexes[position],
+                document_id=document_ids[position],
+                validation=validation,
+                elapsed_ms=round(elapsed * 1000, 1)
+            ).model_dump_json(exclude_none=True) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @router.get('/models', response_model=ModelsResponse)
-async def list_models():
+async def list_models(request: Request, response: Response):
     """
     List Available Azure Document Intelligence Models
     
     Get a list of all available models in your Azure Document Intelligence service.
+    The list is cached and refreshed in the background once it is older than
+    AZ_MODELS_CACHE_TTL_SECONDS. Its weak ETag changes only with the list, so
+    a matching If-None-Match is answered with 304 Not Modified.
     
     Returns:
     - **success**: Whether the operation was successful
     - **models**: Array of available models with details
     """
     try:
-        models = azure_service.list_models()
+        models = await model_registry.models()
+        headers = {"ETag": model_registry.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), model_registry.etag):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
         
         return ModelsResponse(
             success=True,
             models=models
         )
         
+    except UpstreamUnavailableError as e:
+        raise _unavailable(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}") 
+
+@router.get('/models/routing')
+async def model_routing():
+    """
+    Category to Model Routing and Model Latency
+    
+    Returns:
+    - **routing**: Azure model used for each document category
+    - **latency**: Per-model count, errors and mean/p50/p95/max latency (ms) of uncached analyses
+    - **models_cached**: Whether the model list is cached
+    - **models_age_seconds**: Age of the cached model list
+    """
+    return model_registry.stats()
+
+@router.get('/limits/stats')
+async def limits_stats():
+    """
+    Outbound Rate Limit and Circuit Breaker State
+    
+    Returns, for **azure** and **openai**:
+    - **circuit**: Breaker state ('closed', 'open' or 'half_open'), consecutive failures, trips and rejected calls
+    - **throttled**: 429 responses received
+    - **buckets**: Per-minute quota, available tokens, pause and time spent waiting for each limit
+    """
+    return {
+        "azure": azure_limits.stats(),
+        "openai": openai_limits.stats()
+    }
+
+@router.get('/cache/stats')
+async def cache_stats():
+    """
+    Result Cache Statistics
+    
+    Returns:
+    - **analysis**: Hit/miss counters and size of the Azure analysis cache
+    - **verification**: Hit/miss counters and size of the ChatGPT verification cache
+    """
+    return {
+        "analysis": azure_service.cache.stats() if azure_service.cache else None,
+        "verification": chatgpt_service.cache.stats() if chatgpt_service.cache else None
+    }
+
+def _unavailable(e: UpstreamUnavailableError) -> HTTPException:
+    return HTTPException(
+        status_code=e.status_code,
+        detail=str(e),
+        headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
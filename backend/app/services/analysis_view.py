@@ -0,0 +1,113 @@
+from typing import Any, Dict, List, Optional
+
+VIEWS = ("full", "compact")
+
+def compact_analysis(analysis_result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce an Azure result to what clients read: the text, documents with
+    their field values and confidences, and key-value pairs
+
+    Page geometry (words, lines, polygons, spans, styles) is dropped;
+    pages are summarized by their count. Keys outside analyzeResult, such
+    as status and packet segments, are kept.
+
+    Args:
+        analysis_result: The Azure result containing analyzeResult
+
+    Returns:
+        Dict[str, Any]: The same envelope with a trimmed analyzeResult
+    """
+    analyze_result = analysis_result.get('analyzeResult') or {}
+    compact = {key: value for key, value in analysis_result.items() if key != 'analyzeResult'}
+    compact['analyzeResult'] = {
+        'modelId': analyze_result.get('modelId'),
+        'content': analyze_result.get('content', ''),
+        'pageCount': len(analyze_result.get('pages') or []),
+        'documents': [
+            {
+                'docType': document.get('docType'),
+                'confidence': document.get('confidence'),
+                'fields': {name: _compact_field(field) for name, field in (document.get('fields') or {}).items()},
+            }
+            for document in analyze_result.get('documents') or []
+        ],
+        'keyValuePairs': [
+            {
+                'key': (pair.get('key') or {}).get('content'),
+                'value': (pair.get('value') or {}).get('content'),
+                'confidence': pair.get('confidence'),
+            }
+            for pair in analyze_result.get('keyValuePairs') or []
+        ],
+    }
+    return compact
+
+def _compact_field(field: Any) -> Any:
+    if not isinstance(field, dict):
+        return field
+    if 'valueObject' in field:
+        value = {name: _compact_field(item) for name, item in (field['valueObject'] or {}).items()}
+    elif 'valueArray' in field:
+        value = [_compact_field(item) for item in field['valueArray'] or []]
+    else:
+        value = next((item for key, item in field.items() if key.startswith('value')), None)
+    return {
+        'type': field.get('type'),
+        'value': value,
+        'content': field.get('content'),
+        'confidence': field.get('confidence'),
+    }
+
+def project(value: Any, paths: List[List[str]]) -> Any:
+    """
+    Keep only the given dotted paths of a JSON-like value
+
+    Lists are projected element by element, so "documents.fields.TaxYear"
+    selects that field in every document.
+    """
+    if not paths or any(not path for path in paths):
+        return value
+    if isinstance(value, list):
+        return [project(item, paths) for item in value]
+    if not isinstance(value, dict):
+        return value
+    projected = {}
+    for key in dict.fromkeys(path[0] for path in paths):
+        if key in value:
+            projected[key] = project(value[key], [path[1:] for path in paths if path[0] == key])
+    return projected
+
+def parse_fields(fields: Optional[str]) -> List[List[str]]:
+    """Split "content,documents.fields.TaxYear" into path segments"""
+    if not fields:
+        return []
+    return [path.strip().split('.') for path in fields.split(',') if path.strip()]
+
+def shape_analysis(analysis_result: Optional[Dict[str, Any]], view: str = "full", fields: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Apply view and fields= to an Azure result for a response
+
+    Args:
+        analysis_result: The Azure result, or None
+        view: "full" for the raw result, "compact" for compact_analysis
+        fields: Comma-separated dotted paths within analyzeResult to keep
+
+    Returns:
+        Optional[Dict[str, Any]]: The shaped result
+
+    Raises:
+        ValueError: If the view is unknown
+    """
+    if view not in VIEWS:
+        raise ValueError(f"Invalid view: '{view}'. Use one of: {', '.join(VIEWS)}")
+    if analysis_result is None:
+        return None
+    if view == "compact":
+        analysis_result = compact_analysis(analysis_result)
+    paths = parse_fields(fields)
+    if paths and 'analyzeResult' in analysis_result:
+        analysis_result = {
+            **analysis_result,
+            'analyzeResult': project(analysis_result['analyzeResult'], paths),
+        }
+    return analysis_result
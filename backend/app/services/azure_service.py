@@ -1,112 +1,346 @@
+import asyncio
 import base64
-import requests
+import httpx
+import io
+import os
 import time
-from typing import Dict, Any
+from collections import deque
+from typing import Callable, Deque, Dict, Any, Optional
 from ..utils.config import Config
+from .cache_service import ResultCache, content_hash, file_content_hash
+from .file_service import CHUNK_SIZE
+from .operation_poller import OperationPoller, PollTimeoutError, ProgressCallback, parse_retry_after
+from .rate_limiter import UpstreamUnavailableError, azure_limits, retry_delay
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # Every submission then counts as one page
+    PdfReader = None
+
+API_VERSION = "2024-11-30"
+TAX_MODEL_ID = "prebuilt-tax.us.1040"
+READ_MODEL_ID = "prebuilt-read"
+LAYOUT_MODEL_ID = "prebuilt-layout"
+
+class ModelLatency:
+    """
+    Rolling latency of uncached analyses per model (submit to result)
+
+    Keeps the most recent samples of each model so the statistics follow
+    current service behavior rather than the lifetime average.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self.samples: Dict[str, Deque[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, model_id: str, seconds: float) -> None:
+        self.samples.setdefault(model_id, deque(maxlen=self.window)).append(seconds)
+
+    def record_error(self, model_id: str) -> None:
+        self.errors[model_id] = self.errors.get(model_id, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-model sample count, errors and mean/p50/p95/max latency in ms
+        """
+        stats = {}
+        for model_id in sorted(set(self.samples) | set(self.errors)):
+            samples = sorted(self.samples.get(model_id, ()))
+            entry: Dict[str, Any] = {"count": len(samples), "errors": self.errors.get(model_id, 0)}
+            if samples:
+                entry.update({
+                    "mean_ms": round(sum(samples) / len(samples) * 1000, 1),
+                    "p50_ms": round(samples[len(samples) // 2] * 1000, 1),
+                    "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1),
+                    "max_ms": round(samples[-1] * 1000, 1),
+                })
+            stats[model_id] = entry
+        return stats
+
+class AsyncAzureDocumentIntelligenceService:
+    """
+    Non-blocking Azure Document Intelligence client
+
+    Uses a single pooled, keep-alive httpx client so many analyses can be
+    in flight on one event loop without a fresh TCP+TLS handshake per call.
+    """
 
-class AzureDocumentIntelligenceService:
-    """Service for Azure Document Intelligence interactions"""
-    
     def __init__(self):
         Config.validate_azure_credentials()
         self.endpoint = Config.AZ_ENDPOINT
         self.key = Config.AZ_KEY
-    
-    def analyze_tax_document(self, pdf_content: bytes) -> Dict[str, Any]:
+        self.latency = ModelLatency()
+        self.cache = None
+        if Config.AZURE_CACHE_ENABLED:
+            self.cache = ResultCache(
+                "azure_analysis",
+                version=API_VERSION,
+                max_bytes=Config.AZURE_CACHE_MAX_MB * 1024 * 1024,
+                ttl_seconds=Config.AZURE_CACHE_TTL_SECONDS or None
+            )
+        self.client = httpx.AsyncClient(
+            headers=self._headers(),
+            limits=httpx.Limits(
+                max_connections=Config.AZ_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.AZ_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=Config.AZ_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                Config.AZ_READ_TIMEOUT,
+                connect=Config.AZ_CONNECT_TIMEOUT,
+                pool=Config.AZ_POOL_TIMEOUT
+            )
+        )
+        self.poller = OperationPoller(self.client)
+
+    def _analyze_url(self, model_id: str = TAX_MODEL_ID) -> str:
+        return f"{self.endpoint}/documentintelligence/documentModels/{model_id}:analyze?_overload=analyzeDocument&api-version={API_VERSION}"
+
+    def _list_models_url(self) -> str:
+        return f"{self.endpoint}/documentintelligence/documentModels?api-version={API_VERSION}"
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Ocp-Apim-Subscription-Key": self.key}
+
+    def _analyze_request_body(self, pdf_content: bytes) -> Dict[str, str]:
+        return {"base64Source": base64.b64encode(pdf_content).decode('utf-8')}
+
+    def _binary_submission(self) -> bool:
+        """
+        Send raw PDF bytes rather than a base64 JSON body
+
+        The binary body is a third smaller on the wire and can be streamed
+        from disk instead of being held in memory as bytes, base64 and JSON.
+        """
+        return Config.AZ_SUBMISSION_MODE != "base64"
+
+    def _cache_key(self, pdf_hash: str, model_id: str = TAX_MODEL_ID) -> str:
+        return f"{pdf_hash}:{model_id}:{API_VERSION}"
+
+    def _check_poll_result(self, result: Dict[str, Any]) -> bool:
+        """
+        Return True once the operation has succeeded, raise if it failed
+        """
+        if result.get('status') == 'succeeded':
+            return True
+        if result.get('status') == 'failed':
+            error_msg = result.get('error', {}).get('message', 'Unknown error')
+            raise ValueError(f"Analysis failed: {error_msg}")
+        return False
+
+    def extract_content(self, analysis_result: Dict[str, Any]) -> str:
+        """
+        Extract text content from Azure analysis result
+        """
+        content = ""
+        if 'analyzeResult' in analysis_result and 'content' in analysis_result['analyzeResult']:
+            content = analysis_result['analyzeResult']['content']
+        return content
+
+    async def aclose(self) -> None:
+        """Stop the poller and close the pooled HTTP client"""
+        await self.poller.aclose()
+        await self.client.aclose()
+
+    async def analyze_tax_document(self, pdf_content: bytes) -> Dict[str, Any]:
         """
         Analyze a PDF tax document using Azure Document Intelligence
         """
+        return await self.analyze_document(pdf_content, TAX_MODEL_ID)
+
+    async def analyze_tax_file(self, file_path: str, pdf_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyze a PDF tax document stored on disk
+        """
+        return await self.analyze_file(file_path, TAX_MODEL_ID, pdf_hash)
+
+    async def analyze_document(
+        self,
+        pdf_content: bytes,
+        model_id: str = TAX_MODEL_ID,
+        pdf_hash: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze an in-memory PDF with any Document Intelligence model
+        """
+        cache_key = self._cache_key(pdf_hash or content_hash(pdf_content), model_id)
+        if self._binary_submission():
+            request = {"content": pdf_content, "headers": {"Content-Type": "application/pdf"}}
+        else:
+            request = {"json": self._analyze_request_body(pdf_content)}
+        return await self._analyze(cache_key, lambda: request, model_id, lambda: io.BytesIO(pdf_content), progress)
+
+    async def analyze_file(
+        self,
+        file_path: str,
+        model_id: str = TAX_MODEL_ID,
+        pdf_hash: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze a PDF stored on disk with any Document Intelligence model
+
+        In binary mode the file is streamed to Azure in fixed-size chunks,
+        so memory use does not grow with the document.
+        """
+        if pdf_hash is None:
+            pdf_hash = await asyncio.to_thread(file_content_hash, file_path)
+        cache_key = self._cache_key(pdf_hash, model_id)
+
+        if self._binary_submission():
+            file_size = await asyncio.to_thread(os.path.getsize, file_path)
+
+            def make_request() -> Dict[str, Any]:
+                # A fresh stream per attempt, so throttled submissions can be resent
+                return {
+                    "content": _iter_file(file_path),
+                    "headers": {"Content-Type": "application/pdf", "Content-Length": str(file_size)}
+                }
+        else:
+            pdf_content = await asyncio.to_thread(_read_file, file_path)
+            request = {"json": self._analyze_request_body(pdf_content)}
+            make_request = lambda: request
+        return await self._analyze(cache_key, make_request, model_id, lambda: file_path, progress)
+
+    async def _analyze(
+        self,
+        cache_key: str,
+        make_request: Callable[[], Dict[str, Any]],
+        model_id: str = TAX_MODEL_ID,
+        page_source: Optional[Callable[[], Any]] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Submit and poll one analysis within the shared Azure quota
+
+        Throttled submissions (429) pause every caller for Retry-After and
+        are retried up to UPSTREAM_MAX_RETRIES times. Server errors,
+        timeouts and connection failures count against the circuit breaker.
+        progress, if given, hears about cache hits, submissions, throttling
+        and every poll.
+
+        Raises:
+            UpstreamUnavailableError: Still throttled, or the circuit is open
+            ValueError: The analysis failed
+        """
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                if progress is not None:
+                    progress("cached", {"model_id": model_id})
+                return cached
+
+        on_status = None
+        if progress is not None:
+            on_status = lambda status: progress("poll", {"model_id": model_id, "status": status})
+
+        pages = 1
+        if page_source is not None and azure_limits.buckets["pages"].rate > 0:
+            pages = await asyncio.to_thread(_page_count, page_source())
+
+        started = time.monotonic()
         try:
-            # Encode the PDF content
-            base64_content = base64.b64encode(pdf_content).decode('utf-8')
-            
-            # Construct the analyze endpoint URL
-            analyze_url = f"{self.endpoint}/documentintelligence/documentModels/prebuilt-tax.us.1040:analyze?_overload=analyzeDocument&api-version=2024-11-30"
-            
-            # Set up headers
-            headers = {
-                "Ocp-Apim-Subscription-Key": self.key,
-                "Content-Type": "application/json"
-            }
-            
-            # Prepare the request body
-            request_body = {
-                "base64Source": base64_content
-            }
-            
-            # Make the POST request to start analysis
-            response = requests.post(analyze_url, headers=headers, json=request_body)
-            
-            if response.status_code == 202:
-                # Get the operation location from headers
-                operation_location = response.headers.get('Operation-Location')
-                if not operation_location:
-                    raise ValueError("No Operation-Location header received from Azure")
-                
-                # Poll for results
-                return self._poll_for_results(operation_location)
-            else:
-                raise ValueError(f"Error submitting document: {response.status_code}")
-                
+            for attempt in range(Config.UPSTREAM_MAX_RETRIES + 1):
+                await azure_limits.acquire(requests=1, pages=pages)
+                try:
+                    async with azure_limits.breaker.guard(_is_outage):
+                        response = await self.client.post(self._analyze_url(model_id), **make_request())
+                        _raise_for_unavailable(response)
+
+                        if response.status_code != 202:
+                            raise ValueError(f"Error submitting document: {response.status_code}")
+                        operation_location = response.headers.get('Operation-Location')
+                        if not operation_location:
+                            raise ValueError("No Operation-Location header received from Azure")
+                        if progress is not None:
+                            progress("submitted", {"model_id": model_id})
+
+                        result = await self.poller.wait(
+                            operation_location,
+                            retry_after=parse_retry_after(response.headers),
+                            on_status=on_status
+                        )
+                except UpstreamUnavailableError as e:
+                    if e.status_code != 429 or attempt == Config.UPSTREAM_MAX_RETRIES:
+                        raise
+                    delay = retry_delay(attempt, e.retry_after)
+                    azure_limits.throttle(delay)
+                    if progress is not None:
+                        progress("throttled", {"model_id": model_id, "retry_after": delay})
+                    continue
+
+                self.latency.record(model_id, time.monotonic() - started)
+                if self.cache is not None:
+                    await asyncio.to_thread(self.cache.put, cache_key, result)
+                return result
+
+        except UpstreamUnavailableError:
+            self.latency.record_error(model_id)
+            raise
         except Exception as e:
+            self.latency.record_error(model_id)
             raise ValueError(f"Azure analysis failed: {str(e)}")
-    
-    def _poll_for_results(self, operation_location: str) -> Dict[str, Any]:
-        """
-        Poll Azure for analysis results
-        """
-        max_attempts = 30  # 60 seconds max wait time
-        attempts = 0
-        
-        while attempts < max_attempts:
-            poll_response = requests.get(operation_location, headers={"Ocp-Apim-Subscription-Key": self.key})
-            
-            if poll_response.status_code == 200:
-                result = poll_response.json()
-                if result.get('status') == 'succeeded':
-                    return result
-                elif result.get('status') == 'failed':
-                    error_msg = result.get('error', {}).get('message', 'Unknown error')
-                    raise ValueError(f"Analysis failed: {error_msg}")
-                else:
-                    # Still processing, wait and try again
-                    time.sleep(2)
-                    attempts += 1
-            else:
-                raise ValueError(f"Error polling results: {poll_response.status_code}")
-        
-        raise ValueError("Analysis timed out after 60 seconds")
-    
-    def list_models(self) -> list:
+
+    async def list_models(self) -> list:
         """
         Get list of available Azure Document Intelligence models
         """
+        await azure_limits.acquire(requests=1)
         try:
-            # Construct the list models endpoint URL
-            list_url = f"{self.endpoint}/documentintelligence/documentModels?api-version=2024-11-30"
-            
-            # Set up headers
-            headers = {
-                "Ocp-Apim-Subscription-Key": self.key
-            }
-            
-            # Make the GET request
-            response = requests.get(list_url, headers=headers)
-            
+            async with azure_limits.breaker.guard(_is_outage):
+                response = await self.client.get(self._list_models_url())
+                _raise_for_unavailable(response)
+
             if response.status_code == 200:
                 models_data = response.json()
                 return models_data.get('value', [])
             else:
                 raise ValueError(f"Error fetching models: {response.status_code}")
-                
+
+        except UpstreamUnavailableError:
+            raise
         except Exception as e:
             raise ValueError(f"Failed to list models: {str(e)}")
-    
-    def extract_content(self, analysis_result: Dict[str, Any]) -> str:
-        """
-        Extract text content from Azure analysis result
-        """
-        content = ""
-        if 'analyzeResult' in analysis_result and 'content' in analysis_result['analyzeResult']:
-            content = analysis_result['analyzeResult']['content']
-        return content 
\ No newline at end of file
+
+def _raise_for_unavailable(response: httpx.Response) -> None:
+    if response.status_code == 429 or response.status_code >= 500:
+        raise UpstreamUnavailableError(
+            azure_limits.service,
+            f"responded {response.status_code}",
+            parse_retry_after(response.headers) or 1.0,
+            status_code=429 if response.status_code == 429 else 503
+        )
+
+def _is_outage(error: BaseException) -> bool:
+    """Errors that say the service is unhealthy rather than the request is bad"""
+    if isinstance(error, UpstreamUnavailableError):
+        return error.status_code != 429
+    return isinstance(error, (httpx.TransportError, PollTimeoutError, TimeoutError))
+
+def _page_count(source) -> int:
+    """Pages in a PDF (path or stream), for the pages-per-minute quota"""
+    if PdfReader is None:
+        return 1
+    try:
+        return max(len(PdfReader(source).pages), 1)
+    except Exception:
+        return 1
+
+def _read_file(file_path: str) -> bytes:
+    with open(file_path, "rb") as f:
+        return f.read()
+
+async def _iter_file(file_path: str):
+    """Yield a file in fixed-size chunks, reading off the event loop"""
+    f = await asyncio.to_thread(open, file_path, "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
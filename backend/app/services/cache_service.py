@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+from ..utils.config import Config
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 hex digest used as the content address of a payload"""
+    return hashlib.sha256(data).hexdigest()
+
+def file_content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    Persistent, size-bounded LRU cache of JSON results in SQLite
+
+    Values are stored zlib-compressed. Each cache lives in its own table so
+    several caches can share one database file. Entries written under a
+    different ``version`` are dropped when the cache is opened, which is how
+    callers invalidate everything after a format or prompt change.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        version: str,
+        max_bytes: int,
+        ttl_seconds: Optional[float] = None,
+        db_path: Optional[str] = None
+    ):
+        self.name = name
+        self.version = version
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path or Config.CACHE_DB_PATH
+        self.table = f"cache_{name}"
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, version TEXT NOT NULL, data BLOB NOT NULL, "
+            "size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{self.table}_accessed_at ON {self.table} (accessed_at)"
+        )
+        self._conn.execute(f"DELETE FROM {self.table} WHERE version != ?", (self.version,))
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value
+
+        Args:
+            key: The cache key
+
+        Returns:
+            The decoded value, or None on a miss or expired entry
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT data, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            now = time.time()
+            if row is None:
+                self.misses += 1
+                return None
+            data, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+        return json.loads(zlib.decompress(data))
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Store a value and evict least recently used entries over the size bound
+
+        Args:
+            key: The cache key
+            value: A JSON-serializable value
+        """
+        data = zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} "
+                    "(key, version, data, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, self.version, data, len(data), now, now)
+                )
+                self._evict()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self) -> None:
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self.evictions += cursor.rowcount
+
+        total = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            f"SELECT key, size FROM {self.table} ORDER BY accessed_at ASC"
+        ).fetchall():
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop one entry, or the whole cache when no key is given"""
+        with self._lock:
+            if key is None:
+                self._conn.execute(f"DELETE FROM {self.table}")
+            else:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current footprint"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "version": self.version,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
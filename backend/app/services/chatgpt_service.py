@@ -1,21 +1,22 @@
-from openai import OpenAI
+from openai import APIConnectionError, APIStatusError, APITimeoutError, AsyncOpenAI
 from ..utils.config import Config
 from ..models.responses import ValidationResult
+from .cache_service import ResultCache, content_hash
+from .evidence_service import EvidenceBuilder
+from .operation_poller import parse_retry_after
+from .rate_limiter import DeadlineExceeded, UpstreamUnavailableError, openai_limits, retry_delay
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+import asyncio
 import re
+import time
+from contextlib import aclosing
 
-class ChatGPTService:
-    """Service for ChatGPT interactions"""
-    
-    def __init__(self):
-        Config.validate_openai_credentials()
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
-    
-    def verify_tax_document(self, content: str) -> ValidationResult:
-        """
-        Use ChatGPT to verify if the extracted content represents a valid Form 1040
-        """
-        try:
-            prompt = f"""
+MODEL = "gpt-4"
+TEMPERATURE = 0.3
+
+SYSTEM_PROMPT = "You are a tax document verification expert. Your job is to determine if a document is a valid Form 1040. Only Form 1040 documents should be marked as valid. All other tax forms should be marked as invalid."
+
+PROMPT_TEMPLATE = """
             Analyze the following extracted content from a tax document and determine if it's a valid Form 1040.
             
             IMPORTANT: Only Form 1040 documents should be considered valid. All other tax forms (W-2, 1099, etc.) should be marked as invalid.
@@ -27,8 +28,8 @@ class ChatGPTService:
             4. Brief explanation of your assessment
             5. Any notable issues or missing information
             
-            Extracted content:
-            {content[:2000]}  # Limit to first 2000 chars to avoid token limits
+            Extracted evidence (title, detected fields, then document text):
+            {content}
             
             Respond in this exact format:
             VALID: Yes/No
@@ -37,28 +38,234 @@ class ChatGPTService:
             EXPLANATION: [your explanation]
             ISSUES: [any issues found]
             """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a tax document verification expert. Your job is to determine if a document is a valid Form 1040. Only Form 1040 documents should be marked as valid. All other tax forms should be marked as invalid."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=500
+
+# Any edit to the prompts changes the version and invalidates cached verdicts
+PROMPT_VERSION = content_hash((SYSTEM_PROMPT + PROMPT_TEMPLATE).encode('utf-8'))[:12]
+
+class ChatGPTService:
+    """
+    Service for ChatGPT interactions
+    
+    All completions go through one pooled async client, with at most
+    OPENAI_MAX_CONCURRENCY in flight across the process. Every call draws
+    on the shared OPENAI_TOKENS_PER_MINUTE quota and circuit breaker;
+    throttling is retried here rather than by the SDK so all callers back
+    off together. Scripts can drive it with asyncio.run.
+    """
+    
+    def __init__(self):
+        Config.validate_openai_credentials()
+        self.async_client = AsyncOpenAI(api_key=Config.OPENAI_API_KEY, max_retries=0)
+        self.semaphore = asyncio.Semaphore(Config.OPENAI_MAX_CONCURRENCY)
+        self.cache = None
+        if Config.VERIFICATION_CACHE_ENABLED:
+            self.cache = ResultCache(
+                "chatgpt_verification",
+                version=PROMPT_VERSION,
+                max_bytes=Config.VERIFICATION_CACHE_MAX_MB * 1024 * 1024,
+                ttl_seconds=Config.VERIFICATION_CACHE_TTL_SECONDS or None
             )
+        self.evidence_builder = EvidenceBuilder(model=MODEL)
+    
+    async def aclose(self) -> None:
+        """Close the pooled async HTTP client"""
+        await self.async_client.close()
+    
+    def _cache_key(self, evidence: str) -> str:
+        return f"{content_hash(evidence.encode('utf-8'))}:{MODEL}:{TEMPERATURE}:{PROMPT_VERSION}"
+    
+    def _completion_request(self, evidence: str) -> Dict[str, Any]:
+        return {
+            "model": MODEL,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": PROMPT_TEMPLATE.format(content=evidence)}
+            ],
+            "temperature": TEMPERATURE,
+            "max_tokens": 500
+        }
+    
+    def _evidence(self, item: Union[str, Dict[str, Any]]) -> str:
+        if isinstance(item, str):
+            return self.evidence_builder.from_content(item).text
+        return self.evidence_builder.from_analysis(item).text
+    
+    async def averify_analysis(self, analysis_result: Dict[str, Any], timeout: Optional[float] = None) -> ValidationResult:
+        """
+        Verify an Azure analysis from its fields, key-value pairs and text,
+        fitted to VERIFICATION_TOKEN_BUDGET
+        """
+        evidence = await asyncio.to_thread(self._evidence, analysis_result)
+        return await self._averify(evidence, timeout)
+    
+    async def averify_tax_document(self, content: str, timeout: Optional[float] = None) -> ValidationResult:
+        """
+        Use ChatGPT to verify if the extracted content represents a valid Form 1040
+        """
+        evidence = await asyncio.to_thread(self._evidence, content)
+        return await self._averify(evidence, timeout)
+    
+    async def verify_batch(
+        self,
+        items: List[Union[str, Dict[str, Any]]],
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[Tuple[int, ValidationResult, float]]:
+        """
+        Verify many documents concurrently, yielding each as it finishes
+        
+        Args:
+            items: Extracted text or Azure analysis results
+            timeout: Seconds allowed per completion (OPENAI_ITEM_TIMEOUT if
+                not given); waiting for a concurrency slot does not count
+            
+        Yields:
+            Tuple[int, ValidationResult, float]: Index of the item, its
+            result and the seconds it took, in completion order
+        """
+        async def verify(index: int, item: Union[str, Dict[str, Any]]):
+            started = time.monotonic()
+            evidence = await asyncio.to_thread(self._evidence, item)
+            try:
+                result = await self._averify(evidence, timeout)
+            except UpstreamUnavailableError as e:
+                result = _service_error(e)
+            return index, result, time.monotonic() - started
+        
+        tasks = [asyncio.create_task(verify(index, item)) for index, item in enumerate(items)]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                yield await completed
+        finally:
+            # The consumer went away (e.g. client disconnect): stop paying for the rest
+            for task in tasks:
+                task.cancel()
+    
+    async def _averify(self, evidence: str, timeout: Optional[float] = None) -> ValidationResult:
+        """
+        Raises:
+            UpstreamUnavailableError: OpenAI is still throttling after
+                retries, or its circuit is open
+        """
+        timeout = Config.OPENAI_ITEM_TIMEOUT if timeout is None else timeout
+        try:
+            cache_key = self._cache_key(evidence)
+            if self.cache is not None:
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached is not None:
+                    return ValidationResult(**cached)
+            
+            request = self._completion_request(evidence)
+            # Prompt plus the most the completion may use
+            cost = sum(self.evidence_builder.count_tokens(m["content"]) for m in request["messages"]) + request["max_tokens"]
+            response = await self._acomplete(request, cost, timeout)
             
             response_text = response.choices[0].message.content.strip()
-            return self._parse_verification_response(response_text)
+            result = self._parse_verification_response(response_text)
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.put, cache_key, result.model_dump())
+            return result
             
+        except UpstreamUnavailableError:
+            raise
+        except asyncio.TimeoutError:
+            return _service_error(f"no response within {timeout:g}s")
         except Exception as e:
-            return ValidationResult(
-                is_valid=False,
-                form_type="Unknown",
-                confidence=0,
-                explanation=f"Error during ChatGPT verification: {str(e)}",
-                issues="Unable to verify document due to service error"
-            )
+            return _service_error(e)
+    
+    async def _acomplete(self, request: Dict[str, Any], cost: int, timeout: float):
+        for attempt in range(Config.UPSTREAM_MAX_RETRIES + 1):
+            await openai_limits.acquire(tokens=cost)
+            try:
+                async with self.semaphore:
+                    async with openai_limits.breaker.guard(_is_outage):
+                        try:
+                            return await _within(
+                                self.async_client.chat.completions.create(**request), time.monotonic() + timeout
+                            )
+                        except APIStatusError as e:
+                            _raise_for_unavailable(e)
+                            raise
+            except UpstreamUnavailableError as e:
+                if e.status_code != 429 or attempt == Config.UPSTREAM_MAX_RETRIES:
+                    raise
+                openai_limits.throttle(retry_delay(attempt, e.retry_after))
+    
+    async def astream_verify_analysis(
+        self,
+        analysis_result: Dict[str, Any],
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[Union[str, ValidationResult]]:
+        """
+        averify_analysis, yielding the model's answer as it is generated
+        
+        Yields:
+            str: Pieces of the completion text, as they arrive
+            ValidationResult: The parsed verdict, always last; a cached
+            verdict is yielded at once without text
+            
+        Raises:
+            UpstreamUnavailableError: OpenAI is still throttling after
+                retries, or its circuit is open
+        """
+        timeout = Config.OPENAI_ITEM_TIMEOUT if timeout is None else timeout
+        evidence = await asyncio.to_thread(self._evidence, analysis_result)
+        try:
+            cache_key = self._cache_key(evidence)
+            if self.cache is not None:
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached is not None:
+                    yield ValidationResult(**cached)
+                    return
+            
+            request = {**self._completion_request(evidence), "stream": True}
+            cost = sum(self.evidence_builder.count_tokens(m["content"]) for m in request["messages"]) + request["max_tokens"]
+            parts = []
+            # Closed at once if our consumer stops, releasing the concurrency slot
+            async with aclosing(self._astream(request, cost, time.monotonic() + timeout)) as pieces:
+                async for text in pieces:
+                    parts.append(text)
+                    yield text
+            
+            result = self._parse_verification_response("".join(parts).strip())
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.put, cache_key, result.model_dump())
+        except UpstreamUnavailableError:
+            raise
+        except asyncio.TimeoutError:
+            result = _service_error(f"no response within {timeout:g}s")
+        except Exception as e:
+            result = _service_error(e)
+        yield result
+    
+    async def _astream(self, request: Dict[str, Any], cost: int, deadline: float) -> AsyncIterator[str]:
+        """
+        _acomplete for a streamed completion; throttling can only be
+        retried before the first piece of text
+        """
+        for attempt in range(Config.UPSTREAM_MAX_RETRIES + 1):
+            await openai_limits.acquire(tokens=cost)
+            try:
+                async with self.semaphore:
+                    async with openai_limits.breaker.guard(_is_outage):
+                        try:
+                            stream = await _within(self.async_client.chat.completions.create(**request), deadline)
+                        except APIStatusError as e:
+                            _raise_for_unavailable(e)
+                            raise
+                        try:
+                            while True:
+                                try:
+                                    chunk = await _within(anext(stream), deadline)
+                                except StopAsyncIteration:
+                                    return
+                                if chunk.choices and chunk.choices[0].delta.content:
+                                    yield chunk.choices[0].delta.content
+                        finally:
+                            await stream.close()
+            except UpstreamUnavailableError as e:
+                if e.status_code != 429 or attempt == Config.UPSTREAM_MAX_RETRIES:
+                    raise
+                openai_limits.throttle(retry_delay(attempt, e.retry_after))
     
     def _parse_verification_response(self, response_text: str) -> ValidationResult:
         """
@@ -100,4 +307,42 @@ class ChatGPTService:
                 confidence=0,
                 explanation=f"Error parsing verification response: {str(e)}",
                 issues="Unable to parse verification response"
-            ) 
\ No newline at end of file
+            )
+
+def _service_error(error) -> ValidationResult:
+    return ValidationResult(
+        is_valid=False,
+        form_type="Unknown",
+        confidence=0,
+        explanation=f"Error during ChatGPT verification: {str(error)}",
+        issues="Unable to verify document due to service error"
+    )
+
+def _raise_for_unavailable(error: APIStatusError) -> None:
+    """Re-raise throttling and server errors as UpstreamUnavailableError"""
+    if error.status_code == 429 or error.status_code >= 500:
+        raise UpstreamUnavailableError(
+            openai_limits.service,
+            f"responded {error.status_code}",
+            parse_retry_after(error.response.headers) or 1.0,
+            status_code=429 if error.status_code == 429 else 503
+        ) from error
+
+def _is_outage(error: BaseException) -> bool:
+    """Errors that say the service is unhealthy rather than the request is bad"""
+    if isinstance(error, UpstreamUnavailableError):
+        return error.status_code != 429
+    return isinstance(error, (APIConnectionError, APITimeoutError))
+
+async def _within(awaitable, deadline: float):
+    """
+    Await before a caller's deadline (a time.monotonic() value)
+
+    Raises:
+        DeadlineExceeded: If the deadline passes first; the breaker does
+            not count this against OpenAI
+    """
+    try:
+        return await asyncio.wait_for(awaitable, deadline - time.monotonic())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("deadline exceeded") from None
@@ -0,0 +1,302 @@
+import asyncio
+import io
+import logging
+import math
+import os
+import re
+import zipfile
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from ..utils.config import Config
+from .azure_service import READ_MODEL_ID
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # PDFs are then classified by filename only
+    PdfReader = PdfWriter = None
+
+try:
+    import openpyxl
+except ImportError:  # Spreadsheets are then classified by filename only
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+# Distinctive phrases per seeded category, with weights. Titles and form
+# numbers weigh most; phrases shared by several categories are discounted
+# by their inverse document frequency.
+CATEGORY_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "balance-sheet": {
+        "balance sheet": 3, "total assets": 2, "total liabilities": 2, "current assets": 1,
+        "fixed assets": 1, "accounts receivable": 1, "accounts payable": 1, "retained earnings": 1.5,
+        "stockholders equity": 1.5, "owners equity": 1.5, "liabilities and equity": 2,
+    },
+    "debt-schedule": {
+        "debt schedule": 3, "creditor": 1.5, "original amount": 1, "present balance": 1.5,
+        "maturity date": 1, "monthly payment": 1, "collateral": 1, "notes payable": 1,
+        "interest rate": 1, "lines of credit": 1,
+    },
+    "profit-loss": {
+        "profit and loss": 3, "profit & loss": 3, "income statement": 2, "gross revenue": 1.5,
+        "gross profit": 1.5, "cost of goods sold": 1.5, "net income": 1, "operating expenses": 1,
+        "sales revenue": 1, "total expenses": 1, "net profit": 1,
+    },
+    "business-tax-returns": {
+        "form 1120": 3, "1120-s": 3, "form 1065": 3, "corporation income tax return": 3,
+        "return of partnership income": 3, "schedule k-1": 1.5, "employer identification number": 1.5,
+        "taxable income": 0.5, "internal revenue service": 0.5,
+    },
+    "personal-tax-returns": {
+        "form 1040": 3, "individual income tax return": 3, "social security number": 1.5,
+        "filing status": 1.5, "adjusted gross income": 1, "standard deduction": 1,
+        "married filing jointly": 1, "dependents": 0.5, "taxable income": 0.5,
+        "internal revenue service": 0.5,
+    },
+    "project-costs": {
+        "use of funds": 3, "project costs": 3, "start-up costs": 2, "working capital": 1.5,
+        "funds requested": 1.5, "hiring employees": 1, "equipment": 0.5, "renovation": 1,
+        "purchase price": 1, "closing costs": 1, "inventory": 0.5,
+    },
+    "personal-financial-statement": {
+        "personal financial statement": 3, "form 413": 3, "notes payable to banks": 1.5,
+        "stocks and bonds": 1, "real estate owned": 1.5, "life insurance": 1, "cash on hand": 1,
+        "net worth": 1, "contingent liabilities": 1,
+    },
+}
+
+# Score at which the best category counts as well supported
+_STRONG_EVIDENCE = 6.0
+_SHEET_ROWS = 30
+_TEXT_FILE_BYTES = 64 * 1024
+
+def _phrase_pattern(phrase: str) -> re.Pattern:
+    # "form 1040" also matches "Form1040" and "form\n1040" from PDF text layers
+    parts = [re.escape(part) for part in phrase.split()]
+    return re.compile(r"(?<![a-z0-9])" + r"\s*".join(parts) + r"(?![a-z0-9])")
+
+def _build_index() -> List[Tuple[str, re.Pattern, float]]:
+    document_frequency: Dict[str, int] = {}
+    for keywords in CATEGORY_KEYWORDS.values():
+        for phrase in keywords:
+            document_frequency[phrase] = document_frequency.get(phrase, 0) + 1
+    total = len(CATEGORY_KEYWORDS)
+    return [
+        (category_id, _phrase_pattern(phrase), weight * math.log(1 + total / document_frequency[phrase]))
+        for category_id, keywords in CATEGORY_KEYWORDS.items()
+        for phrase, weight in keywords.items()
+    ]
+
+_INDEX = _build_index()
+
+@dataclass
+class Classification:
+    """Outcome of classifying an upload"""
+    category_id: Optional[str]
+    confidence: float
+    scores: Dict[str, float] = field(default_factory=dict)
+    source: str = "local"  # "local" or "azure"
+
+class DocumentClassifier:
+    """
+    Maps uploads to document categories without a network round trip
+
+    Text comes from the PDF text layer (first pages and metadata),
+    spreadsheet cells near the top of each sheet, DOCX body text or CSV
+    headers, plus the filename. Each category is scored with weighted,
+    IDF-discounted keyword matches. When the confidence is below
+    CLASSIFIER_MIN_CONFIDENCE (e.g. a scanned PDF with no text layer), the
+    stored PDF's first pages are read with Azure's prebuilt-read model in
+    the background and the document is recategorized if that scores better.
+    """
+
+    def __init__(self, azure_service=None, min_confidence: Optional[float] = None):
+        # AsyncAzureDocumentIntelligenceService used for the low-confidence fallback
+        self.azure_service = azure_service
+        self.min_confidence = Config.CLASSIFIER_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        self._tasks: Set[asyncio.Task] = set()
+
+    def score(self, text: str) -> Classification:
+        """
+        Score text against every category
+
+        Args:
+            text: Text extracted from the document
+
+        Returns:
+            Classification: Best category (None if nothing matched) and confidence
+        """
+        text = text.lower()
+        scores = {category_id: 0.0 for category_id in CATEGORY_KEYWORDS}
+        for category_id, pattern, weight in _INDEX:
+            count = len(pattern.findall(text))
+            if count:
+                scores[category_id] += weight * (1 + math.log(count))
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        (best, top), (_, second) = ranked[0], ranked[1]
+        if top == 0:
+            return Classification(category_id=None, confidence=0.0, scores=scores)
+
+        # Margin over the runner-up, damped when the evidence itself is thin
+        confidence = (top - second) / top * min(1.0, top / _STRONG_EVIDENCE)
+        return Classification(category_id=best, confidence=round(confidence, 3), scores=scores)
+
+    def extract_text(self, stream: BinaryIO, filename: str) -> str:
+        """
+        Pull classification text from a file without parsing all of it
+
+        Args:
+            stream: Seekable binary stream of the file content
+            filename: The original filename, used for the file type
+
+        Returns:
+            str: Extracted text, including the filename's words
+        """
+        extension = os.path.splitext(filename.lower())[1]
+        parts = [re.sub(r"[_\-.]+", " ", os.path.splitext(filename)[0])]
+        try:
+            if extension == '.pdf' and PdfReader is not None:
+                reader = PdfReader(stream)
+                metadata = reader.metadata or {}
+                parts += [str(metadata.get('/Title') or ''), str(metadata.get('/Subject') or '')]
+                for page in reader.pages[:Config.CLASSIFIER_MAX_PAGES]:
+                    parts.append(page.extract_text() or '')
+            elif extension == '.xlsx' and openpyxl is not None:
+                workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+                try:
+                    for sheet in workbook.worksheets:
+                        parts.append(sheet.title)
+                        for row in sheet.iter_rows(max_row=_SHEET_ROWS, values_only=True):
+                            parts += [str(value) for value in row if value is not None]
+                finally:
+                    workbook.close()
+            elif extension == '.docx':
+                with zipfile.ZipFile(stream) as archive:
+                    xml = archive.read('word/document.xml').decode('utf-8', errors='ignore')
+                parts.append(re.sub(r"<[^>]+>", " ", xml))
+            elif extension == '.csv':
+                parts.append(stream.read(_TEXT_FILE_BYTES).decode('utf-8', errors='ignore'))
+        except Exception as e:
+            # Unreadable content still leaves the filename to go on
+            logger.warning("Could not extract text from %s: %s", filename, e)
+        return "\n".join(parts)
+
+    def classify_pages(self, stream: BinaryIO) -> List[Classification]:
+        """
+        Classify each page of a PDF on its own, e.g. to find where the forms
+        of a combined packet start
+
+        Args:
+            stream: Seekable binary stream of the PDF
+
+        Returns:
+            List[Classification]: One result per page; empty if the PDF
+            cannot be read or pypdf is not installed
+        """
+        if PdfReader is None:
+            return []
+        try:
+            reader = PdfReader(stream)
+            return [self.score(page.extract_text() or '') for page in reader.pages]
+        except Exception as e:
+            logger.warning("Could not read PDF pages: %s", e)
+            return []
+
+    def classify_file(self, file_path: str, filename: Optional[str] = None) -> Classification:
+        """
+        Classify a file on disk using local extraction only
+        """
+        with open(file_path, "rb") as f:
+            return self.score(self.extract_text(f, filename or os.path.basename(file_path)))
+
+    async def classify_upload(self, file: UploadFile) -> Classification:
+        """
+        Classify an upload before it is stored, using local extraction only
+
+        Args:
+            file: The uploaded file; its read position is restored afterwards
+
+        Returns:
+            Classification: The local result; see needs_remote
+        """
+        def classify_local() -> Classification:
+            file.file.seek(0)
+            try:
+                return self.score(self.extract_text(file.file, file.filename))
+            finally:
+                file.file.seek(0)
+
+        return await run_in_threadpool(classify_local)
+
+    def needs_remote(self, result: Classification, filename: str) -> bool:
+        """
+        Whether a local result is weak enough to read the PDF with Azure
+        """
+        return (
+            result.confidence < self.min_confidence
+            and self.azure_service is not None
+            and Config.CLASSIFIER_REMOTE_FALLBACK
+            and PdfWriter is not None
+            and filename.lower().endswith('.pdf')
+        )
+
+    def leading_pages(self, file_path: str) -> bytes:
+        """
+        The first CLASSIFIER_MAX_PAGES pages of a PDF on disk, as a PDF
+        """
+        reader = PdfReader(file_path)
+        if len(reader.pages) <= Config.CLASSIFIER_MAX_PAGES:
+            with open(file_path, "rb") as f:
+                return f.read()
+        writer = PdfWriter()
+        for page in reader.pages[:Config.CLASSIFIER_MAX_PAGES]:
+            writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue()
+
+    async def classify_remote(self, file_path: str, filename: str) -> Classification:
+        """
+        Classify a stored PDF from Azure's read of its first pages
+
+        Raises:
+            Exception: If the PDF cannot be read or the Azure call fails
+        """
+        content = await run_in_threadpool(self.leading_pages, file_path)
+        analysis = await self.azure_service.analyze_document(content, READ_MODEL_ID)
+        remote = self.score(f"{filename}\n{self.azure_service.extract_content(analysis)}")
+        remote.source = "azure"
+        return remote
+
+    def reclassify_in_background(self, document_id: str, file_path: str, filename: str, local: Classification, document_service) -> None:
+        """
+        Run classify_remote for a stored document off the request path and
+        recategorize it when the remote result is more confident
+
+        Args:
+            document_id: The stored document
+            file_path: Where its file is stored
+            filename: The original filename
+            local: The local result the document was stored under
+            document_service: AsyncDocumentService that records the new category
+        """
+        async def reclassify() -> None:
+            try:
+                remote = await self.classify_remote(file_path, filename)
+            except Exception as e:
+                logger.warning("Remote classification of %s failed: %s", filename, e)
+                return
+            if remote.category_id is not None and remote.confidence > local.confidence and remote.category_id != local.category_id:
+                await document_service.set_category(document_id, remote.category_id)
+
+        task = asyncio.create_task(reclassify(), name=f"reclassify-{document_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def aclose(self) -> None:
+        """Cancel pending background classifications"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -1,23 +1,224 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from fastapi import UploadFile
-from ..models.database import DocumentCategory, Document, User, DocumentStatusHistory
+import base64
+import binascii
+import datetime
+import json
+import uuid
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from sqlalchemy import String, and_, delete, or_, select, tuple_, type_coerce, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.database import DocumentCategory, Document, User, DocumentStatusHistory, DocumentStatusPayload, Blob
 from ..models.responses import DocumentResponse
-from typing import Optional, List
+from ..utils.config import Config
+from ..utils.database import AsyncSessionLocal, async_engine
+from .event_bus import DocumentEventBus, document_events
+from .file_service import StoredFile, blob_lock
+from .status_details import DetailsPayload, pack_details, unpack_details
+from typing import Optional, List, Dict, Any, Iterable, AsyncIterator, Set, Tuple
 
-class DocumentService:
-    """Service for document-related operations"""
+# Columns returned by document listings; selecting them directly skips ORM hydration
+LISTED_COLUMNS = (
+    Document.id,
+    Document.user_id,
+    Document.category_id,
+    Document.filename,
+    Document.original_filename,
+    Document.file_path,
+    Document.file_size,
+    Document.mime_type,
+    Document.status,
+    Document.status_message,
+    Document.created_at,
+    Document.updated_at,
+)
+
+# Bounded so a large purge cannot flood the default executor with unlinks
+_file_removal_pool = ThreadPoolExecutor(
+    max_workers=Config.FILE_REMOVAL_WORKERS, thread_name_prefix="file-removal"
+)
+
+@dataclass
+class BulkDeleteResult:
+    """Outcome of a bulk delete"""
+    deleted: int = 0
+    files_removed: int = 0
+    failures: List[Dict[str, str]] = field(default_factory=list)
+
+@dataclass
+class DocumentPage:
+    """One page of a keyset-paginated document listing"""
+    documents: List[DocumentResponse]
+    next_cursor: Optional[str] = None
+
+def listing_sort_key(dialect_name: str):
+    """
+    Document.created_at as compared by keyset pagination
     
-    def __init__(self):
-        self.engine = create_engine("sqlite:///./app.db")
-        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+    SQLite stores timestamps as text, and CURRENT_TIMESTAMP defaults have no
+    fractional seconds while bound datetimes are rendered with them, so
+    there the stored text is compared as is. The SQL is the same either
+    way, so the (user_id, created_at) index still serves the range.
+    """
+    if dialect_name == "sqlite":
+        return type_coerce(Document.created_at, String)
+    return Document.created_at
+
+def encode_cursor(created_at: Any, document_id: str) -> str:
+    """Opaque cursor pointing just past the row with this sort key and ID"""
+    if isinstance(created_at, datetime.datetime):
+        created_at = created_at.isoformat()
+    payload = json.dumps([created_at, document_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, dialect_name: str) -> Tuple[Any, str]:
+    """
+    Recover the sort key and document ID from a cursor
     
-    def get_session(self):
-        """Get a database session"""
-        return self.SessionLocal()
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        created_at, document_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(created_at, str) or not isinstance(document_id, str):
+            raise ValueError
+        if dialect_name != "sqlite":
+            created_at = datetime.datetime.fromisoformat(created_at)
+        return created_at, document_id
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError(f"Invalid cursor: '{cursor}'")
+
+def user_documents_query(
+    user_id: str,
+    after: Optional[Tuple[Any, str]] = None,
+    limit: Optional[int] = None,
+    dialect_name: str = "sqlite"
+):
+    """
+    Newest-first listing of a user's documents, served by the
+    (user_id, created_at) index
     
-    def validate_category(self, category_id: str) -> bool:
+    Args:
+        user_id: The user ID to list documents for
+        after: Continue after this (sort key, document ID), as decoded from
+            a cursor (keyset pagination)
+        limit: Maximum number of rows
+        dialect_name: Database dialect, which decides the sort key
+    """
+    sort_key = listing_sort_key(dialect_name)
+    query = select(*LISTED_COLUMNS, sort_key.label("sort_key")).where(Document.user_id == user_id)
+    if after is not None:
+        # No lookup of the anchor row, so deleting it does not break the cursor
+        query = query.where(tuple_(sort_key, Document.id) < tuple_(*after))
+    query = query.order_by(Document.created_at.desc(), Document.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def _dialect_insert(dialect_name: str):
+    """insert() with ON CONFLICT support for the dialect, None if unavailable"""
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    return None
+
+def _blob_references(stored_files: Iterable[StoredFile]) -> List[Tuple[StoredFile, int]]:
+    """Interned files grouped by blob, with the number of new references to each"""
+    references: Dict[str, Tuple[StoredFile, int]] = {}
+    for stored_file in stored_files:
+        if stored_file.blob_path:
+            _, count = references.get(stored_file.content_hash, (stored_file, 0))
+            references[stored_file.content_hash] = (stored_file, count + 1)
+    return list(references.values())
+
+def _blob_upsert(dialect_name: str, stored_file: StoredFile, count: int):
+    """
+    Statement adding count references to a blob, creating its row if
+    needed; None when the dialect has no ON CONFLICT support
+    """
+    insert = _dialect_insert(dialect_name)
+    if insert is None:
+        return None
+    statement = insert(Blob).values(
+        hash=stored_file.content_hash,
+        path=stored_file.blob_path,
+        size=stored_file.file_size,
+        refcount=count
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[Blob.hash],
+        set_={"refcount": Blob.refcount + statement.excluded.refcount}
+    )
+
+def _blob_hash(stored_file: StoredFile) -> Optional[str]:
+    return stored_file.content_hash if stored_file.blob_path else None
+
+def _status_entry(document_id: str, status: str, details: Optional[Dict[str, Any]], payload: Optional[DetailsPayload]) -> list:
+    """History row for a status change, followed by its out-of-row payload if any"""
+    entry = DocumentStatusHistory(
+        id=str(uuid.uuid4()),
+        document_id=document_id,
+        status=status,
+        details=details,
+        payload_size=payload.size if payload else None,
+        # Explicit sub-second timestamp keeps rapid transitions ordered
+        created_at=datetime.datetime.now(datetime.timezone.utc)
+    )
+    if payload is None:
+        return [entry]
+    return [entry, DocumentStatusPayload(history_id=entry.id, codec=payload.codec, data=payload.data)]
+
+def _created_event(document: Document) -> Dict[str, Any]:
+    return {
+        "document_id": document.id,
+        "category_id": document.category_id,
+        "original_filename": document.original_filename,
+        "status": document.status,
+        "status_message": document.status_message,
+    }
+
+def documents_changed(user_ids: Iterable[str]):
+    """
+    Statement bumping the documents version of each user, to run in the
+    transaction that changes their documents
+    """
+    return update(User).where(User.id.in_(set(user_ids))).values(
+        documents_version=User.documents_version + 1
+    )
+
+class AsyncDocumentService:
+    """
+    Document operations on the asyncio engine
+    
+    Used by request handlers, background jobs and scripts (through
+    asyncio.run, or the blocking DocumentService facade) so database round
+    trips never stall the event loop.
+    """
+    
+    def __init__(self, events: Optional[DocumentEventBus] = None):
+        self.SessionLocal = AsyncSessionLocal
+        # Committed changes are announced here for GET /files/documents/{user_id}/events
+        self.events = events or document_events
+    
+    @asynccontextmanager
+    async def session_scope(self, session: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+        """
+        Use the caller's session (e.g. the per-request one from get_async_db)
+        or open a short-lived session that is closed afterwards
+        """
+        if session is not None:
+            yield session
+            return
+        async with self.SessionLocal() as session:
+            yield session
+    
+    async def validate_category(self, category_id: str, session: Optional[AsyncSession] = None) -> bool:
         """
         Validate that a document category exists
         
@@ -27,16 +228,13 @@ class DocumentService:
         Returns:
             bool: True if category exists, False otherwise
         """
-        session = self.get_session()
-        try:
-            category = session.query(DocumentCategory).filter(
-                DocumentCategory.id == category_id
-            ).first()
-            return category is not None
-        finally:
-            session.close()
+        async with self.session_scope(session) as session:
+            result = await session.execute(
+                select(DocumentCategory.id).where(DocumentCategory.id == category_id)
+            )
+            return result.first() is not None
     
-    def get_category(self, category_id: str) -> Optional[DocumentCategory]:
+    async def get_category(self, category_id: str, session: Optional[AsyncSession] = None) -> Optional[DocumentCategory]:
         """
         Get a document category by ID
         
@@ -46,75 +244,172 @@ class DocumentService:
         Returns:
             DocumentCategory or None: The category if found, None otherwise
         """
-        session = self.get_session()
-        try:
-            return session.query(DocumentCategory).filter(
-                DocumentCategory.id == category_id
-            ).first()
-        finally:
-            session.close()
+        async with self.session_scope(session) as session:
+            return await session.get(DocumentCategory, category_id)
     
-    def create_document(self, user_id: str, category_id: str, file: UploadFile) -> Document:
+    async def create_document(
+        self,
+        user_id: str,
+        category_id: str,
+        original_filename: str,
+        stored_file: StoredFile,
+        session: Optional[AsyncSession] = None
+    ) -> Document:
         """
-        Create a document record in the database
+        Create a document record in the database for a file already on disk
         
         Args:
             user_id: The user ID
             category_id: The category ID
-            file: The uploaded file
+            original_filename: The filename the client uploaded
+            stored_file: Location and metadata of the stored upload
             
         Returns:
             Document: The created document record
         """
-        session = self.get_session()
-        try:
-            # Create user if not exists
-            user = session.query(User).filter(User.id == user_id).first()
-            if not user:
-                user = User(id=user_id)
-                session.add(user)
-                session.commit()
-                session.refresh(user)
-            
-            # Generate unique filename
-            import uuid
-            import datetime
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            file_extension = os.path.splitext(file.filename)[1]
-            unique_filename = f"{timestamp}_{uuid.uuid4().hex[:8]}{file_extension}"
-            
-            # Save file to organized directory structure
-            user_upload_dir = os.path.join("uploads", user_id, category_id)
-            os.makedirs(user_upload_dir, exist_ok=True)
-            file_path = os.path.join(user_upload_dir, unique_filename)
-            
-            # Save file content
-            with open(file_path, "wb") as buffer:
-                content = file.file.read()
-                buffer.write(content)
-            
-            # Create document record
+        async with self.session_scope(session) as session:
+            await self._ensure_user(session, user_id)
+            
             document = Document(
                 user_id=user_id,
                 category_id=category_id,
-                filename=unique_filename,
-                original_filename=file.filename,
-                file_path=file_path,
-                file_size=len(content),
-                mime_type=file.content_type,
+                filename=stored_file.filename,
+                original_filename=original_filename,
+                file_path=stored_file.file_path,
+                file_size=stored_file.file_size,
+                mime_type=stored_file.mime_type,
+                content_hash=stored_file.content_hash,
+                blob_hash=_blob_hash(stored_file),
                 status="uploaded"
             )
             
+            await self.acquire_blobs(session, [stored_file])
             session.add(document)
-            session.commit()
-            session.refresh(document)
+            await session.execute(documents_changed([user_id]))
+            await session.commit()
+            await session.refresh(document)
+            self.events.publish(user_id, "created", _created_event(document))
             
             return document
+    
+    async def create_documents(
+        self,
+        user_id: str,
+        uploads: List[Tuple[str, str, StoredFile]],
+        session: Optional[AsyncSession] = None
+    ) -> List[Document]:
+        """
+        Create records for several stored files in a single transaction
+        
+        Args:
+            user_id: The user ID
+            uploads: (category_id, original_filename, stored_file) per file
+            
+        Returns:
+            List[Document]: The created document records, in input order
+        """
+        async with self.session_scope(session) as session:
+            await self._ensure_user(session, user_id)
             
-        finally:
-            session.close()
+            documents = [
+                Document(
+                    user_id=user_id,
+                    category_id=category_id,
+                    filename=stored_file.filename,
+                    original_filename=original_filename,
+                    file_path=stored_file.file_path,
+                    file_size=stored_file.file_size,
+                    mime_type=stored_file.mime_type,
+                    content_hash=stored_file.content_hash,
+                    blob_hash=_blob_hash(stored_file),
+                    status="uploaded"
+                )
+                for category_id, original_filename, stored_file in uploads
+            ]
+            
+            await self.acquire_blobs(session, [stored_file for _, _, stored_file in uploads])
+            session.add_all(documents)
+            await session.execute(documents_changed([user_id]))
+            await session.commit()
+            for document in documents:
+                self.events.publish(user_id, "created", _created_event(document))
+            
+            return documents
     
-    def get_user_documents(self, user_id: str) -> List[DocumentResponse]:
+    async def get_existing_category_ids(self, category_ids: Iterable[str], session: Optional[AsyncSession] = None) -> Set[str]:
+        """
+        Look up which of the given category IDs exist, in one query
+        
+        Args:
+            category_ids: The category IDs to check
+            
+        Returns:
+            Set[str]: The IDs that exist
+        """
+        async with self.session_scope(session) as session:
+            result = await session.execute(
+                select(DocumentCategory.id).where(DocumentCategory.id.in_(set(category_ids)))
+            )
+            return set(result.scalars())
+    
+    async def _ensure_user(self, session: AsyncSession, user_id: str) -> None:
+        """Create the user if missing, tolerating concurrent creation of the same ID"""
+        if await session.get(User, user_id) is not None:
+            return
+        insert = _dialect_insert(session.bind.dialect.name)
+        if insert is None:
+            session.add(User(id=user_id))
+            return
+        await session.execute(
+            insert(User).values(id=user_id).on_conflict_do_nothing(index_elements=[User.id])
+        )
+    
+    async def acquire_blobs(self, session: AsyncSession, stored_files: Iterable[StoredFile]) -> None:
+        """Add one reference per interned file to its blob, in the caller's transaction"""
+        for stored_file, count in _blob_references(stored_files):
+            statement = _blob_upsert(session.bind.dialect.name, stored_file, count)
+            if statement is not None:
+                await session.execute(statement)
+                continue
+            result = await session.execute(
+                update(Blob).where(Blob.hash == stored_file.content_hash).values(refcount=Blob.refcount + count)
+            )
+            if result.rowcount == 0:
+                session.add(Blob(hash=stored_file.content_hash, path=stored_file.blob_path, size=stored_file.file_size, refcount=count))
+    
+    async def release_blobs(self, session: AsyncSession, blob_hashes: Iterable[Optional[str]]) -> Dict[str, str]:
+        """
+        Drop one reference per hash, in the caller's transaction
+        
+        Returns:
+            Dict[str, str]: Path by hash of blobs no longer referenced, to
+            unlink after commit while holding their blob_lock
+        """
+        counts = Counter(blob_hash for blob_hash in blob_hashes if blob_hash)
+        if not counts:
+            return {}
+        for blob_hash, count in counts.items():
+            await session.execute(update(Blob).where(Blob.hash == blob_hash).values(refcount=Blob.refcount - count))
+        unreferenced = and_(Blob.hash.in_(list(counts)), Blob.refcount <= 0)
+        result = await session.execute(select(Blob.hash, Blob.path).where(unreferenced))
+        paths = dict(result.all())
+        await session.execute(delete(Blob).where(unreferenced))
+        return paths
+    
+    async def still_referenced_blobs(self, blob_hashes: Iterable[str]) -> Set[str]:
+        """
+        Hashes whose blob was counted again after being released
+        
+        Runs in a fresh transaction, so it sees references committed by
+        uploads since the release.
+        """
+        async with self.session_scope() as session:
+            result = await session.execute(
+                select(Blob.hash).where(Blob.hash.in_(list(blob_hashes)), Blob.refcount > 0)
+            )
+            return set(result.scalars())
+    
+    async def get_user_documents(self, user_id: str, session: Optional[AsyncSession] = None) -> List[DocumentResponse]:
         """
         Get all documents for a user
         
@@ -124,33 +419,60 @@ class DocumentService:
         Returns:
             List[DocumentResponse]: List of documents with metadata
         """
-        session = self.get_session()
-        try:
-            documents = session.query(Document).filter(
-                Document.user_id == user_id
-            ).order_by(Document.created_at.desc()).all()
-            
-            return [
-                DocumentResponse(
-                    id=doc.id,
-                    user_id=doc.user_id,
-                    category_id=doc.category_id,
-                    filename=doc.filename,
-                    original_filename=doc.original_filename,
-                    file_path=doc.file_path,
-                    file_size=doc.file_size,
-                    mime_type=doc.mime_type,
-                    status=doc.status,
-                    status_message=doc.status_message,
-                    created_at=doc.created_at,
-                    updated_at=doc.updated_at
-                )
-                for doc in documents
-            ]
-        finally:
-            session.close()
+        async with self.session_scope(session) as session:
+            rows = await session.execute(user_documents_query(user_id, dialect_name=session.bind.dialect.name))
+            return [DocumentResponse(**row._mapping) for row in rows]
     
-    def delete_document(self, document_id: str) -> bool:
+    async def get_documents_version(self, user_id: str, session: Optional[AsyncSession] = None) -> int:
+        """
+        Get the user's documents version, which changes whenever one of
+        their documents is created, deleted or changes status
+        
+        Args:
+            user_id: The user ID
+            
+        Returns:
+            int: The version, 0 for users without documents
+        """
+        async with self.session_scope(session) as session:
+            result = await session.execute(
+                select(User.documents_version).where(User.id == user_id)
+            )
+            return result.scalar() or 0
+    
+    async def get_user_documents_page(
+        self,
+        user_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        session: Optional[AsyncSession] = None
+    ) -> DocumentPage:
+        """
+        Get one page of a user's documents, newest first
+        
+        Args:
+            user_id: The user ID to retrieve documents for
+            limit: Maximum number of documents in the page
+            cursor: next_cursor from the previous page, if any
+            
+        Returns:
+            DocumentPage: The documents and the cursor for the next page,
+            which is None on the last page
+            
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        async with self.session_scope(session) as session:
+            dialect_name = session.bind.dialect.name
+            after = decode_cursor(cursor, dialect_name) if cursor is not None else None
+            
+            # Fetch one extra row to learn whether another page exists
+            rows = (await session.execute(user_documents_query(user_id, after, limit + 1, dialect_name))).all()
+            documents = [DocumentResponse(**row._mapping) for row in rows[:limit]]
+            next_cursor = encode_cursor(rows[limit - 1].sort_key, rows[limit - 1].id) if len(rows) > limit else None
+            return DocumentPage(documents=documents, next_cursor=next_cursor)
+    
+    async def delete_document(self, document_id: str, session: Optional[AsyncSession] = None) -> bool:
         """
         Delete a document and all associated metadata and file from disk.
         Args:
@@ -158,19 +480,500 @@ class DocumentService:
         Returns:
             bool: True if deleted, False if not found
         """
-        session = self.get_session()
-        try:
-            doc = session.query(Document).filter(Document.id == document_id).first()
+        result = await self.delete_documents(document_ids=[document_id], session=session)
+        return result.deleted > 0
+    
+    async def delete_documents(
+        self,
+        document_ids: Optional[List[str]] = None,
+        user_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+        session: Optional[AsyncSession] = None
+    ) -> BulkDeleteResult:
+        """
+        Delete documents by ID list, by user, or by user and category
+        
+        Rows and their status history are removed with set-based DELETEs in
+        one transaction, which also releases their blob references. Files
+        (and blobs left unreferenced) are unlinked afterwards on a bounded
+        thread pool; a file that cannot be removed is reported, not retried.
+        
+        Args:
+            document_ids: Delete these documents
+            user_id: Delete all documents of this user (when no IDs are given)
+            category_id: Restrict a per-user delete to one category
+            
+        Returns:
+            BulkDeleteResult: Rows deleted, files removed and file failures
+        """
+        if document_ids is not None:
+            condition = Document.id.in_(document_ids)
+        elif user_id is not None:
+            condition = Document.user_id == user_id
+            if category_id is not None:
+                condition = and_(condition, Document.category_id == category_id)
+        else:
+            raise ValueError("Provide either document_ids or user_id")
+        
+        async with self.session_scope(session) as session:
+            result = await session.execute(
+                select(Document.file_path, Document.blob_hash, Blob.path, Document.user_id, Document.id)
+                .outerjoin(Blob, Blob.hash == Document.blob_hash)
+                .where(condition)
+            )
+            rows = result.all()
+            # A file that is a shared blob itself is only removed with its last reference
+            file_paths = [file_path for file_path, _, blob_path, _, _ in rows if file_path and file_path != blob_path]
+            
+            history_ids = select(DocumentStatusHistory.id).where(
+                DocumentStatusHistory.document_id.in_(select(Document.id).where(condition))
+            )
+            await session.execute(
+                delete(DocumentStatusPayload).where(DocumentStatusPayload.history_id.in_(history_ids))
+            )
+            await session.execute(
+                delete(DocumentStatusHistory).where(
+                    DocumentStatusHistory.document_id.in_(select(Document.id).where(condition))
+                )
+            )
+            deleted = await session.execute(delete(Document).where(condition))
+            blob_paths = await self.release_blobs(session, [blob_hash for _, blob_hash, _, _, _ in rows])
+            if rows:
+                await session.execute(documents_changed(owner for _, _, _, owner, _ in rows))
+            await session.commit()
+        
+        deleted_ids: Dict[str, List[str]] = {}
+        for _, _, _, owner, document_id in rows:
+            deleted_ids.setdefault(owner, []).append(document_id)
+        for owner, ids in deleted_ids.items():
+            self.events.publish(owner, "deleted", {"document_ids": ids})
+        
+        outcome = BulkDeleteResult(deleted=deleted.rowcount)
+        loop = asyncio.get_running_loop()
+        # An upload may have linked one of the released blobs before the
+        # release and committed its reference since; such blobs are kept
+        async with blob_lock(blob_paths):
+            if blob_paths:
+                for blob_hash in await self.still_referenced_blobs(blob_paths):
+                    del blob_paths[blob_hash]
+            file_paths += blob_paths.values()
+            removals = await asyncio.gather(
+                *(loop.run_in_executor(_file_removal_pool, _remove_if_exists, path) for path in file_paths),
+                return_exceptions=True
+            )
+        for path, error in zip(file_paths, removals):
+            if isinstance(error, Exception):
+                outcome.failures.append({"file_path": path, "error": str(error)})
+            else:
+                outcome.files_removed += 1
+        return outcome
+    
+    async def get_document(self, document_id: str, session: Optional[AsyncSession] = None) -> Optional[Document]:
+        """
+        Get a document by ID
+        
+        Args:
+            document_id: The document ID to retrieve
+            
+        Returns:
+            Document or None: The document if found, None otherwise
+        """
+        async with self.session_scope(session) as session:
+            return await session.get(Document, document_id)
+    
+    async def update_status(
+        self,
+        document_id: str,
+        status: str,
+        status_message: Optional[str] = None,
+        details: Optional[Dict[str, Any]] = None,
+        claimed_by: Optional[str] = None,
+        session: Optional[AsyncSession] = None
+    ) -> bool:
+        """
+        Update a document's status and append a status history entry
+        
+        Args:
+            document_id: The document ID to update
+            status: The new status
+            status_message: Human-readable progress message
+            details: Optional payload recorded in the history entry
+            claimed_by: Only update while this worker holds the document's
+                job, renewing its lease (see claim_job)
+            
+        Returns:
+            bool: True if updated, False if not found or the claim was lost
+        """
+        # Compressing a full analysis takes a few milliseconds
+        summary, payload = await asyncio.to_thread(pack_details, details) if details else (details, None)
+        async with self.session_scope(session) as session:
+            doc = await session.get(Document, document_id)
             if not doc:
                 return False
-            # Delete status history
-            session.query(DocumentStatusHistory).filter(DocumentStatusHistory.document_id == document_id).delete()
-            # Delete file from disk
-            if doc.file_path and os.path.exists(doc.file_path):
-                os.remove(doc.file_path)
-            # Delete document
-            session.delete(doc)
-            session.commit()
+            if claimed_by is not None:
+                result = await session.execute(
+                    update(Document).where(
+                        Document.id == document_id,
+                        Document.job_claimed_by == claimed_by
+                    ).values(
+                        status=status,
+                        status_message=status_message,
+                        job_claimed_at=datetime.datetime.now(datetime.timezone.utc)
+                    ).execution_options(synchronize_session=False)
+                )
+                if result.rowcount == 0:
+                    await session.rollback()
+                    return False
+            else:
+                doc.status = status
+                doc.status_message = status_message
+            entries = _status_entry(document_id, status, summary, payload)
+            session.add_all(entries)
+            await session.execute(documents_changed([doc.user_id]))
+            await session.commit()
+            self._publish_status(doc.user_id, entries[0], status_message, summary)
+            return True
+    
+    async def set_category(self, document_id: str, category_id: str, session: Optional[AsyncSession] = None) -> bool:
+        """
+        Recategorize a document, e.g. after a background classification
+        
+        Only the record changes; the stored file stays at the path it was
+        uploaded to, which document listings and downloads read from the
+        record anyway.
+        
+        Args:
+            document_id: The document ID to update
+            category_id: The new category ID
+            
+        Returns:
+            bool: True if updated, False if not found
+        """
+        async with self.session_scope(session) as session:
+            doc = await session.get(Document, document_id)
+            if not doc:
+                return False
+            doc.category_id = category_id
+            await session.execute(documents_changed([doc.user_id]))
+            await session.commit()
+            self.events.publish(doc.user_id, "category", {"document_id": document_id, "category_id": category_id})
+            return True
+    
+    async def claim_job(
+        self,
+        document_id: str,
+        worker_id: str,
+        status_message: Optional[str] = None,
+        session: Optional[AsyncSession] = None
+    ) -> bool:
+        """
+        Atomically take a document's analysis job and move it to processing
+        
+        The job is claimable when it is queued, or processing under a claim
+        older than JOB_LEASE_SECONDS (its worker died), and has been started
+        fewer than JOB_MAX_ATTEMPTS times. Of several workers or processes
+        claiming the same job, exactly one succeeds.
+        
+        Args:
+            document_id: The document whose job to claim
+            worker_id: Identifies the claiming worker
+            status_message: Progress message recorded with the claim
+            
+        Returns:
+            bool: True if this worker now holds the job
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        async with self.session_scope(session) as session:
+            result = await session.execute(
+                update(Document).where(
+                    Document.id == document_id,
+                    Document.job_attempts < Config.JOB_MAX_ATTEMPTS,
+                    _claimable(now)
+                ).values(
+                    status="processing",
+                    status_message=status_message,
+                    job_claimed_by=worker_id,
+                    job_claimed_at=now,
+                    job_attempts=Document.job_attempts + 1
+                ).execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                await session.rollback()
+                return False
+            user_id = (await session.execute(
+                select(Document.user_id).where(Document.id == document_id)
+            )).scalar_one()
+            entries = _status_entry(document_id, "processing", None, None)
+            session.add_all(entries)
+            await session.execute(documents_changed([user_id]))
+            await session.commit()
+            self._publish_status(user_id, entries[0], status_message, None)
+            return True
+    
+    async def release_job(
+        self,
+        document_id: str,
+        worker_id: str,
+        status_message: Optional[str] = None,
+        session: Optional[AsyncSession] = None
+    ) -> bool:
+        """
+        Put a claimed job back in the queue without using up an attempt,
+        e.g. when an upstream service is throttling or unavailable
+        
+        Args:
+            document_id: The document whose job to release
+            worker_id: The worker holding the claim
+            status_message: Why the job is waiting
+            
+        Returns:
+            bool: True if released, False if the claim was lost
+        """
+        async with self.session_scope(session) as session:
+            result = await session.execute(
+                update(Document).where(
+                    Document.id == document_id,
+                    Document.job_claimed_by == worker_id
+                ).values(
+                    status="queued",
+                    status_message=status_message,
+                    job_claimed_by=None,
+                    job_claimed_at=None,
+                    job_attempts=Document.job_attempts - 1
+                ).execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                await session.rollback()
+                return False
+            user_id = (await session.execute(
+                select(Document.user_id).where(Document.id == document_id)
+            )).scalar_one()
+            entries = _status_entry(document_id, "queued", None, None)
+            session.add_all(entries)
+            await session.execute(documents_changed([user_id]))
+            await session.commit()
+            self._publish_status(user_id, entries[0], status_message, None)
             return True
-        finally:
-            session.close() 
\ No newline at end of file
+    
+    async def get_claimable_job_ids(self, include_queued: bool = True, session: Optional[AsyncSession] = None) -> List[str]:
+        """
+        Get the IDs of jobs claim_job would accept, oldest first
+        
+        Args:
+            include_queued: Also return queued jobs, not only processing
+                jobs whose claim expired
+            
+        Returns:
+            List[str]: Matching document IDs
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        condition = _claimable(now) if include_queued else _lease_expired(now)
+        async with self.session_scope(session) as session:
+            result = await session.execute(
+                select(Document.id).where(
+                    condition,
+                    Document.job_attempts < Config.JOB_MAX_ATTEMPTS
+                ).order_by(Document.created_at.asc())
+            )
+            return list(result.scalars())
+    
+    async def fail_abandoned_jobs(self, session: Optional[AsyncSession] = None) -> List[str]:
+        """
+        Mark failed the jobs whose claim expired after their last allowed
+        attempt, so a document that crashes its worker is not retried forever
+        
+        Returns:
+            List[str]: The IDs of the failed documents
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        async with self.session_scope(session) as scoped:
+            result = await scoped.execute(
+                select(Document.id, Document.job_claimed_by).where(
+                    _lease_expired(now),
+                    Document.job_attempts >= Config.JOB_MAX_ATTEMPTS
+                )
+            )
+            abandoned = result.all()
+            failed = []
+            for document_id, claimed_by in abandoned:
+                # Conditional on the stale claim, so only one process records it
+                if await self.update_status(
+                    document_id, "failed", "Analysis failed",
+                    {"error": f"Analysis did not finish after {Config.JOB_MAX_ATTEMPTS} attempts"},
+                    claimed_by=claimed_by, session=scoped
+                ):
+                    failed.append(document_id)
+            return failed
+    
+    def _publish_status(
+        self,
+        user_id: str,
+        entry: DocumentStatusHistory,
+        status_message: Optional[str],
+        summary: Optional[Dict[str, Any]]
+    ) -> None:
+        self.events.publish(user_id, "status", {
+            "document_id": entry.document_id,
+            "status": entry.status,
+            "status_message": status_message,
+            "history": {
+                "status": entry.status,
+                "details": summary,
+                "created_at": entry.created_at.isoformat(),
+            },
+        })
+    
+    async def get_status_history(self, document_id: str, session: Optional[AsyncSession] = None) -> List[DocumentStatusHistory]:
+        """
+        Get the status history of a document, oldest first
+        
+        Args:
+            document_id: The document ID
+            
+        Returns:
+            List[DocumentStatusHistory]: The history entries
+        """
+        async with self.session_scope(session) as session:
+            result = await session.execute(
+                select(DocumentStatusHistory).where(
+                    DocumentStatusHistory.document_id == document_id
+                ).order_by(DocumentStatusHistory.created_at.asc())
+            )
+            return list(result.scalars())
+    
+    async def get_status_details(self, entry: DocumentStatusHistory, session: Optional[AsyncSession] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the full details of a history entry
+        
+        History listings only carry the inline summary; details stored out
+        of row are loaded and decompressed here, on demand.
+        
+        Args:
+            entry: An entry returned by get_status_history
+            
+        Returns:
+            Optional[Dict[str, Any]]: The details as passed to update_status
+        """
+        if entry.payload_size is None:
+            return entry.details
+        async with self.session_scope(session) as session:
+            payload = await session.get(DocumentStatusPayload, entry.id)
+            if payload is None:
+                return entry.details
+            return await asyncio.to_thread(unpack_details, payload.codec, payload.data)
+    
+    async def get_completed_details(self, document_id: str, session: Optional[AsyncSession] = None) -> Dict[str, Any]:
+        """
+        Get the full details (validation and analysis) of a document's
+        latest completed status entry
+        
+        Args:
+            document_id: The document ID
+            
+        Returns:
+            Dict[str, Any]: The details, empty if the document never completed
+        """
+        async with self.session_scope(session) as session:
+            result = await session.execute(
+                select(DocumentStatusHistory).where(
+                    DocumentStatusHistory.document_id == document_id,
+                    DocumentStatusHistory.status == "completed"
+                ).order_by(DocumentStatusHistory.created_at.desc())
+            )
+            for entry in result.scalars():
+                if entry.details or entry.payload_size is not None:
+                    return await self.get_status_details(entry, session=session) or {}
+            return {}
+
+class DocumentService:
+    """
+    Blocking facade over AsyncDocumentService for scripts
+
+    Each call runs the async method to completion on the facade's own event
+    loop, over the shared async engine, so scripts get the same blob
+    references, status history and change events as the API without a
+    second copy of the queries. Not for use inside request handlers; close
+    it (or use it as a context manager) when done.
+    """
+
+    def __init__(self, events: Optional[DocumentEventBus] = None):
+        self.service = AsyncDocumentService(events)
+        self._loop = asyncio.new_event_loop()
+
+    def _run(self, coroutine):
+        return self._loop.run_until_complete(coroutine)
+
+    def close(self) -> None:
+        """Release pooled connections opened on this facade's loop"""
+        if self._loop.is_closed():
+            return
+        self._run(async_engine.dispose())
+        self._loop.close()
+
+    def __enter__(self) -> "DocumentService":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def validate_category(self, category_id: str) -> bool:
+        return self._run(self.service.validate_category(category_id))
+
+    def get_category(self, category_id: str) -> Optional[DocumentCategory]:
+        return self._run(self.service.get_category(category_id))
+
+    def create_document(self, user_id: str, category_id: str, original_filename: str, stored_file: StoredFile) -> Document:
+        return self._run(self.service.create_document(user_id, category_id, original_filename, stored_file))
+
+    def create_documents(self, user_id: str, uploads: List[Tuple[str, str, StoredFile]]) -> List[Document]:
+        return self._run(self.service.create_documents(user_id, uploads))
+
+    def get_user_documents(self, user_id: str) -> List[DocumentResponse]:
+        return self._run(self.service.get_user_documents(user_id))
+
+    def get_user_documents_page(self, user_id: str, limit: int, cursor: Optional[str] = None) -> DocumentPage:
+        return self._run(self.service.get_user_documents_page(user_id, limit, cursor))
+
+    def get_document(self, document_id: str) -> Optional[Document]:
+        return self._run(self.service.get_document(document_id))
+
+    def delete_document(self, document_id: str) -> bool:
+        return self._run(self.service.delete_document(document_id))
+
+    def delete_documents(
+        self,
+        document_ids: Optional[List[str]] = None,
+        user_id: Optional[str] = None,
+        category_id: Optional[str] = None
+    ) -> BulkDeleteResult:
+        return self._run(self.service.delete_documents(document_ids, user_id, category_id))
+
+    def update_status(
+        self,
+        document_id: str,
+        status: str,
+        status_message: Optional[str] = None,
+        details: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        return self._run(self.service.update_status(document_id, status, status_message, details))
+
+    def get_status_history(self, document_id: str) -> List[DocumentStatusHistory]:
+        return self._run(self.service.get_status_history(document_id))
+
+    def get_completed_details(self, document_id: str) -> Dict[str, Any]:
+        return self._run(self.service.get_completed_details(document_id))
+
+def _lease_expired(now: datetime.datetime):
+    """Processing jobs whose worker has not renewed its claim within the lease"""
+    cutoff = now - datetime.timedelta(seconds=Config.JOB_LEASE_SECONDS)
+    return and_(
+        Document.status == "processing",
+        or_(Document.job_claimed_at.is_(None), Document.job_claimed_at < cutoff)
+    )
+
+def _claimable(now: datetime.datetime):
+    return or_(Document.status == "queued", _lease_expired(now))
+
+def _remove_if_exists(file_path: str) -> None:
+    if os.path.exists(file_path):
+        os.remove(file_path)
@@ -0,0 +1,88 @@
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+from ..utils.config import Config
+
+class DocumentEventBus:
+    """
+    In-process fan-out of document changes to per-user subscribers
+
+    AsyncDocumentService publishes one event per committed change;
+    every subscriber of the document's user gets it through its own
+    bounded queue, so N open event streams cost one publish rather than N
+    database polls. A subscriber that falls behind has its backlog replaced
+    by a single "resync" event telling it to reload the listing.
+
+    Events only reach subscribers in the same process; with several
+    workers, each client sees the changes made by the worker it is
+    connected to.
+    """
+
+    def __init__(self, queue_size: Optional[int] = None):
+        self.queue_size = Config.EVENTS_QUEUE_SIZE if queue_size is None else queue_size
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.resyncs = 0
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: str) -> AsyncIterator[asyncio.Queue]:
+        """
+        Receive the events of a user's documents while the context is open
+
+        Yields:
+            asyncio.Queue: Events as dicts; None means the bus is closing
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self.subscribers.get(user_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.subscribers[user_id]
+
+    def publish(self, user_id: str, event_type: str, data: Dict[str, Any]) -> None:
+        """
+        Send an event to every subscriber of the user
+
+        Args:
+            user_id: Owner of the changed documents
+            event_type: "created", "status", "category" or "deleted"
+            data: JSON-serializable event payload
+        """
+        queues = self.subscribers.get(user_id)
+        if not queues:
+            return
+        event = {"id": next(self._ids), "event": event_type, "data": data}
+        self.published += 1
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The client missed events; have it reload instead of replaying
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"id": next(self._ids), "event": "resync", "data": {}})
+                self.resyncs += 1
+
+    def close(self) -> None:
+        """End every subscription, e.g. on shutdown"""
+        for queues in self.subscribers.values():
+            for queue in queues:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self.subscribers),
+            "subscribers": sum(len(queues) for queues in self.subscribers.values()),
+            "published": self.published,
+            "resyncs": self.resyncs,
+        }
+
+document_events = DocumentEventBus()
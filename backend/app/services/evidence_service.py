@@ -0,0 +1,237 @@
+import asyncio
+import functools
+import logging
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+from ..utils.config import Config
+
+try:
+    import tiktoken
+except ImportError:  # Token counts are then estimated from length
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Lines that only carry form instructions or office boilerplate
+_BOILERPLATE = re.compile(
+    r"^(?:see (?:separate )?instructions\.?|irs use only.*|do not write or staple.*|omb no\..*"
+    r"|for disclosure, privacy act.*|cat\. no\..*|go to www\.irs\.gov.*|attach forms?\b.*"
+    r"|if you (?:did not|checked).*|instructions\.?)$",
+    re.IGNORECASE
+)
+_INSTRUCTION_REFERENCE = re.compile(
+    r"\((?:see|see separate) instructions[^)]*\)|,?\s*\bsee (?:separate )?instructions\b[.,]?", re.IGNORECASE
+)
+_DOT_LEADERS = re.compile(r"(?:\.\s+){2,}\.?|\.{3,}")
+# Bare line labels such as "1a", "b" or "12"
+_LINE_LABEL = re.compile(r"^\(?[0-9]{0,2}[a-z]?\)?$", re.IGNORECASE)
+_TITLE_LINES = 3
+_AMOUNT = re.compile(r"\$?\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\$\d+|\d+\.\d{2}\b")
+
+@dataclass
+class Evidence:
+    """Prompt evidence fitted to a token budget"""
+    text: str
+    tokens: int
+    dropped_lines: int
+
+class EvidenceBuilder:
+    """
+    Condenses an Azure analysis into the lines worth sending to the model
+
+    Lines are taken in priority order until the token budget is spent: the
+    document title, detected document types, extracted fields and key-value
+    pairs. The remaining text fills what is left, preferring lines with
+    amounts, checked boxes or section headings per token spent, and is
+    kept in document order. Form boilerplate, dot leaders, bare line labels
+    and runs of unchecked boxes are removed first, so the budget goes to
+    what the document says rather than how the form is printed.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None, model: str = "gpt-4"):
+        self.token_budget = Config.VERIFICATION_TOKEN_BUDGET if token_budget is None else token_budget
+        self.model = model
+        # Loaded on first use, or ahead of time by aload_encoding
+        self.encoding = None
+        self.encoding_loaded = False
+
+    def load_encoding(self):
+        """
+        Load the model's tokenizer; on a cold tiktoken cache this downloads
+        the encoding file, so call it off the event loop
+        """
+        self.encoding = _load_encoding(self.model)
+        self.encoding_loaded = True
+        return self.encoding
+
+    async def aload_encoding(self, timeout: Optional[float] = None) -> None:
+        """
+        Load the tokenizer on a worker thread, e.g. at startup
+
+        If it takes longer than timeout (default TOKENIZER_LOAD_TIMEOUT),
+        token counts are estimated until the load completes in the
+        background, rather than holding up startup or a request.
+        """
+        timeout = Config.TOKENIZER_LOAD_TIMEOUT if timeout is None else timeout
+        load = asyncio.ensure_future(asyncio.to_thread(self.load_encoding))
+        try:
+            await asyncio.wait_for(asyncio.shield(load), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Tokenizer for %s still loading after %ss, estimating token counts meanwhile", self.model, timeout)
+            self.encoding_loaded = True
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Tokens of text under the model's tokenizer, or a conservative
+        estimate when tiktoken or its encoding files are unavailable
+        """
+        if not self.encoding_loaded:
+            self.load_encoding()
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return math.ceil(len(text) / 3.5)
+
+    def from_analysis(self, analysis_result: Dict[str, Any]) -> Evidence:
+        """
+        Build evidence from an Azure result (single document or packet)
+
+        Args:
+            analysis_result: The Azure result containing analyzeResult
+
+        Returns:
+            Evidence: Prompt text within the token budget
+        """
+        analyze_result = analysis_result.get('analyzeResult', {})
+        lines = clean_lines(analyze_result.get('content', ''))
+        priority = [
+            lines[:_TITLE_LINES],
+            [
+                f"Document type: {document.get('docType')} (confidence {document.get('confidence', 0):.2f})"
+                for document in analyze_result.get('documents') or []
+                if document.get('docType')
+            ],
+            [
+                f"{name}: {value}"
+                for document in analyze_result.get('documents') or []
+                for name, value in _flatten_fields(document.get('fields') or {})
+            ],
+            list(_key_value_lines(analyze_result.get('keyValuePairs') or [])),
+        ]
+        return self._fit(priority, lines[_TITLE_LINES:])
+
+    def from_content(self, content: str) -> Evidence:
+        """
+        Build evidence from extracted text alone
+        """
+        lines = clean_lines(content)
+        return self._fit([lines[:_TITLE_LINES]], lines[_TITLE_LINES:])
+
+    def _fit(self, priority: List[List[str]], text_lines: List[str]) -> Evidence:
+        selected: List[str] = []
+        seen = set()
+        tokens = dropped = 0
+        for line in (line for section in priority for line in section):
+            if line in seen:
+                continue
+            seen.add(line)
+            # Lines are joined with newlines, one token each
+            cost = self.count_tokens(line) + 1
+            if tokens + cost > self.token_budget:
+                dropped += 1
+                continue
+            selected.append(line)
+            tokens += cost
+
+        candidates = []
+        for index, line in enumerate(text_lines):
+            if line in seen:
+                continue
+            seen.add(line)
+            cost = self.count_tokens(line) + 1
+            candidates.append((_line_value(line) / cost, index, line, cost))
+        chosen = []
+        for _, index, line, cost in sorted(candidates, key=lambda item: (-item[0], item[1])):
+            if tokens + cost > self.token_budget:
+                dropped += 1
+                continue
+            chosen.append((index, line))
+            tokens += cost
+        selected += [line for _, line in sorted(chosen)]
+        return Evidence(text="\n".join(selected), tokens=tokens, dropped_lines=dropped)
+
+def _line_value(line: str) -> float:
+    """Rough information content of a text line, before its token cost"""
+    value = 1.0
+    if _AMOUNT.search(line):
+        value += 2
+    if "[x]" in line:
+        value += 2
+    words = line.split()
+    # Section headings such as "Filing Status" or "Amount You Owe"
+    if len(words) <= 4 and line[0].isupper() and not _AMOUNT.search(line):
+        value += 1
+    return value
+
+def clean_lines(content: str) -> List[str]:
+    """
+    Split extracted text into lines with print artifacts removed
+    """
+    lines = []
+    for line in content.splitlines():
+        line = _INSTRUCTION_REFERENCE.sub("", line)
+        line = _DOT_LEADERS.sub(" ", line)
+        line = line.replace(":unselected:", "[ ]").replace(":selected:", "[x]")
+        line = re.sub(r"(?:\[ \]\s*){2,}", "[ ] ", line)
+        line = re.sub(r"\s+", " ", line).strip(" .,")
+        if not line or _LINE_LABEL.match(line) or _BOILERPLATE.match(line):
+            continue
+        if line.replace("[ ]", "").strip() == "":
+            continue
+        lines.append(line)
+    return lines
+
+def _flatten_fields(fields: Dict[str, Any], prefix: str = "") -> Iterable:
+    """Yield (name, value) for every field that has a value, nested ones dotted"""
+    for name, field in fields.items():
+        if not isinstance(field, dict):
+            continue
+        path = f"{prefix}{name}"
+        if 'valueObject' in field:
+            yield from _flatten_fields(field['valueObject'] or {}, f"{path}.")
+        elif 'valueArray' in field:
+            for index, item in enumerate(field['valueArray'] or []):
+                yield from _flatten_fields({str(index + 1): item}, f"{path}.")
+        else:
+            value = _field_value(field)
+            if value not in (None, ""):
+                yield path, value
+
+def _field_value(field: Dict[str, Any]) -> Any:
+    if 'valueCurrency' in field:
+        return (field['valueCurrency'] or {}).get('amount')
+    if 'valueAddress' in field:
+        return field.get('content')
+    for key, value in field.items():
+        if key.startswith('value'):
+            return value
+    return field.get('content')
+
+def _key_value_lines(pairs: List[Dict[str, Any]]) -> Iterable[str]:
+    for pair in pairs:
+        key = clean_lines((pair.get('key') or {}).get('content', ''))
+        value = clean_lines((pair.get('value') or {}).get('content', ''))
+        if key and value:
+            yield f"{' '.join(key)}: {' '.join(value)}"
+
+@functools.lru_cache(maxsize=None)
+def _load_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        # Unknown model names or encoding files that cannot be downloaded
+        logger.warning("Tokenizer for %s unavailable, estimating token counts: %s", model, e)
+        return None
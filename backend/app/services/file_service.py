@@ -1,13 +1,87 @@
 import os
+import asyncio
+import datetime
+import hashlib
+import uuid
+import weakref
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, replace
+from typing import AsyncIterator, Iterable, List, Optional
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 from ..utils.config import Config
 
+CHUNK_SIZE = 1024 * 1024  # 1 MB per read keeps upload memory constant
+SNIFF_BYTES = 8
+
+# Container formats shared by several extensions are resolved by extension
+_OOXML_TYPES = {
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+_OLE_TYPES = {
+    '.xls': 'application/vnd.ms-excel',
+    '.doc': 'application/msword',
+}
+
+def sniff_mime_type(head: bytes, filename: str) -> Optional[str]:
+    """
+    Detect a MIME type from the leading bytes of a file
+    
+    Args:
+        head: The first bytes of the file
+        filename: The original filename, used to disambiguate containers
+        
+    Returns:
+        str or None: The detected MIME type, None if unrecognized
+    """
+    extension = os.path.splitext(filename.lower())[1]
+    if head.startswith(b'%PDF'):
+        return 'application/pdf'
+    if head.startswith(b'PK\x03\x04'):
+        return _OOXML_TYPES.get(extension, 'application/zip')
+    if head.startswith(b'\xd0\xcf\x11\xe0'):
+        return _OLE_TYPES.get(extension, 'application/x-ole-storage')
+    if extension == '.csv':
+        return 'text/csv'
+    return None
+
+# One lock per content hash, dropped once no task holds or waits on it
+_blob_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+@asynccontextmanager
+async def blob_lock(content_hashes: Iterable[str]) -> AsyncIterator[None]:
+    """
+    Serialize interning and releasing of blobs with these hashes
+    
+    An upload holds the lock from linking its blob until its reference is
+    committed, and a delete holds it while it re-checks and unlinks blobs
+    it released, so a delete cannot unlink a blob an upload has just linked
+    but not yet counted. Locks are taken in hash order to avoid deadlocks.
+    """
+    locks = [_blob_locks.setdefault(content_hash, asyncio.Lock()) for content_hash in sorted(set(content_hashes))]
+    async with AsyncExitStack() as stack:
+        for lock in locks:
+            await stack.enter_async_context(lock)
+        yield
+
+@dataclass
+class StoredFile:
+    """Result of streaming an upload to disk"""
+    filename: str
+    file_path: str
+    file_size: int
+    content_hash: str
+    mime_type: Optional[str]
+    blob_path: Optional[str] = None  # Set once the file is linked into the blob store
+
 class FileService:
     """Service for file operations"""
     
     def __init__(self):
         Config.setup_upload_folder()
         self.upload_folder = Config.UPLOAD_FOLDER
+        self.blob_folder = Config.BLOB_FOLDER
     
     def save_uploaded_file(self, file: UploadFile) -> str:
         """
@@ -45,9 +119,9 @@ class FileService:
         """
         max_size_bytes = max_size_mb * 1024 * 1024
         
-        # Read file content to get size
-        content = file.file.read()
-        file_size = len(content)
+        # Seek to the end for the size instead of reading the content
+        file.file.seek(0, os.SEEK_END)
+        file_size = file.file.tell()
         
         # Reset file pointer for later use
         file.file.seek(0)
@@ -62,8 +136,178 @@ class FileService:
         if not file.filename.lower().endswith('.pdf'):
             raise ValueError("Only PDF files are supported")
     
-    def read_file_content(self, file: UploadFile) -> bytes:
+    async def read_file_content(self, file: UploadFile) -> bytes:
         """
         Read the content of an uploaded file
+
+        Uploads spooled to disk are read on the thread pool, not the event loop.
+        """
+        return await file.read()
+    
+    def upload_directory(self, user_id: str, category_id: str) -> str:
+        """
+        Directory holding a user's uploads for a category
+        """
+        return os.path.normpath(os.path.join(self.upload_folder, user_id, category_id))
+    
+    async def store_upload(
+        self,
+        file: UploadFile,
+        directory: str,
+        max_size_mb: int = 10
+    ) -> StoredFile:
+        """
+        Stream an upload to disk in a single pass
+        
+        Size, SHA-256 and MIME type are computed from the same fixed-size
+        chunks that are written, so memory use does not depend on the file
+        size. Blocking file I/O runs in the thread pool. The partial file is
+        removed if the size limit is crossed or the write fails.
+        
+        Args:
+            file: The uploaded file
+            directory: Directory to store the file in
+            max_size_mb: Maximum allowed size in megabytes
+            
+        Returns:
+            StoredFile: Location and metadata of the stored file
+        """
+        max_size_bytes = max_size_mb * 1024 * 1024
+        if file.size is not None and file.size > max_size_bytes:
+            raise ValueError(f"File size ({file.size} bytes) exceeds maximum allowed size ({max_size_bytes} bytes)")
+        
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        file_extension = os.path.splitext(file.filename)[1]
+        unique_filename = f"{timestamp}_{uuid.uuid4().hex[:8]}{file_extension}"
+        file_path = os.path.join(directory, unique_filename)
+        
+        await run_in_threadpool(os.makedirs, directory, exist_ok=True)
+        buffer = await run_in_threadpool(open, file_path, "wb")
+        digest = hashlib.sha256()
+        file_size = 0
+        head = b""
+        try:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                file_size += len(chunk)
+                if file_size > max_size_bytes:
+                    raise ValueError(f"File size exceeds maximum allowed size ({max_size_bytes} bytes)")
+                if len(head) < SNIFF_BYTES:
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                digest.update(chunk)
+                await run_in_threadpool(buffer.write, chunk)
+            await run_in_threadpool(buffer.close)
+        except BaseException:
+            await run_in_threadpool(buffer.close)
+            await run_in_threadpool(self.remove_file, file_path)
+            raise
+        
+        stored_file = StoredFile(
+            filename=unique_filename,
+            file_path=file_path,
+            file_size=file_size,
+            content_hash=digest.hexdigest(),
+            mime_type=sniff_mime_type(head, file.filename) or file.content_type
+        )
+        return stored_file
+    
+    @asynccontextmanager
+    async def interned(self, stored_files: List[StoredFile]) -> AsyncIterator[List[StoredFile]]:
+        """
+        Link stored uploads into the blob store while holding their blob locks
+        
+        Create the document records inside the block, so the blob references
+        are committed before a concurrent delete can release the same blobs.
+        Without content-addressed storage the files are yielded unchanged. If
+        linking fails, all of the uploads are removed.
+        
+        Args:
+            stored_files: Files written by store_upload
+            
+        Yields:
+            List[StoredFile]: The files with blob_path (and possibly file_path) set
+        """
+        if Config.STORAGE_MODE != "content_addressed":
+            yield stored_files
+            return
+        
+        async with blob_lock(stored_file.content_hash for stored_file in stored_files):
+            interned = []
+            try:
+                for stored_file in stored_files:
+                    interned.append(await run_in_threadpool(self.intern_blob, stored_file))
+            except BaseException:
+                for stored_file in interned:
+                    await run_in_threadpool(self.discard_upload, stored_file)
+                for stored_file in stored_files[len(interned):]:
+                    await run_in_threadpool(self.remove_file, stored_file.file_path)
+                raise
+            yield interned
+    
+    def remove_file(self, file_path: str) -> None:
+        """
+        Remove a stored file if it exists
+        """
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+    
+    def blob_path(self, content_hash: str) -> str:
+        """
+        Location of a blob, fanned out by hash prefix (e.g. ab/cd/abcd...)
+        """
+        return os.path.join(self.blob_folder, content_hash[:2], content_hash[2:4], content_hash)
+    
+    def intern_blob(self, stored_file: StoredFile) -> StoredFile:
+        """
+        Link a stored file into the content-addressed blob store
+        
+        The first copy of some content becomes the blob. For later copies
+        the upload is swapped for a hardlink to the existing blob, so the
+        original path layout keeps working while the data is stored once.
+        Where hardlinks are unsupported the document references the blob
+        path directly.
+        
+        Args:
+            stored_file: A file written by store_upload
+            
+        Returns:
+            StoredFile: The same file with blob_path (and possibly file_path) set
+        """
+        blob_path = self.blob_path(stored_file.content_hash)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        interned = replace(stored_file, blob_path=blob_path)
+        
+        try:
+            os.link(stored_file.file_path, blob_path)
+            return interned
+        except FileExistsError:
+            pass
+        except OSError:
+            # No hardlinks (e.g. some network filesystems): move the upload into the store
+            if not os.path.exists(blob_path):
+                os.replace(stored_file.file_path, blob_path)
+                return replace(interned, file_path=blob_path)
+        
+        # Content already stored: replace the upload with a link to the blob
+        link_path = f"{stored_file.file_path}.link"
+        try:
+            os.link(blob_path, link_path)
+            os.replace(link_path, stored_file.file_path)
+            return interned
+        except OSError:
+            self.remove_file(link_path)
+            self.remove_file(stored_file.file_path)
+            return replace(interned, file_path=blob_path)
+    
+    def discard_upload(self, stored_file: StoredFile) -> None:
+        """
+        Remove a stored upload whose database record was never created
+        
+        A file that is the blob itself is left alone; it may be shared and
+        is only removed when its reference count drops to zero.
         """
-        return file.file.read() 
\ No newline at end of file
+        if stored_file.file_path == stored_file.blob_path:
+            return
+        self.remove_file(stored_file.file_path)
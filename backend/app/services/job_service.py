@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import List, Optional, Set
+from ..utils.config import Config
+from .azure_service import AsyncAzureDocumentIntelligenceService
+from .chatgpt_service import ChatGPTService
+from .document_service import AsyncDocumentService
+from .packet_service import PacketAnalyzer
+from .rate_limiter import UpstreamUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# Floor for re-enqueueing after an outage, so a zero Retry-After cannot spin
+MIN_RETRY_DELAY = 1.0
+
+class JobClaimLost(Exception):
+    """Another worker took over the job after this one's lease expired"""
+
+class AnalysisJobQueue:
+    """
+    Bounded worker pool running the Azure -> ChatGPT pipeline in the background
+
+    The database is the durable queue: a job is a ``Document`` in the
+    ``queued`` or ``processing`` status, and progress is written to
+    ``Document.status``/``status_message`` and ``DocumentStatusHistory``.
+    A worker claims a job atomically before running it and renews the claim
+    at every status change, so with several processes (uvicorn --workers)
+    each job runs once. On startup, and every JOB_LEASE_SECONDS, pending
+    jobs and jobs whose worker stopped renewing are picked up again; a job
+    is started at most JOB_MAX_ATTEMPTS times. A job interrupted because
+    Azure or OpenAI is throttling or its circuit is open goes back to
+    queued without using up an attempt, and is re-enqueued once the
+    service's Retry-After has passed.
+    """
+
+    def __init__(
+        self,
+        azure_service: AsyncAzureDocumentIntelligenceService,
+        chatgpt_service: ChatGPTService,
+        document_service: AsyncDocumentService,
+        concurrency: Optional[int] = None,
+        packet_analyzer: Optional[PacketAnalyzer] = None
+    ):
+        self.azure_service = azure_service
+        self.packet_analyzer = packet_analyzer or PacketAnalyzer(azure_service)
+        self.chatgpt_service = chatgpt_service
+        self.document_service = document_service
+        self.concurrency = concurrency or Config.ANALYSIS_WORKERS
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.workers: List[asyncio.Task] = []
+        self._retries: Set[asyncio.TimerHandle] = set()
+        # Recorded with each claim; unique per process and start
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def start(self) -> None:
+        """Re-enqueue unfinished jobs and start the workers"""
+        await self.recover(include_queued=True)
+        self.workers = [
+            asyncio.create_task(self._worker(), name=f"analysis-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        self.workers.append(asyncio.create_task(self._recover_periodically(), name="analysis-recovery"))
+
+    async def recover(self, include_queued: bool = False) -> int:
+        """
+        Fail jobs out of attempts and enqueue those that can be claimed
+
+        Args:
+            include_queued: Also enqueue queued jobs, not only those whose
+                claim expired (queued jobs submitted while running are
+                already in the queue of the process that accepted them)
+
+        Returns:
+            int: Number of jobs enqueued
+        """
+        failed = await self.document_service.fail_abandoned_jobs()
+        if failed:
+            logger.warning("Gave up on %d analysis jobs after %d attempts", len(failed), Config.JOB_MAX_ATTEMPTS)
+        pending = await self.document_service.get_claimable_job_ids(include_queued)
+        for document_id in pending:
+            self.queue.put_nowait(document_id)
+        if pending:
+            logger.info("Recovered %d pending analysis jobs", len(pending))
+        return len(pending)
+
+    async def stop(self) -> None:
+        """Cancel the workers; unfinished jobs stay pending in the database"""
+        for retry in self._retries:
+            retry.cancel()
+        self._retries.clear()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def enqueue(self, document_id: str) -> None:
+        """
+        Mark a stored document as queued and hand it to the workers
+
+        Args:
+            document_id: The document to analyze
+        """
+        await self.document_service.update_status(document_id, "queued", "Queued for analysis")
+        self.queue.put_nowait(document_id)
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self.queue.qsize()
+
+    async def _recover_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(Config.JOB_LEASE_SECONDS)
+            try:
+                await self.recover()
+            except Exception:
+                logger.exception("Analysis job recovery failed")
+
+    async def _worker(self) -> None:
+        while True:
+            document_id = await self.queue.get()
+            try:
+                await self._process(document_id)
+            except Exception:
+                logger.exception("Analysis job %s crashed", document_id)
+            finally:
+                self.queue.task_done()
+
+    async def _set_status(self, document_id: str, status: str, message: str, details=None) -> None:
+        if not await self.document_service.update_status(
+            document_id, status, message, details, claimed_by=self.worker_id
+        ):
+            raise JobClaimLost(document_id)
+
+    async def _process(self, document_id: str) -> None:
+        # Queued twice, or claimed by another worker or process
+        if not await self.document_service.claim_job(
+            document_id, self.worker_id, "Analyzing with Azure Document Intelligence"
+        ):
+            return
+        document = await self.document_service.get_document(document_id)
+        if document is None:
+            return
+
+        try:
+            analysis_result = await self.packet_analyzer.analyze_file(
+                document.file_path, document.content_hash, category_id=document.category_id
+            )
+
+            await self._set_status(document_id, "processing", "Verifying with ChatGPT")
+            validation_result = await self.chatgpt_service.averify_analysis(analysis_result)
+
+            await self._set_status(
+                document_id,
+                "completed",
+                "Analysis completed",
+                {"validation": validation_result.model_dump(), "analysis": analysis_result}
+            )
+        except JobClaimLost:
+            logger.warning("Analysis job %s was taken over by another worker", document_id)
+        except UpstreamUnavailableError as e:
+            await self._retry_later(document_id, e)
+        except Exception as e:
+            try:
+                await self._set_status(document_id, "failed", "Analysis failed", {"error": str(e)})
+            except JobClaimLost:
+                logger.warning("Analysis job %s was taken over by another worker", document_id)
+
+    async def _retry_later(self, document_id: str, error: UpstreamUnavailableError) -> None:
+        """Release the job without counting the attempt and re-enqueue it after Retry-After"""
+        delay = max(error.retry_after, MIN_RETRY_DELAY)
+        if not await self.document_service.release_job(
+            document_id, self.worker_id, f"Waiting for {error.service}, retrying in {delay:g}s"
+        ):
+            logger.warning("Analysis job %s was taken over by another worker", document_id)
+            return
+        logger.info("Analysis job %s paused for %gs: %s", document_id, delay, error)
+
+        def requeue() -> None:
+            self._retries.discard(handle)
+            self.queue.put_nowait(document_id)
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._retries.add(handle)
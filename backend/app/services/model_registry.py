@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+from ..utils.config import Config
+from .azure_service import AsyncAzureDocumentIntelligenceService, LAYOUT_MODEL_ID, READ_MODEL_ID, TAX_MODEL_ID
+
+logger = logging.getLogger(__name__)
+
+# Cheapest model that still extracts what each category needs: the 1040
+# model for its fields, layout where tables carry the figures, read where
+# the text alone is enough. Azure has no prebuilt model for the others.
+DEFAULT_CATEGORY_MODELS: Dict[str, str] = {
+    "personal-tax-returns": TAX_MODEL_ID,
+    "business-tax-returns": LAYOUT_MODEL_ID,
+    "balance-sheet": LAYOUT_MODEL_ID,
+    "profit-loss": LAYOUT_MODEL_ID,
+    "debt-schedule": LAYOUT_MODEL_ID,
+    "personal-financial-statement": LAYOUT_MODEL_ID,
+    "project-costs": READ_MODEL_ID,
+}
+
+def parse_category_models(value: str) -> Dict[str, str]:
+    """
+    Parse "category=model,category=model" routing overrides
+
+    Raises:
+        ValueError: If an entry is not of the form category=model
+    """
+    routing = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        category_id, separator, model_id = entry.partition("=")
+        if not separator or not category_id.strip() or not model_id.strip():
+            raise ValueError(f"Invalid AZ_CATEGORY_MODELS entry: '{entry}'")
+        routing[category_id.strip()] = model_id.strip()
+    return routing
+
+class ModelRegistry:
+    """
+    Azure model list and category-to-model routing
+
+    The model list is cached for AZ_MODELS_CACHE_TTL_SECONDS. Once it is
+    stale it is still served while a single background task refreshes it,
+    so listing models only waits on Azure the first time; a failed refresh
+    keeps the previous list. The etag of the list changes only when its
+    content does, so clients can revalidate with If-None-Match.
+    """
+
+    def __init__(
+        self,
+        azure_service: AsyncAzureDocumentIntelligenceService,
+        routing: Optional[Dict[str, str]] = None,
+        ttl_seconds: Optional[float] = None
+    ):
+        self.azure_service = azure_service
+        self.routing = {
+            **DEFAULT_CATEGORY_MODELS,
+            **(parse_category_models(Config.AZ_CATEGORY_MODELS) if routing is None else routing)
+        }
+        self.ttl_seconds = Config.AZ_MODELS_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._models: Optional[list] = None
+        self._fetched_at = 0.0
+        self.etag: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def models(self) -> list:
+        """
+        Available models, from the cache when possible
+
+        Returns:
+            list: Model descriptions as returned by Azure
+        """
+        if self._models is None:
+            return await self.refresh()
+        if self._is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._refresh_in_background())
+        return self._models
+
+    async def refresh(self) -> list:
+        """
+        Fetch the model list from Azure; concurrent callers share one request
+        """
+        async with self._lock:
+            if self._models is not None and not self._is_stale():
+                return self._models
+            self._models = await self.azure_service.list_models()
+            self._fetched_at = time.monotonic()
+            digest = hashlib.sha256(json.dumps(self._models, sort_keys=True, default=str).encode()).hexdigest()
+            self.etag = f'W/"models-{digest[:16]}"'
+            return self._models
+
+    async def _refresh_in_background(self) -> None:
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning("Refreshing the Azure model list failed, serving the cached list: %s", e)
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._fetched_at >= self.ttl_seconds
+
+    async def require_model(self, model_id: str) -> str:
+        """
+        Check a client-supplied model ID against the available models
+        before it is used in an Azure URL
+        
+        Models created after the list was cached are accepted once it
+        refreshes (AZ_MODELS_CACHE_TTL_SECONDS).
+        
+        Returns:
+            str: The model ID
+        
+        Raises:
+            ValueError: If the model does not exist
+        """
+        models = await self.models()
+        if model_id not in {model.get('modelId') for model in models}:
+            raise ValueError(f"Unknown model_id: '{model_id}'. See GET /tax/models.")
+        return model_id
+
+    def model_for(self, category_id: Optional[str]) -> str:
+        """
+        Azure model to analyze a document of the given category with
+
+        Unknown categories use the layout model. A routed model that is
+        missing from the cached model list (e.g. a deleted custom model)
+        also falls back to layout.
+        """
+        model_id = self.routing.get(category_id, LAYOUT_MODEL_ID)
+        if self._models is not None and model_id not in {model.get('modelId') for model in self._models}:
+            logger.warning("Model %s for category %s is not available, using %s", model_id, category_id, LAYOUT_MODEL_ID)
+            return LAYOUT_MODEL_ID
+        return model_id
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Routing table, per-model latency and age of the cached model list
+        """
+        return {
+            "routing": dict(self.routing),
+            "latency": self.azure_service.latency.stats(),
+            "models_cached": self._models is not None,
+            "models_age_seconds": round(time.monotonic() - self._fetched_at, 1) if self._models is not None else None,
+        }
+
+    async def aclose(self) -> None:
+        """Cancel a pending background refresh"""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
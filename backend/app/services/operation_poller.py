@@ -0,0 +1,233 @@
+import asyncio
+import heapq
+import itertools
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import httpx
+from ..utils.config import Config
+
+class PollTimeoutError(ValueError):
+    """The operation did not finish within the polling timeout"""
+
+# Receives a stage name ("submitted", "poll", ...) and its details as an
+# analysis makes progress, e.g. to stream them to the client
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+def parse_retry_after(headers) -> Optional[float]:
+    """
+    Read the server's polling hint in seconds
+
+    Azure sends ``retry-after-ms`` on some endpoints and ``Retry-After`` as
+    either delta-seconds or an HTTP date.
+    """
+    retry_after_ms = headers.get('retry-after-ms') or headers.get('x-ms-retry-after-ms')
+    if retry_after_ms:
+        try:
+            return max(float(retry_after_ms) / 1000.0, 0.0)
+        except ValueError:
+            pass
+
+    retry_after = headers.get('Retry-After')
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class PollSchedule:
+    """
+    Delay policy for one long-running operation
+
+    Starts with a short interval, backs off geometrically up to a cap, and
+    defers to a server ``Retry-After`` hint when one is given. The overall
+    deadline is fixed when the schedule is created.
+    """
+
+    def __init__(
+        self,
+        initial_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        backoff: Optional[float] = None,
+        timeout: Optional[float] = None
+    ):
+        self.interval = initial_interval if initial_interval is not None else Config.AZ_POLL_INITIAL_INTERVAL
+        self.max_interval = max_interval if max_interval is not None else Config.AZ_POLL_MAX_INTERVAL
+        self.backoff = backoff if backoff is not None else Config.AZ_POLL_BACKOFF
+        self.timeout = timeout if timeout is not None else Config.AZ_POLL_TIMEOUT
+        self.deadline = time.monotonic() + self.timeout
+        self.attempts = 0
+
+    def next_delay(self, retry_after: Optional[float] = None) -> float:
+        """
+        Seconds to wait before the next poll
+
+        Raises:
+            TimeoutError: If the deadline has passed
+        """
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Analysis timed out after {self.timeout:g} seconds")
+
+        if retry_after is not None:
+            delay = retry_after
+        else:
+            delay = self.interval
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+        self.attempts += 1
+        return min(delay, remaining)
+
+class _PendingOperation:
+    def __init__(
+        self,
+        url: str,
+        schedule: PollSchedule,
+        future: asyncio.Future,
+        on_status: Optional[Callable[[str], None]] = None
+    ):
+        self.url = url
+        self.schedule = schedule
+        self.future = future
+        self.on_status = on_status
+
+class OperationPoller:
+    """
+    Multiplexes polling of many Azure ``Operation-Location`` URLs
+
+    A single scheduler task owns a heap of due times. Each wake-up fires
+    the polls that are due concurrently over the shared HTTP client and
+    reschedules the ones still running, so N outstanding documents cost one
+    timer loop rather than N sleeping pollers.
+    """
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self._heap: List[Tuple[float, int, _PendingOperation]] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        """Number of operations currently being polled"""
+        return len(self._heap) + len(self._inflight)
+
+    async def wait(
+        self,
+        operation_location: str,
+        retry_after: Optional[float] = None,
+        schedule: Optional[PollSchedule] = None,
+        on_status: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Wait for an operation to reach a terminal state
+
+        Args:
+            operation_location: The URL returned by the submit call
+            retry_after: ``Retry-After`` hint from the submit response
+            schedule: Polling policy, defaults to the configured one
+            on_status: Called with the operation status after each poll
+
+        Returns:
+            Dict: The final operation body with status ``succeeded``
+
+        Raises:
+            ValueError: If the analysis fails, times out or polling errors
+        """
+        schedule = schedule or PollSchedule()
+        future = asyncio.get_running_loop().create_future()
+        operation = _PendingOperation(operation_location, schedule, future, on_status)
+        self._schedule(operation, schedule.next_delay(retry_after))
+        return await future
+
+    def _schedule(self, operation: _PendingOperation, delay: float) -> None:
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), operation))
+        self._wakeup.set()
+        self._ensure_running()
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._heap:
+            self._wakeup.clear()
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                try:
+                    # Wake early if a new operation is scheduled sooner
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+
+            now = time.monotonic()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+            for operation in due:
+                if operation.future.done():
+                    continue
+                # Polls run as their own tasks so a slow response never
+                # delays the next due operation
+                task = asyncio.create_task(self._poll_once(operation))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+    async def _poll_once(self, operation: _PendingOperation) -> None:
+        try:
+            response = await self.client.get(operation.url)
+            retry_after = parse_retry_after(response.headers)
+
+            if response.status_code == 200:
+                result = response.json()
+                status = result.get('status')
+                if operation.on_status is not None:
+                    operation.on_status(status)
+                if status == 'succeeded':
+                    if not operation.future.done():
+                        operation.future.set_result(result)
+                    return
+                if status == 'failed':
+                    error_msg = result.get('error', {}).get('message', 'Unknown error')
+                    raise ValueError(f"Analysis failed: {error_msg}")
+            elif response.status_code != 429 and response.status_code < 500:
+                raise ValueError(f"Error polling results: {response.status_code}")
+
+            # Still running, throttled or a transient server error
+            self._schedule(operation, operation.schedule.next_delay(retry_after))
+        except httpx.TransportError:
+            try:
+                self._schedule(operation, operation.schedule.next_delay())
+            except TimeoutError as e:
+                self._fail(operation, PollTimeoutError(str(e)))
+        except TimeoutError as e:
+            self._fail(operation, PollTimeoutError(str(e)))
+        except Exception as e:
+            self._fail(operation, e)
+
+    def _fail(self, operation: _PendingOperation, error: Exception) -> None:
+        if not operation.future.done():
+            operation.future.set_exception(error)
+
+    async def aclose(self) -> None:
+        """Cancel the scheduler and fail any outstanding waits"""
+        for task in list(self._inflight):
+            task.cancel()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        while self._heap:
+            operation = heapq.heappop(self._heap)[2]
+            if not operation.future.done():
+                operation.future.cancel()
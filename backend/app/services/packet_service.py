@@ -0,0 +1,251 @@
+import asyncio
+import io
+import logging
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, List, Optional
+from ..utils.config import Config
+from .azure_service import AsyncAzureDocumentIntelligenceService, TAX_MODEL_ID
+from .cache_service import content_hash, file_content_hash
+from .classifier_service import DocumentClassifier
+from .model_registry import ModelRegistry
+from .operation_poller import ProgressCallback
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # Packets are then analyzed whole
+    PdfReader = PdfWriter = None
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Segment:
+    """A run of pages belonging to one form; pages are 0-based, end exclusive"""
+    start_page: int
+    end_page: int
+    category_id: str
+    model_id: str
+
+class PacketAnalyzer:
+    """
+    Splits combined PDF packets into forms and analyzes them in parallel
+
+    Every page is classified locally; a confidently detected page whose
+    form differs from the previous one starts a new segment, and other
+    pages continue the current one. Each segment is cut into its own PDF
+    and sent to the model for its form concurrently, so latency follows
+    the largest segment and unrelated pages are never billed against the
+    tax model. Pages before the first detected form (e.g. a cover letter)
+    belong to the first segment, so every page is analyzed.
+
+    A file that turns out to be a single form is analyzed whole with the
+    model for its category. Models come from the registry's routing.
+    """
+
+    def __init__(
+        self,
+        azure_service: AsyncAzureDocumentIntelligenceService,
+        classifier: Optional[DocumentClassifier] = None,
+        registry: Optional[ModelRegistry] = None
+    ):
+        self.azure_service = azure_service
+        self.classifier = classifier or DocumentClassifier()
+        self.registry = registry or ModelRegistry(azure_service)
+
+    def detect_segments(self, stream: BinaryIO) -> List[Segment]:
+        """
+        Find form boundaries from the local text layer
+
+        Args:
+            stream: Seekable binary stream of the PDF
+
+        Returns:
+            List[Segment]: Segments in page order; empty if no page was
+            recognized
+        """
+        pages = self.classifier.classify_pages(stream)
+        segments: List[Segment] = []
+        for page_number, page in enumerate(pages):
+            detected = page.category_id if page.confidence >= self.classifier.min_confidence else None
+            if detected is None or (segments and detected == segments[-1].category_id):
+                if segments:
+                    segments[-1].end_page = page_number + 1
+            else:
+                segments.append(Segment(page_number, page_number + 1, detected, self.registry.model_for(detected)))
+        if segments:
+            segments[0].start_page = 0
+        return segments
+
+    def detect_file_segments(self, file_path: str) -> List[Segment]:
+        """
+        detect_segments for a PDF on disk
+        """
+        with open(file_path, "rb") as f:
+            return self.detect_segments(f)
+
+    def split(self, pdf_content: bytes, segments: List[Segment]) -> List[bytes]:
+        """
+        Write each segment as a standalone PDF
+        """
+        reader = PdfReader(io.BytesIO(pdf_content))
+        parts: List[bytes] = []
+        for segment in segments:
+            writer = PdfWriter()
+            for page in reader.pages[segment.start_page:segment.end_page]:
+                writer.add_page(page)
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            parts.append(buffer.getvalue())
+        return parts
+
+    async def analyze_document(
+        self,
+        pdf_content: bytes,
+        pdf_hash: Optional[str] = None,
+        model_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze a PDF, splitting it into forms when it is a packet
+
+        Args:
+            pdf_content: The PDF
+            pdf_hash: SHA-256 of the PDF, computed if not given
+            model_id: Analyze the whole file with this model instead of splitting
+            category_id: Known category of the file, which picks the model
+                when it is not a packet
+            progress: Told about the segments found and each Azure stage
+
+        Returns:
+            Dict[str, Any]: The Azure result; for packets the segments are
+            merged into one analyzeResult and described under "segments"
+        """
+        if model_id is not None:
+            return await self.azure_service.analyze_document(pdf_content, model_id, pdf_hash, progress)
+
+        segments = await self._detect(self.detect_segments, io.BytesIO(pdf_content))
+        if len(segments) <= 1:
+            return await self.azure_service.analyze_document(
+                pdf_content, self._whole_file_model(segments, category_id), pdf_hash, progress
+            )
+        return await self._analyze_segments(pdf_content, pdf_hash or content_hash(pdf_content), segments, progress)
+
+    async def analyze_file(
+        self,
+        file_path: str,
+        pdf_hash: Optional[str] = None,
+        model_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze a PDF stored on disk; see analyze_document
+
+        Files that are not split are streamed to Azure from disk.
+        """
+        if pdf_hash is None:
+            pdf_hash = await asyncio.to_thread(file_content_hash, file_path)
+        if model_id is not None:
+            return await self.azure_service.analyze_file(file_path, model_id, pdf_hash, progress)
+
+        segments = await self._detect(self.detect_file_segments, file_path)
+        if len(segments) <= 1:
+            return await self.azure_service.analyze_file(
+                file_path, self._whole_file_model(segments, category_id), pdf_hash, progress
+            )
+
+        pdf_content = await asyncio.to_thread(_read_file, file_path)
+        return await self._analyze_segments(pdf_content, pdf_hash, segments, progress)
+
+    def _whole_file_model(self, segments: List[Segment], category_id: Optional[str]) -> str:
+        if category_id is not None:
+            return self.registry.model_for(category_id)
+        if segments:
+            return segments[0].model_id
+        # Nothing to go on: the tax model, as before routing existed
+        return TAX_MODEL_ID
+
+    async def _detect(self, detect, source) -> List[Segment]:
+        if not Config.PACKET_SPLITTING or PdfReader is None:
+            return []
+        return await asyncio.to_thread(detect, source)
+
+    async def _analyze_segments(
+        self,
+        pdf_content: bytes,
+        pdf_hash: str,
+        segments: List[Segment],
+        progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        parts = await asyncio.to_thread(self.split, pdf_content, segments)
+        logger.info(
+            "Analyzing packet as %d segments: %s", len(segments),
+            ", ".join(f"{s.category_id} p{s.start_page + 1}-{s.end_page}" for s in segments)
+        )
+        if progress is not None:
+            progress("segments", {"segments": [
+                {"category_id": s.category_id, "model_id": s.model_id, "pages": [s.start_page + 1, s.end_page]}
+                for s in segments
+            ]})
+        results = await asyncio.gather(*(
+            # Cached per page range of the packet; split PDFs are not byte-stable
+            self.azure_service.analyze_document(
+                part, segment.model_id, f"{pdf_hash}:pages-{segment.start_page + 1}-{segment.end_page}", progress
+            )
+            for segment, part in zip(segments, parts)
+        ))
+        return merge_segment_results(segments, results)
+
+def merge_segment_results(segments: List[Segment], results) -> Dict[str, Any]:
+    """
+    Combine per-segment Azure results into one analyzeResult
+
+    Content is concatenated; span offsets and page numbers in pages,
+    documents, key-value pairs and tables are rebased onto the packet.
+
+    Args:
+        segments: All segments, in page order
+        results: The Azure result of each segment, in the same order
+
+    Returns:
+        Dict[str, Any]: {"status", "analyzeResult", "segments"}
+    """
+    merged: Dict[str, Any] = {"content": "", "pages": [], "documents": [], "keyValuePairs": [], "tables": []}
+    described = []
+    for segment, result in zip(segments, results):
+        analyze_result = result.get('analyzeResult', {})
+        offset = len(merged["content"])
+        if offset:
+            merged["content"] += "\n"
+            offset += 1
+        merged["content"] += analyze_result.get('content', '')
+        for key in ("pages", "documents", "keyValuePairs", "tables"):
+            merged[key] += _rebase(analyze_result.get(key) or [], offset, segment.start_page)
+        described.append({
+            "pages": [segment.start_page + 1, segment.end_page],
+            "category_id": segment.category_id,
+            "model_id": segment.model_id,
+            "modelId": analyze_result.get('modelId', segment.model_id),
+        })
+
+    return {"status": "succeeded", "analyzeResult": merged, "segments": described}
+
+def _rebase(value: Any, offset: int, page_offset: int) -> Any:
+    """Copy of a result fragment with spans shifted by offset and pages by page_offset"""
+    if isinstance(value, list):
+        return [_rebase(item, offset, page_offset) for item in value]
+    if not isinstance(value, dict):
+        return value
+    rebased = {}
+    for key, item in value.items():
+        if key == "offset" and isinstance(item, int) and "length" in value:
+            rebased[key] = item + offset
+        elif key == "pageNumber" and isinstance(item, int):
+            rebased[key] = item + page_offset
+        else:
+            rebased[key] = _rebase(item, offset, page_offset)
+    return rebased
+
+def _read_file(file_path: str) -> bytes:
+    with open(file_path, "rb") as f:
+        return f.read()
@@ -0,0 +1,255 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+from ..utils.config import Config
+
+class UpstreamUnavailableError(Exception):
+    """
+    An outbound service is throttling us or its circuit is open
+
+    Carries the HTTP status to answer with (429 or 503) and how long the
+    client should wait before retrying.
+    """
+
+    def __init__(self, service: str, message: str, retry_after: float, status_code: int = 503):
+        super().__init__(f"{service}: {message}")
+        self.service = service
+        self.retry_after = max(retry_after, 0.0)
+        self.status_code = status_code
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """
+    The caller's own deadline passed before the service answered
+
+    Says nothing about the service's health, so a guarded call that ends
+    this way counts as abandoned rather than as a failure.
+    """
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a per-minute rate
+
+    Callers wait in arrival order, so a large request (many pages, many
+    tokens) is not starved by a stream of small ones. The burst size is one
+    minute of quota. A rate of 0 disables the bucket.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """
+        Take amount tokens, waiting for the bucket to refill if needed
+
+        Requests larger than the bucket take all of it rather than waiting
+        forever.
+        """
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            started = time.monotonic()
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self.paused_until - now
+                if delay <= 0:
+                    if self.tokens >= amount:
+                        self.tokens -= amount
+                        break
+                    delay = (amount - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+            waited = time.monotonic() - started
+            if waited > 0:
+                self.waits += 1
+                self.wait_seconds += waited
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for seconds, e.g. after the service answered 429"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill(time.monotonic())
+        return {
+            "per_minute": self.per_minute,
+            "available": round(self.tokens, 1) if self.rate > 0 else None,
+            "paused_seconds": round(max(self.paused_until - time.monotonic(), 0.0), 2),
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 2),
+        }
+
+class CircuitBreaker:
+    """
+    Fails calls fast while a service is down
+
+    Closed: calls pass, consecutive failures are counted. After
+    failure_threshold of them the circuit opens and calls are rejected for
+    reset_timeout seconds. It then goes half-open and lets a limited number
+    of probe calls through; a successful probe closes the circuit, a failed
+    one opens it again.
+    """
+
+    def __init__(self, service: str, failure_threshold: int, reset_timeout: float, half_open_probes: int = 1):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.trips = 0
+        self.rejected = 0
+
+    def check(self) -> None:
+        """
+        Raise UpstreamUnavailableError while the circuit is open
+        """
+        if self.state == "open":
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise UpstreamUnavailableError(self.service, "temporarily unavailable (circuit open)", remaining)
+
+    def before_call(self) -> None:
+        """
+        Admit a call or raise UpstreamUnavailableError
+        """
+        self.check()
+        if self.state == "open":
+            self.state = "half_open"
+            self.probes = 0
+        if self.state == "half_open":
+            if self.probes >= self.half_open_probes:
+                self.rejected += 1
+                raise UpstreamUnavailableError(self.service, "temporarily unavailable (probing)", 1.0)
+            self.probes += 1
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.state == "half_open":
+            self.state = "closed"
+            self.probes = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.probes = 0
+
+    def release(self) -> None:
+        """Give back a half-open probe slot for a call that was cancelled"""
+        if self.state == "half_open" and self.probes > 0:
+            self.probes -= 1
+
+    @asynccontextmanager
+    async def guard(self, is_failure: Callable[[BaseException], bool]):
+        """
+        Run a call under the breaker
+
+        Exceptions for which is_failure is true count against the service;
+        any other outcome means it answered and counts as a success. A call
+        abandoned midway (cancelled, or a stream the consumer stopped
+        reading, or the caller's deadline passing) counts as neither.
+        """
+        self.before_call()
+        try:
+            yield
+        except (asyncio.CancelledError, GeneratorExit, DeadlineExceeded):
+            self.release()
+            raise
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        else:
+            self.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        retry_after = None
+        if self.state == "open":
+            retry_after = round(max(self.opened_at + self.reset_timeout - time.monotonic(), 0.0), 2)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "retry_after": retry_after,
+        }
+
+class UpstreamLimits:
+    """
+    Rate limits and circuit breaker of one outbound service
+
+    One instance per service is shared by every caller in the process (see
+    azure_limits and openai_limits), so all requests, jobs and batches draw
+    from the same quota.
+    """
+
+    def __init__(self, service: str, buckets: Dict[str, TokenBucket], breaker: CircuitBreaker):
+        self.service = service
+        self.buckets = buckets
+        self.breaker = breaker
+        self.throttled = 0
+
+    async def acquire(self, **costs: float) -> None:
+        """
+        Wait for quota, e.g. acquire(requests=1, pages=12)
+
+        Fails fast instead of queueing while the circuit is open.
+        """
+        self.breaker.check()
+        for name, amount in costs.items():
+            await self.buckets[name].acquire(amount)
+
+    def throttle(self, retry_after: float) -> None:
+        """The service answered 429: hold every caller for retry_after"""
+        self.throttled += 1
+        for bucket in self.buckets.values():
+            bucket.pause(retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.breaker.stats(),
+            "throttled": self.throttled,
+            "buckets": {name: bucket.stats() for name, bucket in self.buckets.items()},
+        }
+
+def retry_delay(attempt: int, retry_after: Optional[float]) -> float:
+    """Server hint if given, else exponential backoff from one second"""
+    if retry_after is not None:
+        return retry_after
+    return min(2.0 ** attempt, Config.UPSTREAM_MAX_RETRY_DELAY)
+
+azure_limits = UpstreamLimits(
+    "Azure Document Intelligence",
+    {
+        "requests": TokenBucket(Config.AZ_REQUESTS_PER_MINUTE),
+        "pages": TokenBucket(Config.AZ_PAGES_PER_MINUTE),
+    },
+    CircuitBreaker("Azure Document Intelligence", Config.BREAKER_FAILURE_THRESHOLD, Config.BREAKER_RESET_SECONDS)
+)
+
+openai_limits = UpstreamLimits(
+    "OpenAI",
+    {"tokens": TokenBucket(Config.OPENAI_TOKENS_PER_MINUTE)},
+    CircuitBreaker("OpenAI", Config.BREAKER_FAILURE_THRESHOLD, Config.BREAKER_RESET_SECONDS)
+)
@@ -0,0 +1,66 @@
+import json
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from ..utils.config import Config
+
+try:
+    import zstandard
+except ImportError:  # New payloads are then zlib-compressed
+    zstandard = None
+
+@dataclass
+class DetailsPayload:
+    """Status details stored out of row, compressed"""
+    codec: str
+    data: bytes
+    size: int
+
+def pack_details(details: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[DetailsPayload]]:
+    """
+    Split status details into what stays in the history row and what is
+    stored out of row
+
+    Details up to STATUS_DETAILS_INLINE_MAX_BYTES of JSON stay in the row
+    as they are. Larger ones (e.g. a full Azure result) are compressed
+    whole into a payload, and the row keeps only their small top-level
+    entries, such as the validation verdict or an error message (long
+    strings are truncated).
+
+    Args:
+        details: The details of a status change, if any
+
+    Returns:
+        Tuple: The inline summary and the payload, None when not needed
+    """
+    if not details:
+        return details, None
+    encoded = json.dumps(details, separators=(',', ':'), default=str).encode('utf-8')
+    if len(encoded) <= Config.STATUS_DETAILS_INLINE_MAX_BYTES:
+        return details, None
+    entry_limit = Config.STATUS_DETAILS_INLINE_MAX_BYTES // 4
+    summary = {}
+    for key, value in details.items():
+        if isinstance(value, str):
+            # Long messages are cut rather than dropped
+            summary[key] = value if len(value) <= entry_limit else value[:entry_limit] + "…"
+        elif len(json.dumps(value, separators=(',', ':'), default=str)) <= entry_limit:
+            summary[key] = value
+    if zstandard is not None:
+        payload = DetailsPayload("zstd", zstandard.ZstdCompressor(level=Config.STATUS_DETAILS_ZSTD_LEVEL).compress(encoded), len(encoded))
+    else:
+        payload = DetailsPayload("zlib", zlib.compress(encoded), len(encoded))
+    return summary, payload
+
+def unpack_details(codec: str, data: bytes) -> Dict[str, Any]:
+    """
+    Decode a payload written by pack_details
+
+    Raises:
+        RuntimeError: If the payload is zstd-compressed and zstandard is not installed
+    """
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Status details are zstd-compressed; install zstandard to read them")
+        return json.loads(zstandard.ZstdDecompressor().decompress(data))
+    return json.loads(zlib.decompress(data))
@@ -0,0 +1,139 @@
+import gzip
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .config import Config
+
+try:
+    import brotli
+except ImportError:  # Only gzip is offered then
+    brotli = None
+
+# Bodies above this size are compressed on the thread pool
+_THREADPOOL_BYTES = 256 * 1024
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the content coding for an Accept-Encoding header
+
+    Prefers br (when the brotli package is installed) over gzip at equal
+    quality; codings with q=0 are refused.
+
+    Args:
+        accept_encoding: The request's Accept-Encoding header, if any
+
+    Returns:
+        Optional[str]: "br", "gzip", or None to send the body as is
+    """
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for entry in accept_encoding.split(","):
+        coding, _, params = entry.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    wildcard = qualities.get("*", 0.0)
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_quality = None, 0.0
+    for coding in offered:
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def _is_json(content_type: str) -> bool:
+    media_type = content_type.split(";")[0].strip().lower()
+    return media_type == "application/json" or media_type.endswith("+json")
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=Config.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=Config.COMPRESSION_GZIP_LEVEL)
+
+class CompressionMiddleware:
+    """
+    Compresses large JSON responses with the client's preferred coding
+
+    Only complete JSON bodies of at least minimum_size bytes are
+    compressed. Streamed responses (NDJSON, server-sent events), files and
+    byte ranges, 304s and bodies that already carry a Content-Encoding are
+    passed through untouched, so file downloads keep using sendfile.
+    Strong ETags of compressed responses are weakened, as the bytes differ
+    from the identity representation.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = Config.COMPRESSION_MIN_BYTES if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.minimum_size <= 0:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+class _CompressedResponder:
+    """Holds back the response start until the first body message shows whether to compress"""
+
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.start: Optional[Message] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if (
+                message["status"] != 200
+                or "content-encoding" in headers
+                or not _is_json(headers.get("content-type", ""))
+            ):
+                self.passthrough = True
+                await self.send(message)
+                return
+            self.start = message
+            return
+
+        body = message.get("body", b"")
+        if message["type"] != "http.response.body" or message.get("more_body", False) or len(body) < self.minimum_size:
+            # Streaming or small: the response goes out as the app produced it
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        if len(body) >= _THREADPOOL_BYTES:
+            compressed = await run_in_threadpool(_compress, body, self.encoding)
+        else:
+            compressed = _compress(body, self.encoding)
+        headers = MutableHeaders(raw=list(self.start["headers"]))
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(compressed))
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        await self.send({**self.start, "headers": headers.raw})
+        await self.send({"type": "http.response.body", "body": compressed})
@@ -11,11 +11,125 @@ class Config:
     AZ_ENDPOINT = os.getenv("AZ_ENDPOINT")
     AZ_KEY = os.getenv("AZ_KEY")
     
+    # 'binary' sends raw PDF bytes, 'base64' the legacy JSON body
+    AZ_SUBMISSION_MODE = os.getenv("AZ_SUBMISSION_MODE", "binary").lower()
+    
+    # Azure HTTP client pool and timeouts (seconds)
+    AZ_MAX_CONNECTIONS = int(os.getenv("AZ_MAX_CONNECTIONS", "100"))
+    AZ_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AZ_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    AZ_KEEPALIVE_EXPIRY = float(os.getenv("AZ_KEEPALIVE_EXPIRY", "30"))
+    AZ_CONNECT_TIMEOUT = float(os.getenv("AZ_CONNECT_TIMEOUT", "5"))
+    AZ_READ_TIMEOUT = float(os.getenv("AZ_READ_TIMEOUT", "30"))
+    AZ_POOL_TIMEOUT = float(os.getenv("AZ_POOL_TIMEOUT", "10"))
+    
+    # Azure long-running operation polling (seconds)
+    AZ_POLL_INITIAL_INTERVAL = float(os.getenv("AZ_POLL_INITIAL_INTERVAL", "0.25"))
+    AZ_POLL_MAX_INTERVAL = float(os.getenv("AZ_POLL_MAX_INTERVAL", "5"))
+    AZ_POLL_BACKOFF = float(os.getenv("AZ_POLL_BACKOFF", "2"))
+    AZ_POLL_TIMEOUT = float(os.getenv("AZ_POLL_TIMEOUT", "60"))
+    
+    # Outbound quotas shared by all callers in the process (0 disables a limit)
+    AZ_REQUESTS_PER_MINUTE = float(os.getenv("AZ_REQUESTS_PER_MINUTE", "900"))
+    AZ_PAGES_PER_MINUTE = float(os.getenv("AZ_PAGES_PER_MINUTE", "0"))
+    OPENAI_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "40000"))
+    # Retries of throttled (429) calls, waiting Retry-After or backing off
+    UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+    UPSTREAM_MAX_RETRY_DELAY = float(os.getenv("UPSTREAM_MAX_RETRY_DELAY", "30"))
+    # Consecutive failures (5xx, timeouts, connection errors) that open a
+    # circuit, and how long it stays open before a probe call
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+    
+    # Database
+    DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+    # Derived from DATABASE_URL (e.g. sqlite+aiosqlite) when not set
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    
+    # Result caches (SQLite file shared by all caches)
+    CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "./cache.db")
+    AZURE_CACHE_ENABLED = os.getenv("AZURE_CACHE_ENABLED", "true").lower() == "true"
+    AZURE_CACHE_MAX_MB = int(os.getenv("AZURE_CACHE_MAX_MB", "512"))
+    AZURE_CACHE_TTL_SECONDS = float(os.getenv("AZURE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    VERIFICATION_CACHE_ENABLED = os.getenv("VERIFICATION_CACHE_ENABLED", "true").lower() == "true"
+    VERIFICATION_CACHE_MAX_MB = int(os.getenv("VERIFICATION_CACHE_MAX_MB", "64"))
+    VERIFICATION_CACHE_TTL_SECONDS = float(os.getenv("VERIFICATION_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    
     # OpenAI
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    # Tokens of document evidence (fields, key-value pairs, text) per verification prompt
+    VERIFICATION_TOKEN_BUDGET = int(os.getenv("VERIFICATION_TOKEN_BUDGET", "600"))
+    # Seconds startup waits for the tiktoken encoding (downloaded on a cold
+    # cache) before estimating token counts until it arrives
+    TOKENIZER_LOAD_TIMEOUT = float(os.getenv("TOKENIZER_LOAD_TIMEOUT", "10"))
+    # Completions in flight at once across requests, jobs and batches
+    OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+    # Seconds allowed per verification once it has a concurrency slot
+    OPENAI_ITEM_TIMEOUT = float(os.getenv("OPENAI_ITEM_TIMEOUT", "60"))
+    VERIFY_BATCH_MAX_ITEMS = int(os.getenv("VERIFY_BATCH_MAX_ITEMS", "50"))
+    VERIFY_BATCH_MAX_TIMEOUT = float(os.getenv("VERIFY_BATCH_MAX_TIMEOUT", "300"))
+    
+    # Background analysis jobs
+    ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+    # A worker renews its claim on a job at every status change; a job whose
+    # claim is older than this is taken over (e.g. after a crash)
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+    # Starts of one job, including takeovers, before it is marked failed
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    
+    # Auto-classification of uploads
+    CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("CLASSIFIER_MIN_CONFIDENCE", "0.5"))
+    # Read low-confidence PDFs with Azure prebuilt-read and classify again
+    CLASSIFIER_REMOTE_FALLBACK = os.getenv("CLASSIFIER_REMOTE_FALLBACK", "true").lower() == "true"
+    CLASSIFIER_MAX_PAGES = int(os.getenv("CLASSIFIER_MAX_PAGES", "2"))
+    # Used when no category matches at all
+    CLASSIFIER_DEFAULT_CATEGORY = os.getenv("CLASSIFIER_DEFAULT_CATEGORY", "balance-sheet")
+    
+    # Azure model per document category, overriding the built-in routing,
+    # e.g. "balance-sheet=prebuilt-read,debt-schedule=prebuilt-layout"
+    AZ_CATEGORY_MODELS = os.getenv("AZ_CATEGORY_MODELS", "")
+    # How long GET /tax/models serves the cached model list before refreshing it
+    AZ_MODELS_CACHE_TTL_SECONDS = float(os.getenv("AZ_MODELS_CACHE_TTL_SECONDS", "3600"))
+    
+    # Split combined PDFs into forms and analyze each with its own model
+    PACKET_SPLITTING = os.getenv("PACKET_SPLITTING", "true").lower() == "true"
+    
+    # Document change events (GET /files/documents/{user_id}/events)
+    EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+    EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+    # Streams are ended after this long and the browser reconnects, so
+    # shutdowns and load balancers never wait on an idle stream for long
+    EVENTS_MAX_STREAM_SECONDS = float(os.getenv("EVENTS_MAX_STREAM_SECONDS", "300"))
+    
+    # Status history details larger than this are stored compressed in
+    # document_status_payloads; the history row keeps a small summary
+    STATUS_DETAILS_INLINE_MAX_BYTES = int(os.getenv("STATUS_DETAILS_INLINE_MAX_BYTES", "4096"))
+    STATUS_DETAILS_ZSTD_LEVEL = int(os.getenv("STATUS_DETAILS_ZSTD_LEVEL", "3"))
+    
+    # Document listing (GET /files/documents/{user_id}?limit=...)
+    DOCUMENTS_PAGE_MAX_LIMIT = int(os.getenv("DOCUMENTS_PAGE_MAX_LIMIT", "500"))
+    
+    # JSON responses at least this large are sent gzip or brotli compressed
+    # when the client accepts it; 0 disables compression
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
     
     # File upload
     UPLOAD_FOLDER = './uploads'
+    # "files": one file per upload; "content_addressed": identical uploads share one blob
+    STORAGE_MODE = os.getenv("STORAGE_MODE", "files").lower()
+    BLOB_FOLDER = os.path.join(UPLOAD_FOLDER, '.blobs')
+    BATCH_UPLOAD_MAX_FILES = int(os.getenv("BATCH_UPLOAD_MAX_FILES", "50"))
+    # Files from one batch request streamed to disk at the same time
+    BATCH_UPLOAD_CONCURRENCY = int(os.getenv("BATCH_UPLOAD_CONCURRENCY", "8"))
+    # Threads removing files from disk after bulk deletes
+    FILE_REMOVAL_WORKERS = int(os.getenv("FILE_REMOVAL_WORKERS", "4"))
     
     @classmethod
     def validate_azure_credentials(cls):
@@ -0,0 +1,132 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker, Session
+from typing import AsyncIterator, Iterator, Optional
+from .config import Config
+
+# Async drivers used when ASYNC_DATABASE_URL is not set explicitly
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+def async_database_url(url: Optional[str] = None) -> str:
+    """
+    Derive the asyncio driver URL from a sync database URL
+
+    Args:
+        url: Sync database URL, defaults to Config.DATABASE_URL
+
+    Returns:
+        str: Config.ASYNC_DATABASE_URL if set, otherwise the same URL with
+        its dialect switched to an async driver
+    """
+    if url is None and Config.ASYNC_DATABASE_URL:
+        return Config.ASYNC_DATABASE_URL
+    url = url or Config.DATABASE_URL
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    return f"{_ASYNC_DRIVERS.get(dialect, scheme)}://{rest}"
+
+def create_db_engine(url: Optional[str] = None) -> Engine:
+    """
+    Create the application's SQLAlchemy engine
+
+    SQLite gets WAL journaling so readers don't block the writer,
+    synchronous=NORMAL (safe under WAL), a busy timeout instead of
+    immediate "database is locked" errors, and memory-mapped reads.
+    Server databases get a sized connection pool.
+
+    Args:
+        url: Database URL, defaults to Config.DATABASE_URL
+
+    Returns:
+        Engine: The configured engine
+    """
+    url = url or Config.DATABASE_URL
+
+    if _is_sqlite(url):
+        engine = create_engine(
+            url,
+            connect_args={
+                "check_same_thread": False,
+                "timeout": Config.SQLITE_BUSY_TIMEOUT_MS / 1000
+            }
+        )
+
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+        return engine
+
+    return create_engine(
+        url,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=True
+    )
+
+def create_async_db_engine(url: Optional[str] = None) -> AsyncEngine:
+    """
+    Create the asyncio engine used by request handlers
+
+    Applies the same SQLite pragmas and pool sizing as create_db_engine.
+
+    Args:
+        url: Async database URL, defaults to async_database_url()
+
+    Returns:
+        AsyncEngine: The configured engine
+    """
+    url = url or async_database_url()
+
+    if _is_sqlite(url):
+        engine = create_async_engine(
+            url,
+            connect_args={"timeout": Config.SQLITE_BUSY_TIMEOUT_MS / 1000}
+        )
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+        return engine
+
+    return create_async_engine(
+        url,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=True
+    )
+
+# Sync engine shared by scripts such as seed_categories.py
+engine = create_db_engine()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine used by the API and background jobs
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def get_db() -> Iterator[Session]:
+    """FastAPI dependency providing a session scoped to one request"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency providing an async session scoped to one request"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,102 @@
+import json
+from typing import Any, Optional
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import FileResponse, JSONResponse
+from starlette.types import Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # Responses are then encoded with the json module
+    orjson = None
+
+def encode_json(content: Any) -> bytes:
+    """
+    Compact JSON, with orjson when it is installed
+
+    Pydantic models and datetimes go through jsonable_encoder; plain dicts
+    and lists are encoded natively by orjson.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=jsonable_encoder)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate an If-None-Match header against an entity tag
+
+    Uses the weak comparison required for If-None-Match, so W/"x" matches "x".
+
+    Args:
+        if_none_match: The request's If-None-Match header, if any
+        etag: The current entity tag, quoted
+
+    Returns:
+        bool: True if the client's copy is current (answer 304)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == current for tag in if_none_match.split(","))
+
+class ZeroCopyFileResponse(FileResponse):
+    """
+    FileResponse that lets the server sendfile() the whole body
+
+    When the ASGI server advertises the ``http.response.zerocopysend``
+    extension, full-body responses hand over the open file so the kernel
+    copies it straight to the socket. Range requests, HEAD and servers
+    without the extension fall back to FileResponse, which already serves
+    ranges and uses ``http.response.pathsend`` where available.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            "http.response.zerocopysend" not in scope.get("extensions", {})
+            or scope.get("method", "").upper() == "HEAD"
+            or self.stat_result is None
+            or any(name == b"range" for name, _ in scope.get("headers", []))
+        ):
+            await super().__call__(scope, receive, send)
+            return
+
+        file = await run_in_threadpool(open, self.path, "rb")
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            })
+            await send({
+                "type": "http.response.zerocopysend",
+                "file": file,
+                "offset": 0,
+                "count": self.stat_result.st_size,
+                "more_body": False,
+            })
+        finally:
+            await run_in_threadpool(file.close)
+
+        if self.background is not None:
+            await self.background()
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse encoded with orjson when it is installed
+
+    Meant for large, already-valid payloads such as Azure results: route
+    handlers return it directly, so FastAPI skips response_model validation
+    and jsonable_encoder. Build it with ``await FastJSONResponse.render_async``
+    to keep encoding off the event loop.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return encode_json(content)
+
+    @classmethod
+    async def render_async(cls, content: Any, **kwargs) -> "FastJSONResponse":
+        return await run_in_threadpool(cls, content, **kwargs)
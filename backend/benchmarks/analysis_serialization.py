@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Serialization time and size of POST /tax/analyze responses.
+
+Builds an Azure prebuilt-tax.us.1040 style result around the text in
+FormContentMockData.json: every word and line with polygon, span and
+confidence, selection marks, paragraphs and styles per page, plus the
+1040 document fields. The mock text is repeated --copies times to stand
+in for a longer return.
+
+Compares the previous path (AnalysisResponse validation, jsonable_encoder
+and json.dumps) with FastJSONResponse for the full result, view=compact
+and a fields= projection.
+
+Usage (from the backend directory):
+    python -m benchmarks.analysis_serialization [--copies 4] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+from app.models.responses import AnalysisResponse, ValidationResult
+from app.services.analysis_view import shape_analysis
+from app.utils.responses import FastJSONResponse, orjson
+
+FIELDS = {
+    "TaxYear": {"type": "string", "valueString": "2024", "content": "2024"},
+    "FilingStatus": {"type": "string", "valueString": "Single", "content": "Single"},
+    "Taxpayer": {"type": "object", "valueObject": {
+        "FirstNameMiddleInitial": {"type": "string", "valueString": "Jane A", "content": "Jane A"},
+        "LastName": {"type": "string", "valueString": "Doe", "content": "Doe"},
+        "SSN": {"type": "string", "valueString": "123-45-6789", "content": "123-45-6789"},
+    }},
+    "AdjustedGrossIncome": {"type": "number", "valueNumber": 84250, "content": "84,250"},
+    "TaxableIncome": {"type": "number", "valueNumber": 69650, "content": "69,650"},
+    "TotalTax": {"type": "number", "valueNumber": 10213, "content": "10,213"},
+}
+
+def polygon(rng):
+    x, y = rng.uniform(0, 8), rng.uniform(0, 11)
+    return [round(v, 4) for v in (x, y, x + 0.5, y, x + 0.5, y + 0.1, x, y + 0.1)]
+
+def build_result(content: str, copies: int) -> dict:
+    rng = random.Random(0)
+    full_content = "\n".join([content] * copies)
+    pages, offset = [], 0
+    # Two printed pages per copy of the form
+    chunks = [chunk for _ in range(copies) for chunk in (content[:len(content) // 2], content[len(content) // 2:])]
+    for number, chunk in enumerate(chunks, start=1):
+        words, lines = [], []
+        for line in chunk.splitlines():
+            line_offset = offset
+            for word in line.split():
+                words.append({"content": word, "polygon": polygon(rng), "confidence": round(rng.uniform(0.8, 1), 3),
+                              "span": {"offset": offset, "length": len(word)}})
+                offset += len(word) + 1
+            lines.append({"content": line, "polygon": polygon(rng), "spans": [{"offset": line_offset, "length": len(line)}]})
+        pages.append({
+            "pageNumber": number, "angle": 0, "width": 8.5, "height": 11, "unit": "inch",
+            "words": words, "lines": lines,
+            "selectionMarks": [{"state": "unselected", "polygon": polygon(rng), "confidence": 0.99,
+                                "span": {"offset": 0, "length": 12}} for _ in range(20)],
+            "spans": [{"offset": 0, "length": len(chunk)}],
+        })
+    return {
+        "status": "succeeded",
+        "analyzeResult": {
+            "apiVersion": "2024-11-30", "modelId": "prebuilt-tax.us.1040",
+            "content": full_content, "pages": pages,
+            "paragraphs": [{"content": line, "boundingRegions": [{"pageNumber": 1, "polygon": polygon(rng)}],
+                            "spans": [{"offset": 0, "length": len(line)}]} for line in full_content.splitlines()],
+            "styles": [{"confidence": 1, "spans": [{"offset": i * 40, "length": 20}], "isHandwritten": False} for i in range(50)],
+            "documents": [{"docType": "tax.us.1040", "confidence": 0.98,
+                           "boundingRegions": [{"pageNumber": 1, "polygon": polygon(rng)}],
+                           "spans": [{"offset": 0, "length": len(full_content)}], "fields": FIELDS}],
+        },
+    }
+
+def legacy(payload: dict) -> bytes:
+    model = AnalysisResponse.model_validate(payload)
+    return JSONResponse(jsonable_encoder(model)).body
+
+def fast(payload: dict, view: str = "full", fields: str = None) -> bytes:
+    return FastJSONResponse({**payload, "analysis": shape_analysis(payload["analysis"], view, fields)}).body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=os.path.join('..', 'FormContentMockData.json'))
+    parser.add_argument('--copies', type=int, default=4, help='Times the mock form is repeated (2 pages each)')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.data) as f:
+        content = json.load(f)['content']
+    payload = {
+        "success": True,
+        "message": "Document analysis and verification completed successfully",
+        "validation": ValidationResult(is_valid=True, form_type="Form 1040", confidence=9,
+                                       explanation="Complete 1040", issues="None"),
+        "analysis": build_result(content, args.copies),
+    }
+
+    variants = [
+        ("legacy: validate + json", lambda: legacy(payload)),
+        (f"full: {'orjson' if orjson else 'json'}", lambda: fast(payload)),
+        ("view=compact", lambda: fast(payload, "compact")),
+        ("fields=content,documents.fields", lambda: fast(payload, "full", "content,documents.fields")),
+    ]
+    print(f"{args.copies * 2} pages, {len(content) * args.copies / 1024:.0f} KB of text\n")
+    print(f"{'variant':<34} {'median ms':>10} {'size KB':>9}")
+    for label, run in variants:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            body = run()
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{label:<34} {statistics.median(timings):>10.2f} {len(body) / 1024:>9.1f}")
+
+if __name__ == '__main__':
+    main()
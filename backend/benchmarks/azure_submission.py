@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark base64 JSON vs binary (application/pdf) submission to Azure.
+
+Runs AsyncAzureDocumentIntelligenceService.analyze_tax_file against a local
+sink server that mimics the analyze/poll endpoints, once per mode, each in a
+fresh interpreter so peak RSS is measured independently.
+
+Usage (from the backend directory):
+    python -m benchmarks.azure_submission [--size-mb 50]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODES = ["base64", "binary"]
+
+class _SinkHandler(BaseHTTPRequestHandler):
+    received = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _drain_body(self) -> int:
+        total = 0
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return total
+                while size:
+                    chunk = self.rfile.read(min(size, 1024 * 1024))
+                    size -= len(chunk)
+                    total += len(chunk)
+                self.rfile.readline()
+        remaining = int(self.headers.get('Content-Length', 0))
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 1024 * 1024))
+            remaining -= len(chunk)
+            total += len(chunk)
+        return total
+
+    def do_POST(self):
+        self.received.append(self._drain_body())
+        self.send_response(202)
+        self.send_header('Operation-Location', f"http://127.0.0.1:{self.server.server_port}/operations/1")
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        body = json.dumps({"status": "succeeded", "analyzeResult": {"content": ""}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_child(mode: str, file_path: str) -> None:
+    from app.services.azure_service import AsyncAzureDocumentIntelligenceService
+
+    async def submit():
+        service = AsyncAzureDocumentIntelligenceService()
+        try:
+            await service.analyze_tax_file(file_path, pdf_hash=f"benchmark-{mode}")
+        finally:
+            await service.aclose()
+
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+    asyncio.run(submit())
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"seconds": elapsed, "peak_rss_delta_mb": _peak_rss_mb() - baseline}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=50, help='Size of the synthetic PDF')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SinkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+        f.write(b'%PDF-1.7\n')
+        for _ in range(args.size_mb):
+            f.write(os.urandom(1024 * 1024))
+        file_path = f.name
+
+    env = dict(
+        os.environ,
+        AZ_ENDPOINT=f"http://127.0.0.1:{server.server_port}",
+        AZ_KEY='benchmark',
+        AZURE_CACHE_ENABLED='false',
+        AZ_POLL_INITIAL_INTERVAL='0'
+    )
+
+    try:
+        print(f"Synthetic PDF: {args.size_mb} MB")
+        print(f"{'mode':<8} {'seconds':>8} {'peak RSS +MB':>13} {'wire MB':>8}")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.azure_submission', '--child', mode, file_path],
+                env=dict(env, AZ_SUBMISSION_MODE=mode),
+                check=True,
+                capture_output=True,
+                text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            wire_mb = _SinkHandler.received[-1] / (1024 * 1024)
+            print(f"{mode:<8} {result['seconds']:>8.2f} {result['peak_rss_delta_mb']:>13.1f} {wire_mb:>8.1f}")
+    finally:
+        os.remove(file_path)
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Accuracy and latency of the local upload classifier on the sample templates.
+
+Classifies every file in the repository's documents/ directory with local
+extraction only (no Azure fallback) and compares against the expected
+category. Files expected to match nothing should come back below the
+confidence threshold, which is when uploads would go to Azure.
+
+Usage (from the backend directory):
+    python -m benchmarks.classifier_accuracy [--repeat 5] [--documents ../documents]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import time
+from app.services.classifier_service import DocumentClassifier
+from app.utils.config import Config
+
+# None: unrelated document, expected to fall below the confidence threshold
+EXPECTED = {
+    "AmPac Business Debt Schedule Template.pdf": "debt-schedule",
+    "Profit-and-Loss-Statement-Template-ampac.xlsx": "profit-loss",
+    "SBA_Form_413_Personal_Financial_Statement_Template.pdf": "personal-financial-statement",
+    "Use_of_Funds_Worksheet_Template_2025.pdf": "project-costs",
+    "f1040.pdf": "personal-tax-returns",
+    "f1120.pdf": "business-tax-returns",
+    "ai-in-space.pdf": None,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per file')
+    parser.add_argument('--documents', default=os.path.join('..', 'documents'))
+    args = parser.parse_args()
+
+    # pypdf warns about fonts it cannot fully decode; irrelevant for scoring
+    logging.getLogger('pypdf').setLevel(logging.ERROR)
+    classifier = DocumentClassifier()
+    threshold = Config.CLASSIFIER_MIN_CONFIDENCE
+
+    correct = 0
+    latencies = []
+    print(f"{'file':<48} {'expected':<30} {'predicted':<30} {'conf':>5} {'ms':>7}")
+    for name, expected in EXPECTED.items():
+        path = os.path.join(args.documents, name)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = classifier.classify_file(path)
+            timings.append((time.perf_counter() - start) * 1000)
+        latency = statistics.median(timings)
+        latencies.append(latency)
+
+        confident = result.confidence >= threshold
+        if expected is None:
+            ok = not confident
+        else:
+            ok = result.category_id == expected and confident
+        correct += ok
+        predicted = result.category_id if confident else f"({result.category_id}: remote)"
+        print(f"{name[:48]:<48} {str(expected):<30} {str(predicted):<30} {result.confidence:>5.2f} {latency:>7.1f}{'' if ok else '  ✗'}")
+
+    print(f"\nAccuracy: {correct}/{len(EXPECTED)} at confidence >= {threshold}")
+    print(f"Median latency: {statistics.median(latencies):.1f} ms, max {max(latencies):.1f} ms")
+
+if __name__ == '__main__':
+    main()
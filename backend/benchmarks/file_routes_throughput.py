@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark /files/upload and /files/documents/{user_id} throughput with
+sync SQLAlchemy queries called inline (the previous handlers) versus the
+AsyncDocumentService used by the current routes.
+
+Each variant is served by uvicorn on its own thread against a fresh SQLite
+database in a temporary directory, and hit with concurrent httpx requests.
+
+Usage (from the backend directory):
+    python -m benchmarks.file_routes_throughput [--requests 400] [--concurrency 32]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="files-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}"
+os.environ["UPLOAD_FOLDER"] = os.path.join(WORKDIR, "uploads")
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from app.models.database import Base, DocumentCategory, Document, User
+from app.routes import file_routes
+from app.services.document_service import user_documents_query
+from app.models.responses import DocumentResponse
+from app.utils.database import SessionLocal, engine
+
+SEED_USER = "bench-user"
+SEED_DOCUMENTS = 200
+PDF = b"%PDF-1.7\n" + b"0" * 64 * 1024
+
+def build_legacy_app() -> FastAPI:
+    """Handlers shaped like the originals: sync queries inside async def"""
+    app = FastAPI()
+    file_service = file_routes.file_service
+
+    @app.post('/files/upload/{category_id}')
+    async def upload(category_id: str, file: UploadFile = File(...), user_id: str = Form(default="default")):
+        with SessionLocal() as db:
+            if db.get(DocumentCategory, category_id) is None:
+                raise HTTPException(status_code=400, detail="Invalid category_id")
+        stored_file = await file_service.store_upload(file, file_service.upload_directory(user_id, category_id))
+        with SessionLocal() as db:
+            if db.get(User, user_id) is None:
+                db.add(User(id=user_id))
+                db.commit()
+            document = Document(
+                user_id=user_id,
+                category_id=category_id,
+                filename=stored_file.filename,
+                original_filename=file.filename,
+                file_path=stored_file.file_path,
+                file_size=stored_file.file_size,
+                mime_type=stored_file.mime_type,
+                status="uploaded"
+            )
+            db.add(document)
+            db.commit()
+            return {"filename": document.filename}
+
+    @app.get('/files/documents/{user_id}')
+    async def documents(user_id: str):
+        with SessionLocal() as db:
+            return [DocumentResponse(**row._mapping) for row in db.execute(user_documents_query(user_id))]
+
+    return app
+
+def build_async_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(file_routes.router)
+    return app
+
+def seed() -> None:
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    db.add(DocumentCategory(id="balance-sheet", title="Business Balance Sheet", required=True))
+    db.add(User(id=SEED_USER))
+    for i in range(SEED_DOCUMENTS):
+        db.add(Document(
+            user_id=SEED_USER,
+            category_id="balance-sheet",
+            filename=f"seed-{i}.pdf",
+            original_filename=f"seed-{i}.pdf",
+            file_path=f"uploads/{SEED_USER}/balance-sheet/seed-{i}.pdf",
+            file_size=len(PDF),
+            mime_type="application/pdf"
+        ))
+    db.commit()
+    db.close()
+
+def serve(app: FastAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+async def run_load(base_url: str, total: int, concurrency: int, make_request) -> float:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def one(i):
+            async with semaphore:
+                response = await make_request(client, i)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return total / (time.perf_counter() - start)
+
+def upload_request(user_prefix: str):
+    def make(client, i):
+        return client.post(
+            "/files/upload/balance-sheet",
+            files={"file": (f"bench-{i}.pdf", PDF, "application/pdf")},
+            # A handful of users so uploads also exercise user get-or-create
+            data={"user_id": f"{user_prefix}-{i % 8}"}
+        )
+    return make
+
+def list_request(client, i):
+    return client.get(f"/files/documents/{SEED_USER}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    os.chdir(WORKDIR)
+    try:
+        print(f"{args.requests} requests per endpoint, concurrency {args.concurrency}, {SEED_DOCUMENTS} listed documents")
+        print(f"{'variant':<8} {'upload req/s':>13} {'list req/s':>11}")
+        for port, (name, app) in enumerate([("sync", build_legacy_app()), ("async", build_async_app())], start=8781):
+            seed()
+            server = serve(app, port)
+            base_url = f"http://127.0.0.1:{port}"
+            uploads = asyncio.run(run_load(base_url, args.requests, args.concurrency, upload_request(name)))
+            listing = asyncio.run(run_load(base_url, args.requests, args.concurrency, list_request))
+            server.should_exit = True
+            print(f"{name:<8} {uploads:>13.1f} {listing:>11.1f}")
+    finally:
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(main())
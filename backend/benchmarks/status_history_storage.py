@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Database size and status timeline reads with analysis results stored in
+the history row versus compressed out of row.
+
+Creates a throwaway SQLite database per variant and records --documents
+completed jobs, each with the ChatGPT verdict and an Azure 1040 result
+built as in benchmarks.analysis_serialization. Then times listing every
+document's status timeline (GET /tax/jobs/{id} history) and loading the
+completed details of one document.
+
+Usage (from the backend directory):
+    python -m benchmarks.status_history_storage [--documents 200] [--copies 1]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.models.database import Base, Document, DocumentCategory, User
+from app.services.document_service import AsyncDocumentService
+from app.services.status_details import zstandard
+from app.utils.config import Config
+from benchmarks.analysis_serialization import build_result
+
+VALIDATION = {"is_valid": True, "form_type": "Form 1040", "confidence": 9,
+              "explanation": "Complete 1040", "issues": "None"}
+
+async def run_variant(label: str, inline_max_bytes: int, analysis: dict, documents: int, repeat: int) -> None:
+    Config.STATUS_DETAILS_INLINE_MAX_BYTES = inline_max_bytes
+    service = AsyncDocumentService()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        document_ids = [f"doc-{index}" for index in range(documents)]
+        async with AsyncSession(engine) as session:
+            await session.execute(insert(User).values(id="bench"))
+            await session.execute(insert(DocumentCategory).values(id="personal-tax-returns", title="Tax returns"))
+            await session.execute(insert(Document), [
+                {"id": document_id, "user_id": "bench", "category_id": "personal-tax-returns",
+                 "filename": "f.pdf", "original_filename": "f.pdf", "file_path": "f.pdf"}
+                for document_id in document_ids
+            ])
+            await session.commit()
+            for document_id in document_ids:
+                await service.update_status(document_id, "processing", "Analyzing", session=session)
+                await service.update_status(document_id, "completed", "Analysis completed",
+                                            {"validation": VALIDATION, "analysis": analysis}, session=session)
+
+        async with AsyncSession(engine) as session:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for document_id in document_ids:
+                    await service.get_status_history(document_id, session=session)
+                timings.append((time.perf_counter() - start) * 1000)
+                session.expunge_all()
+            detail_timings = []
+            for document_id in document_ids[:repeat]:
+                start = time.perf_counter()
+                await service.get_completed_details(document_id, session=session)
+                detail_timings.append((time.perf_counter() - start) * 1000)
+        await engine.dispose()
+        size = os.path.getsize(path)
+    print(f"{label:<24} {size / 1024 / 1024:>8.1f} {statistics.median(timings):>14.1f} {statistics.median(detail_timings):>12.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=os.path.join('..', 'FormContentMockData.json'))
+    parser.add_argument('--documents', type=int, default=200)
+    parser.add_argument('--copies', type=int, default=1, help='Times the mock form is repeated per analysis (2 pages each)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.data) as f:
+        content = json.load(f)['content']
+    analysis = build_result(content, args.copies)
+    size = len(json.dumps(analysis)) / 1024
+    print(f"{args.documents} completed jobs, {size:.0f} KB analysis each, codec {'zstd' if zstandard else 'zlib'}\n")
+    print(f"{'details':<24} {'db MB':>8} {'timelines ms':>14} {'details ms':>12}")
+    inline_max_bytes = Config.STATUS_DETAILS_INLINE_MAX_BYTES
+    asyncio.run(run_variant("in row (previous)", 2 ** 62, analysis, args.documents, args.repeat))
+    asyncio.run(run_variant("out of row, compressed", inline_max_bytes, analysis, args.documents, args.repeat))
+
+if __name__ == '__main__':
+    main()
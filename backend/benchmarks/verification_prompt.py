@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Prompt size and coverage of ChatGPT verification: the previous first-2000-
+characters prompt versus token-budgeted evidence.
+
+Uses FormContentMockData.json (Azure content of a blank 2024 Form 1040).
+Reports prompt tokens per request, how many of the form's landmark
+sections reach the model, and the time to build the evidence. A second
+run adds 1040 model fields to show they are sent ahead of the text.
+
+Token counts use tiktoken when its encoding is available, otherwise the
+same length estimate the service falls back to.
+
+Usage (from the backend directory):
+    python -m benchmarks.verification_prompt [--budget 600] [--data ../FormContentMockData.json]
+"""
+
+import argparse
+import json
+import os
+import time
+from app.services.chatgpt_service import PROMPT_TEMPLATE, SYSTEM_PROMPT
+from app.services.evidence_service import EvidenceBuilder
+
+# The prompt before evidence selection, including its stray comment
+LEGACY_TEMPLATE = PROMPT_TEMPLATE.replace(
+    "Extracted evidence (title, detected fields, then document text):\n            {content}",
+    "Extracted content:\n            {content}  # Limit to first 2000 chars to avoid token limits"
+)
+LEGACY_CONTENT_LIMIT = 2000
+
+LANDMARKS = [
+    "form 1040", "individual income tax return", "filing status", "adjusted gross income",
+    "taxable income", "total tax", "refund", "amount you owe", "sign here",
+]
+
+SAMPLE_FIELDS = {
+    "TaxYear": {"type": "string", "valueString": "2024"},
+    "Taxpayer": {"type": "object", "valueObject": {
+        "FirstNameMiddleInitial": {"type": "string", "valueString": "Jane A"},
+        "LastName": {"type": "string", "valueString": "Doe"},
+        "SSN": {"type": "string", "valueString": "123-45-6789"},
+    }},
+    "FilingStatus": {"type": "string", "valueString": "Single"},
+    "AdjustedGrossIncome": {"type": "number", "valueNumber": 84250},
+    "TaxableIncome": {"type": "number", "valueNumber": 69650},
+    "TotalTax": {"type": "number", "valueNumber": 10213},
+    "AmountOwed": {"type": "number", "valueNumber": 412},
+}
+
+def coverage(text):
+    text = text.lower()
+    return sum(landmark in text for landmark in LANDMARKS)
+
+def report(label, builder, prompt, build_ms=None):
+    tokens = builder.count_tokens(SYSTEM_PROMPT) + builder.count_tokens(prompt)
+    timing = f"{build_ms:>8.2f}" if build_ms is not None else f"{'-':>8}"
+    print(f"{label:<28} {tokens:>7} {len(prompt):>7} {coverage(prompt):>5}/{len(LANDMARKS)} {timing}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=int, default=None, help='Evidence token budget (default: VERIFICATION_TOKEN_BUDGET)')
+    parser.add_argument('--data', default=os.path.join('..', 'FormContentMockData.json'))
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with open(args.data) as f:
+        content = json.load(f)['content']
+    builder = EvidenceBuilder(token_budget=args.budget)
+    tokenizer = "tiktoken" if builder.encoding is not None else "estimated"
+    print(f"Evidence budget: {builder.token_budget} tokens ({tokenizer} counts)\n")
+    print(f"{'prompt':<28} {'tokens':>7} {'chars':>7} {'landmarks':>7} {'build ms':>8}")
+
+    report("legacy content[:2000]", builder, LEGACY_TEMPLATE.format(content=content[:LEGACY_CONTENT_LIMIT]))
+
+    analyses = [
+        ("evidence, content only", {"analyzeResult": {"content": content}}),
+        ("evidence, with 1040 fields", {"analyzeResult": {
+            "content": content,
+            "documents": [{"docType": "tax.us.1040", "confidence": 0.98, "fields": SAMPLE_FIELDS}],
+        }}),
+    ]
+    for label, analysis in analyses:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            evidence = builder.from_analysis(analysis)
+        build_ms = (time.perf_counter() - start) * 1000 / args.repeat
+        report(label, builder, PROMPT_TEMPLATE.format(content=evidence.text), build_ms)
+
+if __name__ == '__main__':
+    main()
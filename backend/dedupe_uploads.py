@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Move existing uploads into the content-addressed blob store
+
+Every document whose file is not yet linked to a blob is hashed and linked
+into uploads/.blobs; duplicates are replaced by hardlinks to a single blob
+and blob reference counts are recorded. Document paths keep working, so the
+script can run while the API is up. Run the Alembic migrations first.
+
+Each document's new path and blob reference are committed before its
+original file is replaced or removed, so an interrupted run leaves every
+document pointing at a file that exists and can simply be run again.
+Files under uploads/ that no document references are reported and left
+alone.
+
+Usage (from the backend directory):
+    python dedupe_uploads.py [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+from dataclasses import replace
+from typing import List
+from sqlalchemy import select
+from app.utils.config import Config
+from app.utils.database import AsyncSessionLocal, async_engine
+from app.models.database import Blob, Document
+from app.services.cache_service import file_content_hash
+from app.services.document_service import AsyncDocumentService, documents_changed
+from app.services.file_service import FileService, StoredFile
+
+PROGRESS_EVERY = 100
+# Orphans listed in full; beyond this only the count is printed
+ORPHANS_LISTED = 20
+
+def stage_blob(file_service: FileService, stored_file: StoredFile) -> tuple:
+    """
+    Put a file's content into the blob store without touching the file
+
+    Returns:
+        tuple: The file as the document should reference it, and the step
+        that finishes deduplication once that reference is committed (None
+        if there is nothing left to do)
+    """
+    file_path = stored_file.file_path
+    blob_path = file_service.blob_path(stored_file.content_hash)
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    interned = replace(stored_file, blob_path=blob_path)
+
+    if not os.path.exists(blob_path):
+        try:
+            # First copy: the upload itself becomes the blob
+            os.link(file_path, blob_path)
+            return interned, None
+        except FileExistsError:
+            pass
+        except OSError:
+            # No hardlinks: copy into the store, drop the upload once the document points there
+            staging_path = f"{blob_path}.tmp"
+            shutil.copy2(file_path, staging_path)
+            os.replace(staging_path, blob_path)
+            return replace(interned, file_path=blob_path), lambda: file_service.remove_file(file_path)
+
+    # Duplicate: prepare the hardlink now, swap it in after the commit
+    link_path = f"{file_path}.link"
+    try:
+        file_service.remove_file(link_path)
+        os.link(blob_path, link_path)
+        return interned, lambda: os.replace(link_path, file_path)
+    except OSError:
+        file_service.remove_file(link_path)
+        return replace(interned, file_path=blob_path), lambda: file_service.remove_file(file_path)
+
+def find_orphans(upload_folder: str, referenced: set) -> List[str]:
+    """Files under the upload folder, outside the blob store, that no document references"""
+    orphans = []
+    blob_folder = os.path.abspath(Config.BLOB_FOLDER)
+    for directory, subdirectories, filenames in os.walk(upload_folder):
+        if os.path.abspath(directory) == blob_folder:
+            subdirectories.clear()
+            continue
+        for filename in filenames:
+            path = os.path.abspath(os.path.join(directory, filename))
+            if filename != ".gitkeep" and path not in referenced:
+                orphans.append(path)
+    return sorted(orphans)
+
+async def dedupe_uploads(dry_run: bool = False):
+    file_service = FileService()
+    document_service = AsyncDocumentService()
+    db = AsyncSessionLocal()
+
+    result = await db.execute(select(Document).where(Document.blob_hash.is_(None)))
+    documents = list(result.scalars())
+    print(f"Found {len(documents)} documents outside the blob store")
+
+    seen = set()
+    linked = missing = duplicates = failed = 0
+    bytes_saved = 0
+
+    for document in documents:
+        if not document.file_path or not os.path.exists(document.file_path):
+            missing += 1
+            continue
+
+        # Always rehash: a wrong address would serve another document's content
+        digest = file_content_hash(document.file_path)
+        file_size = os.path.getsize(document.file_path)
+        duplicate = digest in seen or os.path.exists(file_service.blob_path(digest))
+        seen.add(digest)
+
+        if dry_run:
+            if duplicate:
+                duplicates += 1
+                bytes_saved += file_size
+            continue
+
+        stored_file, finish = stage_blob(file_service, StoredFile(
+            filename=document.filename,
+            file_path=document.file_path,
+            file_size=file_size,
+            content_hash=digest,
+            mime_type=document.mime_type
+        ))
+        document.file_path = stored_file.file_path
+        document.content_hash = digest
+        document.blob_hash = digest
+        await document_service.acquire_blobs(db, [stored_file])
+        await db.execute(documents_changed([document.user_id]))
+        # The reference is durable before the original file goes away
+        await db.commit()
+        linked += 1
+
+        if finish is not None:
+            try:
+                finish()
+            except OSError as e:
+                # The document still points at a complete file; only the space is not reclaimed yet
+                failed += 1
+                print(f"✗ Could not finish deduplicating {document.file_path}: {e}")
+                continue
+        if duplicate:
+            duplicates += 1
+            bytes_saved += file_size
+
+        if linked % PROGRESS_EVERY == 0:
+            print(f"✓ Linked {linked} documents")
+
+    result = await db.execute(select(Document.file_path))
+    referenced = {os.path.abspath(path) for path in result.scalars() if path}
+    result = await db.execute(select(Blob.path))
+    blob_paths = {os.path.abspath(path) for path in result.scalars()}
+    await db.close()
+    await async_engine.dispose()
+
+    action = "Would save" if dry_run else "Saved"
+    print(f"✓ Linked {linked} documents, {duplicates} duplicates, {missing} missing files")
+    if failed:
+        print(f"✗ {failed} documents still use a separate copy of their content")
+    print(f"✓ {action} {bytes_saved / (1024 * 1024):.1f} MB")
+    report_orphans(find_orphans(file_service.upload_folder, referenced | blob_paths))
+
+def report_orphans(orphans: List[str]):
+    if not orphans:
+        return
+    size = sum(os.path.getsize(path) for path in orphans if os.path.exists(path))
+    print(f"! {len(orphans)} files ({size / (1024 * 1024):.1f} MB) under the upload folder have no document; left in place:")
+    for path in orphans[:ORPHANS_LISTED]:
+        print(f"  {path}")
+    if len(orphans) > ORPHANS_LISTED:
+        print(f"  ... and {len(orphans) - ORPHANS_LISTED} more")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true', help='Report duplicates without changing anything')
+    args = parser.parse_args()
+    asyncio.run(dedupe_uploads(args.dry_run))
@@ -14,6 +14,10 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Use the same database URL as the application
+from app.utils.config import Config as AppConfig
+config.set_main_option("sqlalchemy.url", AppConfig.DATABASE_URL.replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 from app.models.database import Base
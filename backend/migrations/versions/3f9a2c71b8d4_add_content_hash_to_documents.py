@@ -0,0 +1,26 @@
+"""add content_hash to documents
+
+Revision ID: 3f9a2c71b8d4
+Revises: e1342beafa4b
+Create Date: 2026-10-18 09:12:40.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a2c71b8d4'
+down_revision: Union[str, None] = 'e1342beafa4b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('documents', 'content_hash')
@@ -0,0 +1,84 @@
+"""add document status payloads
+
+Revision ID: 4d7f1b9e3a58
+Revises: 9e5b3a7c2d61
+Create Date: 2026-10-18 18:05:44.271903
+
+"""
+import json
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d7f1b9e3a58'
+down_revision: Union[str, None] = '9e5b3a7c2d61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Details larger than this move out of row (STATUS_DETAILS_INLINE_MAX_BYTES default)
+INLINE_MAX_BYTES = 4096
+
+
+def _summary(details):
+    """The inline summary pack_details keeps, frozen as of this revision"""
+    entry_limit = INLINE_MAX_BYTES // 4
+    summary = {}
+    for key, value in details.items():
+        if isinstance(value, str):
+            # Long messages are cut rather than dropped
+            summary[key] = value if len(value) <= entry_limit else value[:entry_limit] + "…"
+        elif len(json.dumps(value, separators=(',', ':'), default=str)) <= entry_limit:
+            summary[key] = value
+    return summary
+
+
+def upgrade() -> None:
+    op.create_table('document_status_payloads',
+    sa.Column('history_id', sa.String(), nullable=False),
+    sa.Column('codec', sa.String(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['history_id'], ['document_status_history.id'], ),
+    sa.PrimaryKeyConstraint('history_id')
+    )
+    op.add_column('document_status_history', sa.Column('payload_size', sa.Integer(), nullable=True))
+
+    # Move existing large details (full analyses) out of row, zlib-compressed
+    bind = op.get_bind()
+    history = sa.table('document_status_history', sa.column('id'), sa.column('details', sa.JSON), sa.column('payload_size'))
+    payloads = sa.table('document_status_payloads', sa.column('history_id'), sa.column('codec'), sa.column('data'))
+    large_ids = bind.execute(
+        sa.text("SELECT id FROM document_status_history WHERE length(CAST(details AS TEXT)) > :limit"),
+        {"limit": INLINE_MAX_BYTES}
+    ).scalars().all()
+    for history_id in large_ids:
+        raw = bind.execute(
+            sa.text("SELECT CAST(details AS TEXT) FROM document_status_history WHERE id = :id"), {"id": history_id}
+        ).scalar()
+        details = json.loads(raw)
+        encoded = json.dumps(details, separators=(',', ':'), default=str).encode('utf-8')
+        summary = _summary(details) if isinstance(details, dict) else None
+        bind.execute(payloads.insert().values(history_id=history_id, codec='zlib', data=zlib.compress(encoded)))
+        bind.execute(
+            history.update().where(history.c.id == history_id)
+            .values(details=summary, payload_size=len(encoded))
+        )
+
+
+def downgrade() -> None:
+    # Put full details back in row
+    bind = op.get_bind()
+    history = sa.table('document_status_history', sa.column('id'), sa.column('details', sa.JSON))
+    rows = bind.execute(sa.text("SELECT history_id, codec, data FROM document_status_payloads")).all()
+    for history_id, codec, data in rows:
+        if codec == 'zstd':
+            import zstandard
+            data = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            data = zlib.decompress(data)
+        bind.execute(history.update().where(history.c.id == history_id).values(details=json.loads(data)))
+    op.drop_column('document_status_history', 'payload_size')
+    op.drop_table('document_status_payloads')
@@ -0,0 +1,32 @@
+"""add job claims to documents
+
+Revision ID: 6a2e8c4f1d93
+Revises: 4d7f1b9e3a58
+Create Date: 2026-10-18 19:12:44.215377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a2e8c4f1d93'
+down_revision: Union[str, None] = '4d7f1b9e3a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('job_claimed_by', sa.String(), nullable=True))
+    op.add_column('documents', sa.Column('job_claimed_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('documents', sa.Column('job_attempts', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_documents_status', 'documents', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_status', table_name='documents')
+    op.drop_column('documents', 'job_attempts')
+    op.drop_column('documents', 'job_claimed_at')
+    op.drop_column('documents', 'job_claimed_by')
@@ -0,0 +1,30 @@
+"""add document listing indexes
+
+Revision ID: 7c4e19d2a6f0
+Revises: 3f9a2c71b8d4
+Create Date: 2026-10-18 11:02:17.904316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e19d2a6f0'
+down_revision: Union[str, None] = '3f9a2c71b8d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_documents_user_id_created_at', 'documents', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_documents_user_id_category_id', 'documents', ['user_id', 'category_id'], unique=False)
+    op.create_index('ix_document_status_history_document_id_created_at', 'document_status_history', ['document_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_status_history_document_id_created_at', table_name='document_status_history')
+    op.drop_index('ix_documents_user_id_category_id', table_name='documents')
+    op.drop_index('ix_documents_user_id_created_at', table_name='documents')
@@ -0,0 +1,26 @@
+"""add documents_version to users
+
+Revision ID: 9e5b3a7c2d61
+Revises: b52d8e0f4c17
+Create Date: 2026-10-18 16:40:12.806154
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e5b3a7c2d61'
+down_revision: Union[str, None] = 'b52d8e0f4c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('documents_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'documents_version')
@@ -0,0 +1,37 @@
+"""add content-addressed blobs
+
+Revision ID: b52d8e0f4c17
+Revises: 7c4e19d2a6f0
+Create Date: 2026-10-18 13:26:51.337042
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b52d8e0f4c17'
+down_revision: Union[str, None] = '7c4e19d2a6f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('blobs',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('path', sa.String(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('refcount', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    op.add_column('documents', sa.Column('blob_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_documents_blob_hash', 'documents', ['blob_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_blob_hash', table_name='documents')
+    op.drop_column('documents', 'blob_hash')
+    op.drop_table('blobs')
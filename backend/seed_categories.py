@@ -3,15 +3,10 @@
 Seed script for SBA document categories
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from app.utils.database import SessionLocal
 from app.models.database import DocumentCategory
 
-# Create engine
-engine = create_engine("sqlite:///./app.db")
-
-# Create session
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create session from the shared, configured engine
 db = SessionLocal()
 
 def seed_categories():
@@ -4,15 +4,10 @@ Simple test script to verify database setup
 """
 
 import uuid
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from app.utils.database import SessionLocal
 from app.models.database import Base, User, DocumentCategory, Document
 
-# Create engine
-engine = create_engine("sqlite:///./app.db")
-
-# Create session
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create session from the shared, configured engine
 db = SessionLocal()
 
 def test_database():
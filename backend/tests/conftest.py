@@ -0,0 +1,117 @@
+import os
+import tempfile
+
+# Config is read at import time, so point it at a scratch database first
+_scratch = tempfile.mkdtemp(prefix="document-analyzer-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ["CACHE_DB_PATH"] = os.path.join(_scratch, "cache.db")
+os.environ["VERIFICATION_CACHE_ENABLED"] = "false"
+os.environ["AZURE_CACHE_ENABLED"] = "false"
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("AZ_ENDPOINT", "http://azure.invalid")
+os.environ.setdefault("AZ_KEY", "test")
+
+import asyncio
+import uuid
+from types import SimpleNamespace
+import httpx
+import pytest
+from app.main import app
+from app.models.database import Base, Document, DocumentCategory, User
+from app.routes import file_routes, tax_routes
+from app.services import chatgpt_service
+from app.services.chatgpt_service import ChatGPTService
+from app.services.document_service import AsyncDocumentService
+from app.services.event_bus import DocumentEventBus
+from app.services.rate_limiter import CircuitBreaker, TokenBucket, UpstreamLimits
+from app.utils.database import AsyncSessionLocal, async_engine, engine
+
+VERIFIED = "VALID: Yes\nFORM_TYPE: Form 1040\nCONFIDENCE: 9\nEXPLANATION: Looks like a 1040\nISSUES: None"
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+def schema():
+    """Fresh tables per test, with one document category"""
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(DocumentCategory.__table__.insert().values(id="tax-returns", title="Tax Returns"))
+    yield
+    Base.metadata.drop_all(engine)
+
+@pytest.fixture
+async def database(schema):
+    """The schema, for async tests; pooled connections do not outlive the test's event loop"""
+    yield
+    await async_engine.dispose()
+
+@pytest.fixture
+def document_service(database):
+    return AsyncDocumentService(events=DocumentEventBus())
+
+@pytest.fixture
+def add_document(database):
+    """Insert a document row directly, e.g. with a chosen created_at or status"""
+    async def add(user_id="user-1", **columns):
+        columns.setdefault("id", str(uuid.uuid4()))
+        columns.setdefault("filename", f"{columns['id']}.pdf")
+        columns.setdefault("original_filename", "form.pdf")
+        columns.setdefault("file_path", f"/nonexistent/{columns['id']}.pdf")
+        columns.setdefault("file_size", 1024)
+        columns.setdefault("mime_type", "application/pdf")
+        async with AsyncSessionLocal() as session:
+            if await session.get(User, user_id) is None:
+                session.add(User(id=user_id))
+            session.add(Document(user_id=user_id, category_id="tax-returns", **columns))
+            await session.commit()
+        return columns["id"]
+    return add
+
+@pytest.fixture
+def openai_limits(monkeypatch):
+    """Unlimited OpenAI quota and a fresh breaker that opens after two outages"""
+    limits = UpstreamLimits(
+        "OpenAI", {"tokens": TokenBucket(0)}, CircuitBreaker("OpenAI", failure_threshold=2, reset_timeout=30)
+    )
+    monkeypatch.setattr(chatgpt_service, "openai_limits", limits)
+    return limits
+
+@pytest.fixture
+def chatgpt(openai_limits):
+    """
+    ChatGPTService on a fake async client; the returned factory takes the
+    seconds the fake takes to answer, and the service records each request
+    in .requests
+    """
+    def make(delay: float = 0, answer: str = VERIFIED) -> ChatGPTService:
+        service = ChatGPTService()
+        service.requests = []
+        # Estimated token counts, independent of the tiktoken cache
+        service.evidence_builder.encoding_loaded = True
+
+        async def create(**request):
+            service.requests.append(request)
+            await asyncio.sleep(delay)
+            message = SimpleNamespace(content=answer)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+        service.async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        return service
+    return make
+
+@pytest.fixture
+def upload_folder(tmp_path, monkeypatch):
+    """Uploads (and blobs) of the routes go under tmp_path instead of ./uploads"""
+    folder = tmp_path / "uploads"
+    for service in (file_routes.file_service, tax_routes.file_service):
+        monkeypatch.setattr(service, "upload_folder", str(folder))
+        monkeypatch.setattr(service, "blob_folder", str(folder / ".blobs"))
+    return folder
+
+@pytest.fixture
+async def api(database, upload_folder):
+    """Client calling the app in-process"""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
@@ -0,0 +1,83 @@
+import copy
+import pytest
+from app.services.analysis_view import parse_fields, shape_analysis
+
+ANALYSIS = {
+    "status": "succeeded",
+    "segments": [{"pages": [1, 2]}],
+    "analyzeResult": {
+        "modelId": "prebuilt-tax.us.1040",
+        "content": "Form 1040",
+        "pages": [
+            {"pageNumber": 1, "words": [{"content": "Form", "polygon": [1, 2, 3, 4]}]},
+            {"pageNumber": 2, "words": []},
+        ],
+        "styles": [{"isHandwritten": False}],
+        "documents": [{
+            "docType": "tax.us.1040",
+            "confidence": 0.93,
+            "spans": [{"offset": 0, "length": 9}],
+            "fields": {
+                "TaxYear": {"type": "string", "valueString": "2023", "content": "2023", "confidence": 0.99,
+                            "boundingRegions": [{"pageNumber": 1}]},
+                "Taxpayer": {"type": "object", "valueObject": {
+                    "Name": {"type": "string", "valueString": "Jane Doe", "content": "Jane Doe", "confidence": 0.9},
+                }},
+                "Dependents": {"type": "array", "valueArray": [
+                    {"type": "string", "valueString": "Sam Doe", "content": "Sam Doe", "confidence": 0.8},
+                ]},
+            },
+        }],
+        "keyValuePairs": [{"key": {"content": "Occupation", "boundingRegions": []}, "value": {"content": "Engineer"}, "confidence": 0.7}],
+    },
+}
+
+def test_full_view_returns_the_result_untouched():
+    assert shape_analysis(ANALYSIS) is ANALYSIS
+    assert shape_analysis(None, "compact", "content") is None
+
+def test_compact_view_drops_geometry_and_keeps_values():
+    original = copy.deepcopy(ANALYSIS)
+    compact = shape_analysis(ANALYSIS, "compact")
+    assert ANALYSIS == original
+    assert compact["status"] == "succeeded" and compact["segments"] == [{"pages": [1, 2]}]
+    assert compact["analyzeResult"] == {
+        "modelId": "prebuilt-tax.us.1040",
+        "content": "Form 1040",
+        "pageCount": 2,
+        "documents": [{
+            "docType": "tax.us.1040",
+            "confidence": 0.93,
+            "fields": {
+                "TaxYear": {"type": "string", "value": "2023", "content": "2023", "confidence": 0.99},
+                "Taxpayer": {"type": "object", "value": {
+                    "Name": {"type": "string", "value": "Jane Doe", "content": "Jane Doe", "confidence": 0.9},
+                }, "content": None, "confidence": None},
+                "Dependents": {"type": "array", "value": [
+                    {"type": "string", "value": "Sam Doe", "content": "Sam Doe", "confidence": 0.8},
+                ], "content": None, "confidence": None},
+            },
+        }],
+        "keyValuePairs": [{"key": "Occupation", "value": "Engineer", "confidence": 0.7}],
+    }
+
+def test_fields_keep_only_the_listed_paths_in_every_document():
+    shaped = shape_analysis(ANALYSIS, fields="content, documents.fields.TaxYear.valueString,pages.pageNumber,missing")
+    assert shaped["status"] == "succeeded"
+    assert shaped["analyzeResult"] == {
+        "content": "Form 1040",
+        "documents": [{"fields": {"TaxYear": {"valueString": "2023"}}}],
+        "pages": [{"pageNumber": 1}, {"pageNumber": 2}],
+    }
+
+def test_fields_apply_after_the_compact_view():
+    shaped = shape_analysis(ANALYSIS, "compact", "pageCount,documents.fields.TaxYear.value")
+    assert shaped["analyzeResult"] == {"pageCount": 2, "documents": [{"fields": {"TaxYear": {"value": "2023"}}}]}
+
+def test_unknown_view_is_rejected():
+    with pytest.raises(ValueError, match="Invalid view: 'raw'"):
+        shape_analysis(ANALYSIS, "raw")
+
+def test_parse_fields():
+    assert parse_fields(None) == [] and parse_fields(" , ") == []
+    assert parse_fields("content, documents.fields.TaxYear") == [["content"], ["documents", "fields", "TaxYear"]]
@@ -0,0 +1,78 @@
+import json
+import threading
+import pytest
+from app.models.responses import ValidationResult
+from app.routes import tax_routes
+
+pytestmark = pytest.mark.anyio
+
+VALIDATION = ValidationResult(is_valid=True, form_type="Form 1040", confidence=9, explanation="ok", issues="None")
+UPLOAD = {"file": ("f1040.pdf", b"%PDF-1.4 test", "application/pdf")}
+
+def ndjson(body: str) -> list:
+    """Parse newline-delimited JSON, insisting on one complete object per line"""
+    assert body.endswith("\n")
+    return [json.loads(line) for line in body[:-1].split("\n")]
+
+@pytest.fixture
+def analyzed(monkeypatch):
+    async def analyze_document(pdf_content, model_id=None, category_id=None, progress=None):
+        progress("submitted", {"model_id": "prebuilt-tax.us.1040"})
+        progress("poll", {"model_id": "prebuilt-tax.us.1040", "status": "running"})
+        return {"analyzeResult": {"content": "Form 1040\nline two", "pages": [{"pageNumber": 1, "words": []}]}}
+
+    async def astream_verify_analysis(analysis_result):
+        for piece in ["VALID:", " Yes\n", "FORM_TYPE: Form 1040"]:
+            yield piece
+        yield VALIDATION
+
+    monkeypatch.setattr(tax_routes.packet_analyzer, "analyze_document", analyze_document)
+    monkeypatch.setattr(tax_routes.chatgpt_service, "astream_verify_analysis", astream_verify_analysis)
+
+async def test_analyze_stream_sends_one_event_per_line(api, analyzed):
+    response = await api.post("/tax/analyze/stream", files=UPLOAD)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = ndjson(response.text)
+
+    assert [line["event"] for line in lines] == ["accepted", "submitted", "poll", "content", "token", "token", "token", "result"]
+    assert all(isinstance(line["elapsed_ms"], float) for line in lines)
+    # Newlines inside values stay escaped within their line
+    assert lines[3]["content"] == "Form 1040\nline two"
+    assert "".join(line["text"] for line in lines if line["event"] == "token") == "VALID: Yes\nFORM_TYPE: Form 1040"
+    assert lines[-1]["validation"] == VALIDATION.model_dump()
+
+async def test_result_is_shaped_off_the_event_loop(api, analyzed, monkeypatch):
+    shape_analysis = tax_routes.shape_analysis
+    threads = []
+
+    def recording_shape_analysis(*args):
+        threads.append(threading.current_thread())
+        return shape_analysis(*args)
+
+    monkeypatch.setattr(tax_routes, "shape_analysis", recording_shape_analysis)
+    response = await api.post("/tax/analyze/stream", params={"view": "compact"}, files=UPLOAD)
+    assert ndjson(response.text)[-1]["analysis"]["analyzeResult"]["pageCount"] == 1
+    assert threads and threads[0] is not threading.main_thread()
+
+async def test_analyze_stream_reports_failure_as_last_line(api, monkeypatch):
+    async def analyze_document(pdf_content, model_id=None, category_id=None, progress=None):
+        raise ValueError("Azure analysis failed: bad document")
+
+    monkeypatch.setattr(tax_routes.packet_analyzer, "analyze_document", analyze_document)
+    lines = ndjson((await api.post("/tax/analyze/stream", files=UPLOAD)).text)
+    assert [line["event"] for line in lines] == ["accepted", "error"]
+    assert lines[-1]["status_code"] == 400
+
+async def test_unreadable_upload_fails_before_streaming(api, monkeypatch):
+    async def read_file_content(file):
+        raise OSError("spooled file vanished")
+
+    monkeypatch.setattr(tax_routes.file_service, "read_file_content", read_file_content)
+    response = await api.post("/tax/analyze/stream", files=UPLOAD)
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Unexpected error: spooled file vanished"
+
+async def test_non_pdf_is_rejected_before_streaming(api):
+    response = await api.post("/tax/analyze/stream", files={"file": ("notes.txt", b"text", "text/plain")})
+    assert response.status_code == 400
@@ -0,0 +1,56 @@
+import pytest
+from app.routes import file_routes
+from app.utils.config import Config
+
+pytestmark = pytest.mark.anyio
+
+def pdf(name: str, body: bytes = b"%PDF-1.4 form"):
+    return ("files", (name, body, "application/pdf"))
+
+async def test_each_file_reports_its_own_outcome(api, upload_folder):
+    response = await api.post("/files/upload/batch", files=[
+        pdf("f1040.pdf"),
+        ("files", ("notes.txt", b"plain text", "text/plain")),
+        pdf("w2.pdf"),
+        pdf("schedule-c.pdf"),
+    ], data={"user_id": "user-1", "category_id": "tax-returns", "category_ids": ["", "", "no-such-category"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["uploaded"], body["failed"]) == (2, 2)
+
+    results = body["results"]
+    assert [result["original_filename"] for result in results] == ["f1040.pdf", "notes.txt", "w2.pdf", "schedule-c.pdf"]
+    assert [result["success"] for result in results] == [True, False, False, True]
+    assert results[1]["error"].startswith("Unsupported file type: .txt")
+    assert results[2]["error"] == "Invalid category_id: 'no-such-category'. Category does not exist."
+    assert all(result["document_id"] for result in results if result["success"])
+
+    listing = (await api.get("/files/documents/user-1")).json()
+    assert sorted(document["original_filename"] for document in listing) == ["f1040.pdf", "schedule-c.pdf"]
+    # Rejected files never reach the disk
+    stored = list((upload_folder / "user-1").rglob("*.pdf"))
+    assert len(stored) == 2
+
+async def test_oversized_file_fails_alone(api, monkeypatch):
+    original = file_routes.file_service.store_upload
+
+    async def store_upload(file, directory, max_size_mb=10):
+        return await original(file, directory, max_size_mb=1)
+
+    monkeypatch.setattr(file_routes.file_service, "store_upload", store_upload)
+    response = await api.post("/files/upload/batch", files=[
+        pdf("small.pdf"), pdf("large.pdf", b"%PDF" + b"x" * (1024 * 1024 + 1)),
+    ], data={"user_id": "user-1", "category_id": "tax-returns"})
+    results = response.json()["results"]
+    assert [result["success"] for result in results] == [True, False]
+    assert "exceeds maximum allowed size" in results[1]["error"]
+
+@pytest.mark.parametrize("files, data, detail", [
+    ([pdf("a.pdf")], {"category_ids": ["tax-returns", "tax-returns"]}, "More category_ids than files"),
+    ([pdf(f"{i}.pdf") for i in range(3)], {}, "Too many files (3). Maximum per batch is 2"),
+])
+async def test_malformed_batches_are_rejected(api, monkeypatch, files, data, detail):
+    monkeypatch.setattr(Config, "BATCH_UPLOAD_MAX_FILES", 2)
+    response = await api.post("/files/upload/batch", files=files, data={"category_id": "tax-returns", **data})
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import pytest
+from sqlalchemy import select
+from app.models.database import Blob
+from app.services.cache_service import file_content_hash
+from app.services.file_service import FileService, StoredFile
+from app.utils.config import Config
+from app.utils.database import AsyncSessionLocal
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def file_service(tmp_path):
+    file_service = FileService()
+    file_service.blob_folder = str(tmp_path / ".blobs")
+    return file_service
+
+@pytest.fixture
+def upload(tmp_path, file_service):
+    """Write an upload to disk and link it into the blob store, as store_upload does"""
+    def upload(name: str, content: bytes) -> StoredFile:
+        path = tmp_path / name
+        path.write_bytes(content)
+        return file_service.intern_blob(StoredFile(
+            filename=name,
+            file_path=str(path),
+            file_size=len(content),
+            content_hash=file_content_hash(str(path)),
+            mime_type="application/pdf"
+        ))
+    return upload
+
+async def refcounts():
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(Blob.hash, Blob.refcount))
+        return dict(result.all())
+
+async def test_identical_uploads_share_one_counted_blob(document_service, upload):
+    first = upload("a.pdf", b"%PDF-1.4 same")
+    second = upload("b.pdf", b"%PDF-1.4 same")
+    other = upload("c.pdf", b"%PDF-1.4 other")
+    assert first.blob_path == second.blob_path != other.blob_path
+    assert os.path.samefile(first.file_path, second.file_path)
+
+    await document_service.create_document("user-1", "tax-returns", "a.pdf", first)
+    await document_service.create_documents("user-1", [
+        ("tax-returns", "b.pdf", second),
+        ("tax-returns", "c.pdf", other),
+    ])
+    assert await refcounts() == {first.content_hash: 2, other.content_hash: 1}
+
+async def test_blob_is_removed_with_its_last_reference(document_service, upload):
+    first = upload("a.pdf", b"%PDF-1.4 same")
+    second = upload("b.pdf", b"%PDF-1.4 same")
+    documents = await document_service.create_documents("user-1", [
+        ("tax-returns", "a.pdf", first),
+        ("tax-returns", "b.pdf", second),
+    ])
+
+    result = await document_service.delete_documents(document_ids=[documents[0].id])
+    assert result.deleted == 1
+    assert await refcounts() == {first.content_hash: 1}
+    assert not os.path.exists(first.file_path)
+    assert os.path.exists(first.blob_path)
+    assert open(second.file_path, "rb").read() == b"%PDF-1.4 same"
+
+    result = await document_service.delete_documents(user_id="user-1")
+    assert result.deleted == 1 and not result.failures
+    assert await refcounts() == {}
+    assert not os.path.exists(second.file_path)
+    assert not os.path.exists(first.blob_path)
+
+async def test_release_blobs_counts_each_reference(document_service, upload):
+    stored = upload("a.pdf", b"%PDF-1.4 same")
+    async with AsyncSessionLocal() as session:
+        await document_service.acquire_blobs(session, [stored, stored, stored])
+        assert await document_service.release_blobs(session, [stored.content_hash, None, stored.content_hash]) == {}
+        assert await document_service.release_blobs(session, [stored.content_hash]) == {stored.content_hash: stored.blob_path}
+        await session.commit()
+    assert await refcounts() == {}
+
+async def test_delete_keeps_a_blob_linked_by_an_upload_in_flight(document_service, file_service, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "STORAGE_MODE", "content_addressed")
+
+    def stored(name: str) -> StoredFile:
+        path = tmp_path / name
+        path.write_bytes(b"%PDF-1.4 same")
+        return StoredFile(name, str(path), path.stat().st_size, file_content_hash(str(path)), "application/pdf")
+
+    async with file_service.interned([stored("a.pdf")]) as (first,):
+        document = await document_service.create_document("user-1", "tax-returns", "a.pdf", first)
+
+    async with file_service.interned([stored("b.pdf")]) as (second,):
+        # The delete releases the last counted reference while the new upload is linked but not yet recorded
+        deletion = asyncio.create_task(document_service.delete_documents(document_ids=[document.id]))
+        while await refcounts():
+            await asyncio.sleep(0.01)
+        await document_service.create_document("user-1", "tax-returns", "b.pdf", second)
+
+    result = await deletion
+    assert result.deleted == 1 and not result.failures
+    assert await refcounts() == {second.content_hash: 1}
+    assert not os.path.exists(first.file_path)
+    assert open(second.blob_path, "rb").read() == b"%PDF-1.4 same"
+
+async def test_failed_interning_removes_every_upload(file_service, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "STORAGE_MODE", "content_addressed")
+    paths = [tmp_path / name for name in ("a.pdf", "b.pdf")]
+    for path in paths:
+        path.write_bytes(path.name.encode())
+    uploads = [StoredFile(path.name, str(path), 5, file_content_hash(str(path)), None) for path in paths]
+    intern_blob = file_service.intern_blob
+
+    def fail_second(stored_file):
+        if stored_file.filename == "b.pdf":
+            raise OSError("disk full")
+        return intern_blob(stored_file)
+
+    monkeypatch.setattr(file_service, "intern_blob", fail_second)
+    with pytest.raises(OSError):
+        async with file_service.interned(uploads):
+            pass
+    assert not any(path.exists() for path in paths)
@@ -0,0 +1,96 @@
+import asyncio
+import httpx
+import pytest
+from openai import APIConnectionError, APITimeoutError
+from app.services import azure_service, chatgpt_service
+from app.services.operation_poller import PollTimeoutError
+from app.services.rate_limiter import CircuitBreaker, DeadlineExceeded, UpstreamUnavailableError
+
+pytestmark = pytest.mark.anyio
+
+def unavailable(status_code: int) -> UpstreamUnavailableError:
+    return UpstreamUnavailableError("OpenAI", f"responded {status_code}", 1.0, status_code=status_code)
+
+@pytest.mark.parametrize("error, outage", [
+    (APIConnectionError(request=None), True),
+    (APITimeoutError(request=None), True),
+    (unavailable(503), True),
+    (unavailable(429), False),
+    (asyncio.TimeoutError(), False),
+    (DeadlineExceeded(), False),
+    (ValueError("bad request"), False),
+])
+def test_openai_outage_classification(error, outage):
+    assert chatgpt_service._is_outage(error) is outage
+
+@pytest.mark.parametrize("error, outage", [
+    (httpx.ConnectError("refused"), True),
+    (PollTimeoutError("Analysis timed out"), True),
+    (unavailable(503), True),
+    (unavailable(429), False),
+    (ValueError("Error submitting document: 400"), False),
+])
+def test_azure_outage_classification(error, outage):
+    assert azure_service._is_outage(error) is outage
+
+async def guarded(breaker: CircuitBreaker, error: BaseException) -> None:
+    with pytest.raises(type(error)):
+        async with breaker.guard(chatgpt_service._is_outage):
+            raise error
+
+async def test_outages_open_the_circuit():
+    breaker = CircuitBreaker("OpenAI", failure_threshold=2, reset_timeout=30)
+    await guarded(breaker, APIConnectionError(request=None))
+    assert breaker.state == "closed"
+    await guarded(breaker, unavailable(503))
+    assert breaker.state == "open"
+    with pytest.raises(UpstreamUnavailableError):
+        breaker.before_call()
+
+async def test_bad_requests_and_throttling_do_not_open_the_circuit():
+    breaker = CircuitBreaker("OpenAI", failure_threshold=1, reset_timeout=30)
+    await guarded(breaker, ValueError("bad request"))
+    await guarded(breaker, unavailable(429))
+    assert breaker.stats()["state"] == "closed"
+
+async def test_caller_deadline_counts_as_neither():
+    breaker = CircuitBreaker("OpenAI", failure_threshold=1, reset_timeout=0)
+    await guarded(breaker, DeadlineExceeded())
+    assert breaker.state == "closed" and breaker.failures == 0
+
+    # A half-open probe cut short by the caller neither closes nor reopens the circuit
+    await guarded(breaker, APITimeoutError(request=None))
+    assert breaker.state == "open"
+    await guarded(breaker, DeadlineExceeded())
+    assert breaker.state == "half_open" and breaker.probes == 0
+
+async def test_slow_answers_past_the_callers_deadline_keep_the_circuit_closed(chatgpt, openai_limits):
+    service = chatgpt(delay=1)
+    request = {"messages": [], "max_tokens": 1}
+    for _ in range(5):
+        with pytest.raises(asyncio.TimeoutError):
+            await service._acomplete(request, cost=1, timeout=0.01)
+    assert openai_limits.breaker.stats()["state"] == "closed"
+    assert openai_limits.breaker.stats()["consecutive_failures"] == 0
+
+async def test_answer_within_the_deadline_is_returned(chatgpt):
+    response = await chatgpt()._acomplete({"messages": [], "max_tokens": 1}, cost=1, timeout=5)
+    assert response.choices[0].message.content.startswith("VALID: Yes")
+
+async def test_open_circuit_fails_fast(chatgpt, openai_limits):
+    service = chatgpt()
+    for _ in range(2):
+        await guarded(openai_limits.breaker, APIConnectionError(request=None))
+    with pytest.raises(UpstreamUnavailableError) as raised:
+        await service.averify_tax_document("Form 1040 U.S. Individual Income Tax Return")
+    assert raised.value.status_code == 503 and raised.value.retry_after > 0
+    assert service.requests == []
+
+    # Batch items report the outage instead of failing the whole batch
+    results = [result async for result in service.verify_batch(["Form 1040"])]
+    assert results[0][1].form_type == "Unknown"
+
+@pytest.mark.parametrize("timeout", [0.5, 10_000])
+async def test_verify_batch_rejects_timeouts_out_of_range(api, timeout):
+    response = await api.post("/tax/verify/batch", json={"contents": ["Form 1040"], "timeout": timeout})
+    assert response.status_code == 422
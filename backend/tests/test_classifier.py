@@ -0,0 +1,115 @@
+import asyncio
+import io
+import zipfile
+import openpyxl
+import pytest
+from pypdf import PdfReader, PdfWriter
+from app.services.classifier_service import DocumentClassifier
+
+pytestmark = pytest.mark.anyio
+
+class FakeAzure:
+    def __init__(self, content: str):
+        self.content = content
+        self.calls = []
+
+    async def analyze_document(self, content: bytes, model_id: str):
+        self.calls.append((len(PdfReader(io.BytesIO(content)).pages), model_id))
+        return {"analyzeResult": {"content": self.content}}
+
+    def extract_content(self, analysis):
+        return analysis["analyzeResult"]["content"]
+
+class RecordingDocuments:
+    def __init__(self):
+        self.changes = []
+
+    async def set_category(self, document_id, category_id):
+        self.changes.append((document_id, category_id))
+
+def blank_pdf(path, pages: int) -> str:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+@pytest.fixture
+def classifier():
+    return DocumentClassifier(min_confidence=0.5)
+
+def test_distinctive_phrases_win_with_confidence(classifier):
+    result = classifier.score(
+        "Form 1040 U.S. Individual Income Tax Return\nFiling status: Married filing jointly\n"
+        "Social security number\nAdjusted gross income\nStandard deduction"
+    )
+    assert result.category_id == "personal-tax-returns"
+    assert result.confidence > 0.5
+    assert result.source == "local"
+
+def test_thin_or_shared_evidence_has_low_confidence(classifier):
+    # Phrases shared by both tax return categories cannot separate them
+    shared = classifier.score("Internal Revenue Service\ntaxable income")
+    assert shared.confidence == 0
+    thin = classifier.score("Collateral")
+    assert thin.category_id == "debt-schedule"
+    assert 0 < thin.confidence < 0.5
+
+def test_nothing_matched(classifier):
+    assert classifier.score("Lorem ipsum").category_id is None
+    assert classifier.score("Lorem ipsum").confidence == 0.0
+
+def test_phrases_match_across_pdf_spacing(classifier):
+    assert classifier.score("FORM1040").scores["personal-tax-returns"] > 0
+    assert classifier.score("form\n1120-S").category_id == "business-tax-returns"
+    assert classifier.score("platform 10400").category_id is None
+
+def test_extracts_spreadsheet_docx_and_csv_text(classifier, tmp_path):
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Balance Sheet"
+    workbook.active.append(["Total assets", 1000])
+    workbook.save(tmp_path / "q3.xlsx")
+    assert classifier.classify_file(str(tmp_path / "q3.xlsx")).category_id == "balance-sheet"
+
+    with zipfile.ZipFile(tmp_path / "plan.docx", "w") as archive:
+        archive.writestr("word/document.xml", "<w:body><w:t>Use of funds</w:t><w:t>Working capital</w:t></w:body>")
+    assert classifier.classify_file(str(tmp_path / "plan.docx")).category_id == "project-costs"
+
+    (tmp_path / "loans.csv").write_text("Creditor,Original amount,Present balance,Maturity date\n")
+    assert classifier.classify_file(str(tmp_path / "loans.csv")).category_id == "debt-schedule"
+
+def test_unreadable_content_falls_back_to_the_filename(classifier, tmp_path):
+    (tmp_path / "debt_schedule.xlsx").write_bytes(b"not a workbook")
+    result = classifier.classify_file(str(tmp_path / "debt_schedule.xlsx"))
+    assert result.category_id == "debt-schedule"
+
+def test_remote_fallback_only_for_weak_pdf_results(classifier):
+    weak, strong = classifier.score("Collateral"), classifier.score("Debt schedule\nCreditor\nMaturity date")
+    assert not classifier.needs_remote(weak, "scan.pdf")
+    classifier.azure_service = FakeAzure("")
+    assert classifier.needs_remote(weak, "scan.PDF")
+    assert not classifier.needs_remote(weak, "scan.xlsx")
+    assert not classifier.needs_remote(strong, "scan.pdf")
+
+async def test_background_read_recategorizes_when_more_confident(classifier, tmp_path, monkeypatch):
+    monkeypatch.setattr("app.utils.config.Config.CLASSIFIER_MAX_PAGES", 2)
+    azure = FakeAzure("Form 1040 U.S. Individual Income Tax Return\nFiling status\nSocial security number")
+    classifier.azure_service = azure
+    documents = RecordingDocuments()
+    path = blank_pdf(tmp_path / "scan.pdf", pages=5)
+
+    classifier.reclassify_in_background("doc-1", path, "scan.pdf", classifier.score("scan"), documents)
+    await asyncio.gather(*classifier._tasks)
+    # Only the leading pages are sent, to the read model
+    assert azure.calls == [(2, "prebuilt-read")]
+    assert documents.changes == [("doc-1", "personal-tax-returns")]
+
+async def test_background_read_keeps_a_better_local_result(classifier, tmp_path):
+    classifier.azure_service = FakeAzure("Collateral")
+    documents = RecordingDocuments()
+    local = classifier.score("Form 1040 U.S. Individual Income Tax Return\nFiling status")
+
+    classifier.reclassify_in_background("doc-1", blank_pdf(tmp_path / "scan.pdf", 1), "scan.pdf", local, documents)
+    await asyncio.gather(*classifier._tasks)
+    assert documents.changes == []
@@ -0,0 +1,87 @@
+import gzip
+import brotli
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from app.utils import compression
+from app.utils.compression import CompressionMiddleware, negotiate_encoding
+
+pytestmark = pytest.mark.anyio
+
+LARGE = {"content": "Form 1040 " * 200}
+
+async def large(request):
+    return JSONResponse(LARGE, headers={"ETag": '"v1"'})
+
+async def small(request):
+    return JSONResponse({"ok": True})
+
+async def text(request):
+    return PlainTextResponse("x" * 5000)
+
+async def stream(request):
+    async def lines():
+        for _ in range(3):
+            yield b'{"event": "poll"}\n' * 100
+    return StreamingResponse(lines(), media_type="application/json")
+
+async def not_modified(request):
+    return Response(status_code=304, headers={"ETag": '"v1"'})
+
+app = CompressionMiddleware(Starlette(routes=[
+    Route("/large", large), Route("/small", small), Route("/text", text),
+    Route("/stream", stream), Route("/not-modified", not_modified),
+]), minimum_size=1000)
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+async def raw(client, path, accept_encoding):
+    """Response headers and undecoded body"""
+    async with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join([chunk async for chunk in response.aiter_raw()])
+
+async def test_large_json_prefers_brotli(client):
+    response, body = await raw(client, "/large", "gzip, br")
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(body)
+    assert response.headers["etag"] == 'W/"v1"'
+    assert brotli.decompress(body) == JSONResponse(LARGE).body
+
+async def test_gzip_when_brotli_is_refused_or_unavailable(client, monkeypatch):
+    response, body = await raw(client, "/large", "br;q=0, gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body) == JSONResponse(LARGE).body
+
+    monkeypatch.setattr(compression, "brotli", None)
+    response, _ = await raw(client, "/large", "br")
+    assert "content-encoding" not in response.headers
+
+@pytest.mark.parametrize("path", ["/small", "/text", "/stream", "/not-modified"])
+async def test_small_non_json_streamed_and_304_responses_pass_through(client, path):
+    response, body = await raw(client, path, "br, gzip")
+    assert "content-encoding" not in response.headers
+    if path == "/stream":
+        assert body == b'{"event": "poll"}\n' * 300
+
+async def test_identity_without_accept_encoding(client):
+    response, body = await raw(client, "/large", "identity")
+    assert "content-encoding" not in response.headers
+    assert body == JSONResponse(LARGE).body
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("gzip", "gzip"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("*", "br"),
+    ("*;q=0, gzip;q=0", None),
+    ("deflate", None),
+    ("gzip;q=bogus", None),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
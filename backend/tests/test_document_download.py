@@ -0,0 +1,70 @@
+import os
+import pytest
+from app.utils.responses import ZeroCopyFileResponse, etag_matches
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = bytes(range(256)) * 40
+
+@pytest.fixture
+async def stored_document(add_document, tmp_path):
+    path = tmp_path / "form.pdf"
+    path.write_bytes(CONTENT)
+    return await add_document(file_path=str(path), file_size=len(CONTENT), content_hash="abc123", original_filename="f1040.pdf")
+
+async def test_full_download_carries_the_content_hash_etag(api, stored_document):
+    response = await api.get(f"/files/documents/{stored_document}/content")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == '"abc123"'
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-disposition"] == 'inline; filename="f1040.pdf"'
+    assert response.headers["cache-control"] == "private, no-cache"
+
+async def test_range_request_returns_partial_content(api, stored_document):
+    response = await api.get(f"/files/documents/{stored_document}/content", headers={"Range": "bytes=100-299"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-299/{len(CONTENT)}"
+    assert response.content == CONTENT[100:300]
+
+@pytest.mark.parametrize("if_none_match", ['"abc123"', 'W/"abc123"', '"old", "abc123"', "*"])
+async def test_matching_etag_is_not_modified(api, stored_document, if_none_match):
+    response = await api.get(f"/files/documents/{stored_document}/content", headers={"If-None-Match": if_none_match})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == '"abc123"'
+
+async def test_stale_etag_gets_the_file(api, stored_document):
+    response = await api.get(f"/files/documents/{stored_document}/content", headers={"If-None-Match": '"old"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+async def test_missing_document_or_file_is_not_found(api, add_document):
+    assert (await api.get("/files/documents/missing/content")).status_code == 404
+    document_id = await add_document()
+    response = await api.get(f"/files/documents/{document_id}/content")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Document file not found."
+
+def test_etag_matches():
+    assert not etag_matches(None, '"a"')
+    assert etag_matches('"b", W/"a"', '"a"')
+    assert not etag_matches('"b"', '"a"')
+
+async def test_zero_copy_send_hands_over_the_open_file(tmp_path):
+    path = tmp_path / "form.pdf"
+    path.write_bytes(CONTENT)
+    response = ZeroCopyFileResponse(str(path), stat_result=os.stat(path), media_type="application/pdf")
+    messages = []
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopysend":
+            message = {**message, "file": message["file"].read()}
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [], "extensions": {"http.response.zerocopysend": {}}}
+    await response(scope, None, send)
+    assert messages[0]["status"] == 200
+    assert messages[1] == {
+        "type": "http.response.zerocopysend", "file": CONTENT, "offset": 0, "count": len(CONTENT), "more_body": False
+    }
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import pytest
+from app.routes import file_routes
+from app.services.event_bus import DocumentEventBus
+
+pytestmark = pytest.mark.anyio
+
+def sse(body: str) -> list:
+    """Parse an event stream into (event, data) pairs, skipping comments and fields without data"""
+    events = []
+    assert body.endswith("\n\n")
+    for message in body[:-2].split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.split("\n") if not line.startswith(":"))
+        if "data" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+async def test_document_events_are_framed_as_server_sent_events(api, monkeypatch):
+    events = DocumentEventBus()
+    monkeypatch.setattr(file_routes.document_service, "events", events)
+
+    async def publish():
+        while "user-1" not in events.subscribers:
+            await asyncio.sleep(0.01)
+        events.publish("user-1", "created", {"document_id": "doc-1", "original_filename": "a\nb.pdf"})
+        events.publish("user-1", "deleted", {"document_ids": ["doc-1"]})
+        # close() drops undelivered events
+        while any(not queue.empty() for queue in events.subscribers.get("user-1", ())):
+            await asyncio.sleep(0.01)
+        events.close()
+
+    publisher = asyncio.create_task(publish())
+    response = await api.get("/files/documents/user-1/events")
+    await publisher
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.startswith("retry: 3000\n")
+    assert sse(response.text) == [
+        ("ready", {"documents_version": 0, "etag": 'W/"documents-0"'}),
+        ("created", {"document_id": "doc-1", "original_filename": "a\nb.pdf"}),
+        ("deleted", {"document_ids": ["doc-1"]}),
+    ]
+
+async def test_subscribers_only_get_their_users_events():
+    events = DocumentEventBus()
+    async with events.subscribe("user-1") as mine, events.subscribe("user-2") as theirs:
+        events.publish("user-1", "deleted", {"document_ids": ["doc-1"]})
+        assert (await mine.get())["data"] == {"document_ids": ["doc-1"]}
+        assert theirs.empty()
+    assert events.subscribers == {}
+
+async def test_a_subscriber_that_falls_behind_is_told_to_resync():
+    events = DocumentEventBus(queue_size=2)
+    async with events.subscribe("user-1") as queue:
+        for n in range(3):
+            events.publish("user-1", "created", {"document_id": f"doc-{n}"})
+        assert queue.qsize() == 1
+        assert (await queue.get())["event"] == "resync"
+    assert events.stats()["resyncs"] == 1
@@ -0,0 +1,57 @@
+import datetime
+import pytest
+from app.services.document_service import decode_cursor, encode_cursor
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def documents(add_document):
+    """Five documents, newest first; two pairs share a created_at second"""
+    base = datetime.datetime(2024, 3, 1, 12, 0, 0)
+    seconds = [40, 30, 30, 20, 20]
+    ids = []
+    for position, second in enumerate(seconds):
+        ids.append(await add_document(
+            id=f"doc-{position}-{second}",
+            created_at=base.replace(second=second)
+        ))
+    return sorted(ids, key=lambda document_id: (int(document_id.rsplit("-", 1)[1]), document_id), reverse=True)
+
+async def page_through(document_service, limit, cursor=None):
+    ids = []
+    while True:
+        page = await document_service.get_user_documents_page("user-1", limit, cursor)
+        ids += [document.id for document in page.documents]
+        if page.next_cursor is None:
+            return ids
+        cursor = page.next_cursor
+
+async def test_pages_cover_every_document_once_in_order(document_service, documents):
+    assert await page_through(document_service, limit=2) == documents
+    assert [document.id for document in await document_service.get_user_documents("user-1")] == documents
+
+async def test_cursor_survives_deleting_its_anchor_row(document_service, documents):
+    first = await document_service.get_user_documents_page("user-1", 2)
+    anchor = first.documents[-1].id
+    assert await document_service.delete_document(anchor)
+
+    rest = await page_through(document_service, 2, first.next_cursor)
+    assert rest == documents[2:]
+
+async def test_cursor_survives_deleting_the_whole_page(document_service, documents):
+    first = await document_service.get_user_documents_page("user-1", 3)
+    await document_service.delete_documents(document_ids=[document.id for document in first.documents])
+
+    rest = await page_through(document_service, 3, first.next_cursor)
+    assert rest == documents[3:]
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-03-01 12:00:30.000000", "doc-1")
+    assert decode_cursor(cursor, "sqlite") == ("2024-03-01 12:00:30.000000", "doc-1")
+    created_at = datetime.datetime(2024, 3, 1, 12, 0, 30, tzinfo=datetime.timezone.utc)
+    assert decode_cursor(encode_cursor(created_at, "doc-1"), "postgresql") == (created_at, "doc-1")
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor("2024-03-01", "doc")[:-3], "WzEsMl0"])
+async def test_malformed_cursor_is_rejected(document_service, documents, cursor):
+    with pytest.raises(ValueError):
+        await document_service.get_user_documents_page("user-1", 2, cursor)
@@ -0,0 +1,36 @@
+import pytest
+from app.services.cache_service import content_hash
+from app.services.document_service import DocumentService
+from app.services.event_bus import DocumentEventBus
+from app.services.file_service import StoredFile
+
+@pytest.fixture
+def documents(schema):
+    with DocumentService(events=DocumentEventBus()) as documents:
+        yield documents
+
+def test_scripts_get_the_same_data_layer_without_an_event_loop(documents, tmp_path):
+    path = tmp_path / "form.pdf"
+    path.write_bytes(b"%PDF-1.4 form")
+    stored = StoredFile(
+        filename="form.pdf", file_path=str(path), file_size=13,
+        content_hash=content_hash(b"%PDF-1.4 form"), mime_type="application/pdf"
+    )
+
+    assert documents.validate_category("tax-returns")
+    assert not documents.validate_category("no-such-category")
+    document = documents.create_document("user-1", "tax-returns", "f1040.pdf", stored)
+    assert [listed.id for listed in documents.get_user_documents("user-1")] == [document.id]
+
+    assert documents.update_status(document.id, "completed", "Analysis completed", {"validation": {"is_valid": True}})
+    assert documents.get_completed_details(document.id) == {"validation": {"is_valid": True}}
+    assert [entry.status for entry in documents.get_status_history(document.id)] == ["completed"]
+
+    assert documents.delete_document(document.id)
+    assert not path.exists()
+    assert documents.get_user_documents("user-1") == []
+
+def test_close_is_idempotent(schema):
+    documents = DocumentService()
+    documents.close()
+    documents.close()
@@ -0,0 +1,86 @@
+import pytest
+from app.services.evidence_service import EvidenceBuilder, clean_lines
+
+class WordEncoding:
+    """One token per word keeps budgets easy to reason about"""
+    def encode(self, text):
+        return text.split()
+
+def builder(token_budget: int) -> EvidenceBuilder:
+    builder = EvidenceBuilder(token_budget=token_budget)
+    builder.encoding, builder.encoding_loaded = WordEncoding(), True
+    return builder
+
+ANALYSIS = {"analyzeResult": {
+    "content": "\n".join([
+        "Form 1040",
+        "U.S. Individual Income Tax Return",
+        "2023",
+        "Your first name and middle initial",
+        "Wages, salaries, tips . . . . . . . 52,000.00",
+        "Filing Status",
+        "Presidential election campaign fund check here if you want $3 to go to this fund",
+        "Single :selected: Married filing jointly :unselected:",
+    ]),
+    "documents": [{"docType": "tax.us.1040", "confidence": 0.93, "fields": {
+        "TaxYear": {"valueString": "2023"},
+        "Taxpayer": {"valueObject": {"Name": {"valueString": "Jane Doe"}, "SSN": {"content": ""}}},
+        "Dependents": {"valueArray": [{"valueObject": {"Name": {"valueString": "Sam Doe"}}}]},
+        "Wages": {"valueCurrency": {"amount": 52000.0}},
+    }}],
+    "keyValuePairs": [{"key": {"content": "Occupation"}, "value": {"content": "Engineer"}}],
+}}
+
+def test_everything_fits_a_generous_budget():
+    evidence = builder(1000).from_analysis(ANALYSIS)
+    assert evidence.dropped_lines == 0
+    assert evidence.text.split("\n") == [
+        "Form 1040",
+        "U.S. Individual Income Tax Return",
+        "2023",
+        "Document type: tax.us.1040 (confidence 0.93)",
+        "TaxYear: 2023",
+        "Taxpayer.Name: Jane Doe",
+        "Dependents.1.Name: Sam Doe",
+        "Wages: 52000.0",
+        "Occupation: Engineer",
+        # Remaining text in document order
+        "Your first name and middle initial",
+        "Wages, salaries, tips 52,000.00",
+        "Filing Status",
+        "Presidential election campaign fund check here if you want $3 to go to this fund",
+        "Single [x] Married filing jointly [ ]",
+    ]
+    assert evidence.tokens == sum(len(line.split()) + 1 for line in evidence.text.split("\n"))
+
+@pytest.mark.parametrize("budget", [5, 20, 40, 60])
+def test_budget_is_never_exceeded(budget):
+    evidence = builder(budget).from_analysis(ANALYSIS)
+    assert evidence.tokens <= budget
+    assert evidence.tokens == sum(len(line.split()) + 1 for line in evidence.text.split("\n") if line)
+
+def test_fields_outrank_text_and_valuable_lines_outrank_long_ones():
+    # Title and fields take 34 tokens; 20 remain for the body text
+    evidence = builder(54).from_analysis(ANALYSIS)
+    lines = evidence.text.split("\n")
+    assert lines[:9][-1] == "Occupation: Engineer"
+    assert lines[9:] == ["Wages, salaries, tips 52,000.00", "Filing Status", "Single [x] Married filing jointly [ ]"]
+    assert evidence.dropped_lines == 2
+
+def test_title_comes_first_when_the_budget_is_tight():
+    evidence = builder(3).from_content("Form W-2\nWage and Tax Statement\nEmployer identification number")
+    assert evidence.text == "Form W-2"
+    assert evidence.dropped_lines == 2
+
+def test_token_counts_are_estimated_without_a_tokenizer():
+    estimating = EvidenceBuilder(token_budget=100)
+    estimating.encoding_loaded = True
+    assert estimating.count_tokens("x" * 35) == 10
+
+def test_print_artifacts_are_removed():
+    assert clean_lines(
+        "1a\nSee separate instructions.\nOMB No. 1545-0074\n"
+        "Total income (see instructions) . . . . . 61,000\n"
+        ":unselected: :unselected: :unselected:\n"
+        "Head of household :unselected: :unselected: :selected:"
+    ) == ["Total income 61,000", "Head of household [ ] [x]"]
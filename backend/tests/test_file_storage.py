@@ -0,0 +1,58 @@
+import hashlib
+import io
+import os
+import pytest
+from starlette.datastructures import Headers, UploadFile
+from app.services import file_service as file_service_module
+from app.services.file_service import FileService, sniff_mime_type
+
+pytestmark = pytest.mark.anyio
+
+def upload(content: bytes, filename: str = "f1040.pdf", size=None, content_type="application/octet-stream") -> UploadFile:
+    return UploadFile(
+        io.BytesIO(content), size=size, filename=filename, headers=Headers({"content-type": content_type})
+    )
+
+@pytest.fixture
+def file_service():
+    return FileService()
+
+async def test_stores_in_one_pass_with_size_and_hash(file_service, tmp_path, monkeypatch):
+    monkeypatch.setattr(file_service_module, "CHUNK_SIZE", 1000)
+    content = b"%PDF-1.7\n" + os.urandom(4500)
+    stored = await file_service.store_upload(upload(content), str(tmp_path / "u1" / "tax-returns"))
+
+    assert os.path.dirname(stored.file_path) == str(tmp_path / "u1" / "tax-returns")
+    assert stored.filename.endswith(".pdf") and stored.filename != "f1040.pdf"
+    assert open(stored.file_path, "rb").read() == content
+    assert stored.file_size == len(content)
+    assert stored.content_hash == hashlib.sha256(content).hexdigest()
+    # Sniffed from the bytes, not the client's content type
+    assert stored.mime_type == "application/pdf"
+    assert stored.blob_path is None
+
+async def test_unrecognised_content_keeps_the_client_type(file_service, tmp_path):
+    stored = await file_service.store_upload(upload(b"plain text", "notes.txt", content_type="text/plain"), str(tmp_path))
+    assert stored.mime_type == "text/plain"
+
+async def test_oversized_stream_is_aborted_and_removed(file_service, tmp_path, monkeypatch):
+    monkeypatch.setattr(file_service_module, "CHUNK_SIZE", 64 * 1024)
+    with pytest.raises(ValueError, match="exceeds maximum allowed size"):
+        await file_service.store_upload(upload(b"%PDF" + b"x" * (1024 * 1024)), str(tmp_path), max_size_mb=1)
+    assert os.listdir(tmp_path) == []
+
+async def test_declared_size_is_rejected_before_writing(file_service, tmp_path):
+    with pytest.raises(ValueError, match="exceeds maximum allowed size"):
+        await file_service.store_upload(upload(b"%PDF", size=11 * 1024 * 1024), str(tmp_path / "never"))
+    assert not os.path.exists(tmp_path / "never")
+
+@pytest.mark.parametrize("head, filename, expected", [
+    (b"%PDF-1.4", "scan.bin", "application/pdf"),
+    (b"PK\x03\x04", "book.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    (b"PK\x03\x04", "archive.bin", "application/zip"),
+    (b"\xd0\xcf\x11\xe0", "old.XLS", "application/vnd.ms-excel"),
+    (b"a,b,c\n", "table.csv", "text/csv"),
+    (b"GIF89a", "image.gif", None),
+])
+def test_sniff_mime_type(head, filename, expected):
+    assert sniff_mime_type(head, filename) == expected
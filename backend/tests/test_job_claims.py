@@ -0,0 +1,137 @@
+import asyncio
+import datetime
+import pytest
+from app.models.responses import ValidationResult
+from app.services import job_service
+from app.services.job_service import AnalysisJobQueue
+from app.services.rate_limiter import UpstreamUnavailableError
+from app.utils.config import Config
+
+pytestmark = pytest.mark.anyio
+
+def expired_lease() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=2 * Config.JOB_LEASE_SECONDS)
+
+def fresh_lease() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+async def test_only_one_worker_claims_a_queued_job(document_service, add_document):
+    document_id = await add_document(status="queued")
+    claims = await asyncio.gather(*(
+        document_service.claim_job(document_id, f"worker-{i}") for i in range(4)
+    ))
+    assert claims.count(True) == 1
+    document = await document_service.get_document(document_id)
+    assert document.status == "processing"
+    assert document.job_attempts == 1
+
+async def test_expired_lease_is_taken_over(document_service, add_document):
+    document_id = await add_document(
+        status="processing", job_claimed_by="dead-worker", job_claimed_at=expired_lease(), job_attempts=1
+    )
+    assert await document_service.get_claimable_job_ids(include_queued=False) == [document_id]
+    assert await document_service.claim_job(document_id, "worker-2")
+
+    # The old worker comes back: its status updates no longer apply
+    assert not await document_service.update_status(document_id, "completed", claimed_by="dead-worker")
+    assert await document_service.update_status(document_id, "completed", claimed_by="worker-2")
+    assert (await document_service.get_document(document_id)).status == "completed"
+
+async def test_live_lease_is_not_taken_over(document_service, add_document):
+    document_id = await add_document(
+        status="processing", job_claimed_by="worker-1", job_claimed_at=fresh_lease(), job_attempts=1
+    )
+    assert await document_service.get_claimable_job_ids() == []
+    assert not await document_service.claim_job(document_id, "worker-2")
+
+async def test_job_out_of_attempts_is_failed(document_service, add_document):
+    document_id = await add_document(
+        status="processing", job_claimed_by="dead-worker", job_claimed_at=expired_lease(),
+        job_attempts=Config.JOB_MAX_ATTEMPTS
+    )
+    assert await document_service.get_claimable_job_ids() == []
+    assert not await document_service.claim_job(document_id, "worker-2")
+
+    assert await document_service.fail_abandoned_jobs() == [document_id]
+    assert (await document_service.get_document(document_id)).status == "failed"
+    assert await document_service.fail_abandoned_jobs() == []
+
+class FakeAnalyzer:
+    def __init__(self):
+        self.calls = []
+
+    async def analyze_file(self, file_path, content_hash, category_id=None):
+        self.calls.append(file_path)
+        await asyncio.sleep(0.01)
+        return {"analyzeResult": {"content": "Form 1040"}}
+
+class FakeVerifier:
+    async def averify_analysis(self, analysis_result):
+        return ValidationResult(is_valid=True, form_type="Form 1040", confidence=9, explanation="ok", issues="None")
+
+def job_queue(document_service, analyzer) -> AnalysisJobQueue:
+    return AnalysisJobQueue(None, FakeVerifier(), document_service, concurrency=2, packet_analyzer=analyzer)
+
+async def test_recovery_runs_each_pending_job_once_across_processes(document_service, add_document):
+    queued = [await add_document(status="queued") for _ in range(3)]
+    stale = await add_document(
+        status="processing", job_claimed_by="dead-worker", job_claimed_at=expired_lease(), job_attempts=1
+    )
+    running = await add_document(
+        status="processing", job_claimed_by="live-worker", job_claimed_at=fresh_lease(), job_attempts=1
+    )
+    finished = await add_document(status="completed")
+
+    analyzer = FakeAnalyzer()
+    # Two processes starting at once both recover the same jobs
+    queues = [job_queue(document_service, analyzer) for _ in range(2)]
+    for queue in queues:
+        await queue.start()
+    try:
+        await asyncio.gather(*(queue.queue.join() for queue in queues))
+    finally:
+        for queue in queues:
+            await queue.stop()
+
+    assert sorted(analyzer.calls) == sorted(f"/nonexistent/{document_id}.pdf" for document_id in queued + [stale])
+    for document_id in queued + [stale]:
+        assert (await document_service.get_document(document_id)).status == "completed"
+    assert (await document_service.get_document(running)).status == "processing"
+    assert (await document_service.get_document(finished)).status == "completed"
+
+async def test_recover_without_queued_only_picks_up_expired_leases(document_service, add_document):
+    await add_document(status="queued")
+    stale = await add_document(
+        status="processing", job_claimed_by="dead-worker", job_claimed_at=expired_lease(), job_attempts=1
+    )
+    queue = job_queue(document_service, FakeAnalyzer())
+    assert await queue.recover() == 1
+    assert queue.queue.get_nowait() == stale
+
+class UnavailableAnalyzer(FakeAnalyzer):
+    async def analyze_file(self, file_path, content_hash, category_id=None):
+        if not self.calls:
+            self.calls.append(file_path)
+            raise UpstreamUnavailableError("Azure", "circuit open", retry_after=0.05)
+        return await super().analyze_file(file_path, content_hash, category_id)
+
+async def test_upstream_outage_requeues_without_using_an_attempt(document_service, add_document, monkeypatch):
+    monkeypatch.setattr(job_service, "MIN_RETRY_DELAY", 0)
+    document_id = await add_document(status="queued")
+    analyzer = UnavailableAnalyzer()
+    queue = job_queue(document_service, analyzer)
+    await queue.start()
+    try:
+        await queue.queue.join()
+        document = await document_service.get_document(document_id)
+        assert (document.status, document.job_attempts, document.job_claimed_by) == ("queued", 0, None)
+        assert document.status_message == "Waiting for Azure, retrying in 0.05s"
+
+        while (await document_service.get_document(document_id)).status != "completed":
+            await asyncio.sleep(0.01)
+    finally:
+        await queue.stop()
+    assert len(analyzer.calls) == 2
+    assert (await document_service.get_document(document_id)).job_attempts == 1
+    history = await document_service.get_status_history(document_id)
+    assert [entry.status for entry in history][-5:] == ["processing", "queued", "processing", "processing", "completed"]
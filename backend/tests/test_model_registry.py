@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from app.services.azure_service import LAYOUT_MODEL_ID, READ_MODEL_ID, TAX_MODEL_ID
+from app.services.model_registry import ModelRegistry, parse_category_models
+
+pytestmark = pytest.mark.anyio
+
+class FakeAzure:
+    def __init__(self, *model_ids):
+        self.model_ids = list(model_ids)
+        self.requests = 0
+        self.fail = False
+
+    async def list_models(self):
+        self.requests += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("Azure is down")
+        return [{"modelId": model_id} for model_id in self.model_ids]
+
+@pytest.fixture
+def azure():
+    return FakeAzure(TAX_MODEL_ID, LAYOUT_MODEL_ID, READ_MODEL_ID, "custom-w9")
+
+async def test_known_models_pass_and_unknown_ones_are_rejected(azure):
+    registry = ModelRegistry(azure, routing={})
+    assert await registry.require_model("custom-w9") == "custom-w9"
+    with pytest.raises(ValueError, match="Unknown model_id: '../evil'"):
+        await registry.require_model("../evil")
+    assert azure.requests == 1
+
+async def test_concurrent_callers_share_one_listing(azure):
+    registry = ModelRegistry(azure, routing={})
+    await asyncio.gather(*(registry.models() for _ in range(5)))
+    assert azure.requests == 1
+
+async def test_stale_list_is_served_while_refreshing(azure):
+    registry = ModelRegistry(azure, routing={}, ttl_seconds=0)
+    await registry.models()
+    azure.model_ids.append("custom-1099")
+    etag = registry.etag
+
+    assert "custom-1099" not in {m["modelId"] for m in await registry.models()}
+    await registry._refresh_task
+    assert await registry.require_model("custom-1099") == "custom-1099"
+    assert registry.etag != etag
+
+async def test_failed_refresh_keeps_the_previous_list(azure):
+    registry = ModelRegistry(azure, routing={}, ttl_seconds=0)
+    await registry.models()
+    azure.fail = True
+    await registry.models()
+    await registry._refresh_task
+    assert await registry.require_model(TAX_MODEL_ID) == TAX_MODEL_ID
+
+async def test_routing_falls_back_to_layout(azure):
+    registry = ModelRegistry(azure, routing={"balance-sheet": "custom-balance"})
+    assert registry.model_for("personal-tax-returns") == TAX_MODEL_ID
+    assert registry.model_for("project-costs") == READ_MODEL_ID
+    assert registry.model_for("no-such-category") == LAYOUT_MODEL_ID
+    assert registry.model_for(None) == LAYOUT_MODEL_ID
+    # Before the model list is known the override is trusted
+    assert registry.model_for("balance-sheet") == "custom-balance"
+    await registry.models()
+    assert registry.model_for("balance-sheet") == LAYOUT_MODEL_ID
+
+def test_parse_category_models():
+    assert parse_category_models(" balance-sheet = custom-balance ,, profit-loss=prebuilt-read") == {
+        "balance-sheet": "custom-balance", "profit-loss": "prebuilt-read"
+    }
+    with pytest.raises(ValueError, match="Invalid AZ_CATEGORY_MODELS entry: 'balance-sheet'"):
+        parse_category_models("balance-sheet")
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from email.utils import formatdate
+import httpx
+import pytest
+from app.services.operation_poller import OperationPoller, PollSchedule, PollTimeoutError, parse_retry_after
+
+pytestmark = pytest.mark.anyio
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "250"}, 0.25),
+    ({"x-ms-retry-after-ms": "1500", "Retry-After": "9"}, 1.5),
+    ({"Retry-After": "2"}, 2.0),
+    ({"Retry-After": "-3"}, 0.0),
+    ({"Retry-After": "soon"}, None),
+    ({}, None),
+])
+def test_parse_retry_after(headers, expected):
+    assert parse_retry_after(httpx.Headers(headers)) == expected
+
+def test_parse_retry_after_http_date():
+    delay = parse_retry_after(httpx.Headers({"Retry-After": formatdate(time.time() + 30, usegmt=True)}))
+    assert 28 <= delay <= 30
+
+def test_schedule_backs_off_to_the_cap():
+    schedule = PollSchedule(initial_interval=0.25, max_interval=1, backoff=2, timeout=60)
+    assert [schedule.next_delay() for _ in range(5)] == [0.25, 0.5, 1, 1, 1]
+    assert schedule.attempts == 5
+
+def test_schedule_follows_retry_after_without_backing_off():
+    schedule = PollSchedule(initial_interval=0.25, max_interval=5, backoff=2, timeout=60)
+    assert schedule.next_delay(retry_after=3) == 3
+    assert schedule.next_delay() == 0.25
+
+def test_schedule_never_sleeps_past_the_deadline():
+    schedule = PollSchedule(initial_interval=5, max_interval=5, backoff=2, timeout=0.5)
+    assert schedule.next_delay() <= 0.5
+    schedule.deadline = time.monotonic() - 1
+    with pytest.raises(TimeoutError):
+        schedule.next_delay()
+
+def azure(responses):
+    """Client whose operation URLs answer from per-URL lists of (status code, body, headers)"""
+    polls = {}
+
+    def handler(request):
+        url = str(request.url)
+        polls[url] = polls.get(url, 0) + 1
+        status_code, body, headers = responses[url].pop(0) if len(responses[url]) > 1 else responses[url][0]
+        return httpx.Response(status_code, json=body, headers=headers)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), polls
+
+def fast_schedule(timeout=5):
+    return PollSchedule(initial_interval=0.01, max_interval=0.02, backoff=2, timeout=timeout)
+
+RUNNING = (200, {"status": "running"}, {})
+SUCCEEDED = (200, {"status": "succeeded", "analyzeResult": {"content": "Form 1040"}}, {})
+
+async def test_polls_until_succeeded_and_reports_each_status():
+    client, polls = azure({"http://azure/op/1": [RUNNING, (503, {}, {"Retry-After": "0"}), RUNNING, SUCCEEDED]})
+    poller = OperationPoller(client)
+    statuses = []
+    result = await poller.wait("http://azure/op/1", schedule=fast_schedule(), on_status=statuses.append)
+    assert result["analyzeResult"]["content"] == "Form 1040"
+    assert statuses == ["running", "running", "succeeded"]
+    assert polls["http://azure/op/1"] == 4
+
+async def test_retry_after_from_the_poll_response_is_honoured():
+    client, _ = azure({"http://azure/op/1": [(200, {"status": "running"}, {"retry-after-ms": "300"}), SUCCEEDED]})
+    started = time.monotonic()
+    await OperationPoller(client).wait("http://azure/op/1", schedule=fast_schedule())
+    assert time.monotonic() - started >= 0.3
+
+@pytest.mark.parametrize("response, message", [
+    ((200, {"status": "failed", "error": {"message": "corrupt PDF"}}, {}), "Analysis failed: corrupt PDF"),
+    ((404, {}, {}), "Error polling results: 404"),
+])
+async def test_terminal_errors_fail_the_wait(response, message):
+    client, _ = azure({"http://azure/op/1": [response]})
+    with pytest.raises(ValueError, match=message):
+        await OperationPoller(client).wait("http://azure/op/1", schedule=fast_schedule())
+
+async def test_operation_that_never_finishes_times_out():
+    client, _ = azure({"http://azure/op/1": [RUNNING]})
+    with pytest.raises(PollTimeoutError):
+        await OperationPoller(client).wait("http://azure/op/1", schedule=fast_schedule(timeout=0.1))
+
+async def test_many_operations_share_one_scheduler():
+    urls = [f"http://azure/op/{i}" for i in range(20)]
+    client, polls = azure({url: [RUNNING, SUCCEEDED] for url in urls})
+    poller = OperationPoller(client)
+    waits = [asyncio.create_task(poller.wait(url, schedule=fast_schedule())) for url in urls]
+    await asyncio.sleep(0)
+    assert poller.pending == 20
+    schedulers = [task for task in asyncio.all_tasks() if task.get_coro().__name__ == "_run"]
+    assert schedulers == [poller._task]
+    results = await asyncio.gather(*waits)
+    assert all(result["status"] == "succeeded" for result in results)
+    assert all(count == 2 for count in polls.values())
@@ -0,0 +1,106 @@
+import io
+import pytest
+from pypdf import PdfReader, PdfWriter
+from app.services.classifier_service import Classification, DocumentClassifier
+from app.services.packet_service import PacketAnalyzer, Segment, merge_segment_results
+
+pytestmark = pytest.mark.anyio
+
+MODELS = {"personal-tax-returns": "prebuilt-tax.us.1040"}
+
+class FakeRegistry:
+    def model_for(self, category_id):
+        return MODELS.get(category_id, "prebuilt-layout")
+
+class FakeAzure:
+    def __init__(self):
+        self.calls = []
+
+    async def analyze_document(self, pdf_content, model_id, pdf_hash=None, progress=None):
+        pages = len(PdfReader(io.BytesIO(pdf_content)).pages)
+        self.calls.append((model_id, pages, pdf_hash))
+        return {"analyzeResult": {
+            "modelId": model_id,
+            "content": f"{model_id} x{pages}",
+            "pages": [{"pageNumber": n, "spans": [{"offset": 0, "length": 5}]} for n in range(1, pages + 1)],
+        }}
+
+def page(category_id, confidence=0.9):
+    return Classification(category_id=category_id, confidence=confidence)
+
+def analyzer_for(pages, azure=None):
+    classifier = DocumentClassifier(min_confidence=0.5)
+    classifier.classify_pages = lambda stream: pages
+    return PacketAnalyzer(azure or FakeAzure(), classifier, FakeRegistry())
+
+def blank_pdf(pages: int) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+def test_confident_pages_start_segments_and_others_continue_them():
+    analyzer = analyzer_for([
+        page("personal-tax-returns"), page(None, 0), page("personal-tax-returns"),
+        page("balance-sheet"), page("profit-loss", 0.2),
+    ])
+    assert analyzer.detect_segments(io.BytesIO()) == [
+        Segment(0, 3, "personal-tax-returns", "prebuilt-tax.us.1040"),
+        Segment(3, 5, "balance-sheet", "prebuilt-layout"),
+    ]
+
+def test_leading_unrecognized_pages_join_the_first_form():
+    analyzer = analyzer_for([page(None, 0), page("balance-sheet", 0.3), page("personal-tax-returns"), page(None, 0)])
+    assert analyzer.detect_segments(io.BytesIO()) == [Segment(0, 4, "personal-tax-returns", "prebuilt-tax.us.1040")]
+
+def test_nothing_recognized_means_no_segments():
+    assert analyzer_for([page(None, 0), page("balance-sheet", 0.3)]).detect_segments(io.BytesIO()) == []
+
+def test_merged_results_are_rebased_onto_the_packet():
+    segments = [Segment(0, 2, "personal-tax-returns", "prebuilt-tax.us.1040"), Segment(2, 3, "balance-sheet", "prebuilt-layout")]
+    merged = merge_segment_results(segments, [
+        {"analyzeResult": {
+            "modelId": "prebuilt-tax.us.1040",
+            "content": "Form 1040",
+            "pages": [{"pageNumber": 1}, {"pageNumber": 2}],
+            "documents": [{"fields": {"Wages": {"boundingRegions": [{"pageNumber": 2}], "spans": [{"offset": 5, "length": 4}]}}}],
+        }},
+        {"analyzeResult": {
+            "content": "Balance Sheet",
+            "pages": [{"pageNumber": 1, "spans": [{"offset": 0, "length": 13}]}],
+            "tables": [{"cells": [{"content": "Sheet", "boundingRegions": [{"pageNumber": 1}], "spans": [{"offset": 8, "length": 5}]}]}],
+        }},
+    ])
+
+    result = merged["analyzeResult"]
+    assert result["content"] == "Form 1040\nBalance Sheet"
+    assert [p["pageNumber"] for p in result["pages"]] == [1, 2, 3]
+    assert result["pages"][2]["spans"] == [{"offset": 10, "length": 13}]
+    wages = result["documents"][0]["fields"]["Wages"]
+    assert wages["boundingRegions"] == [{"pageNumber": 2}] and wages["spans"] == [{"offset": 5, "length": 4}]
+    cell = result["tables"][0]["cells"][0]
+    assert cell["boundingRegions"] == [{"pageNumber": 3}]
+    assert result["content"][cell["spans"][0]["offset"]:][:5] == "Sheet"
+    assert merged["segments"] == [
+        {"pages": [1, 2], "category_id": "personal-tax-returns", "model_id": "prebuilt-tax.us.1040", "modelId": "prebuilt-tax.us.1040"},
+        {"pages": [3, 3], "category_id": "balance-sheet", "model_id": "prebuilt-layout", "modelId": "prebuilt-layout"},
+    ]
+
+async def test_packet_forms_are_analyzed_separately_with_every_page():
+    azure = FakeAzure()
+    analyzer = analyzer_for([page(None, 0), page("personal-tax-returns"), page(None, 0), page("balance-sheet")], azure)
+    result = await analyzer.analyze_document(blank_pdf(4), pdf_hash="abc")
+
+    assert sorted(azure.calls) == [
+        ("prebuilt-layout", 1, "abc:pages-4-4"),
+        ("prebuilt-tax.us.1040", 3, "abc:pages-1-3"),
+    ]
+    assert [p["pageNumber"] for p in result["analyzeResult"]["pages"]] == [1, 2, 3, 4]
+
+async def test_single_form_is_analyzed_whole():
+    azure = FakeAzure()
+    analyzer = analyzer_for([page(None, 0), page("personal-tax-returns")], azure)
+    await analyzer.analyze_document(blank_pdf(2), pdf_hash="abc")
+    assert azure.calls == [("prebuilt-tax.us.1040", 2, "abc")]
@@ -0,0 +1,73 @@
+import json
+import zlib
+import pytest
+from app.services.cache_service import ResultCache, content_hash, file_content_hash
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+def open_cache(cache_path, version="v1", max_bytes=1024 * 1024, ttl_seconds=None):
+    return ResultCache("azure_analysis", version=version, max_bytes=max_bytes, ttl_seconds=ttl_seconds, db_path=cache_path)
+
+def test_values_round_trip_compressed(cache_path):
+    cache = open_cache(cache_path)
+    value = {"analyzeResult": {"content": "Form 1040 " * 200, "pages": [{"pageNumber": 1}], "note": "café"}}
+    cache.put("key", value)
+    assert cache.get("key") == value
+
+    data, size = cache._conn.execute(f"SELECT data, size FROM {cache.table} WHERE key = 'key'").fetchone()
+    assert json.loads(zlib.decompress(data)) == value
+    assert size == len(data) < len(json.dumps(value))
+
+def test_entries_survive_reopening_but_not_a_version_change(cache_path):
+    open_cache(cache_path).put("key", {"a": 1})
+    assert open_cache(cache_path).get("key") == {"a": 1}
+    assert open_cache(cache_path, version="v2").get("key") is None
+    assert open_cache(cache_path).get("key") is None
+
+def test_expired_entries_are_misses(cache_path):
+    cache = open_cache(cache_path, ttl_seconds=60)
+    cache.put("fresh", {"a": 1})
+    cache.put("stale", {"a": 2})
+    cache._conn.execute(f"UPDATE {cache.table} SET created_at = created_at - 120 WHERE key = 'stale'")
+    assert cache.get("fresh") == {"a": 1}
+    assert cache.get("stale") is None
+    assert cache.stats()["entries"] == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_least_recently_used_entries_are_evicted_over_the_size_bound(cache_path):
+    cache = open_cache(cache_path)
+    cache.put("a", {"n": "a" * 50})
+    entry_size = cache.stats()["size_bytes"]
+    cache.max_bytes = 2 * entry_size
+
+    cache.put("b", {"n": "b" * 50})
+    cache._conn.execute(f"UPDATE {cache.table} SET accessed_at = accessed_at - 10 WHERE key IN ('a', 'b')")
+    assert cache.get("a") is not None
+    cache.put("c", {"n": "c" * 50})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.evictions == 1
+    assert cache.stats()["size_bytes"] <= cache.max_bytes
+
+def test_values_larger_than_the_cache_are_not_stored(cache_path):
+    cache = open_cache(cache_path, max_bytes=16)
+    cache.put("key", {"content": "x" * 1000 + content_hash(b"incompressible")})
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+def test_invalidate(cache_path):
+    cache = open_cache(cache_path)
+    for key in ("a", "b", "c"):
+        cache.put(key, {"key": key})
+    cache.invalidate("a")
+    assert cache.get("a") is None and cache.get("b") == {"key": "b"}
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+
+def test_file_hash_matches_content_hash(tmp_path):
+    path = tmp_path / "form.pdf"
+    path.write_bytes(b"%PDF-1.4 " * 100_000)
+    assert file_content_hash(str(path), chunk_size=4096) == content_hash(path.read_bytes())
@@ -0,0 +1,55 @@
+import importlib.util
+import os
+import zlib
+import pytest
+from app.services import status_details
+from app.services.status_details import pack_details, unpack_details
+from app.utils.config import Config
+
+MIGRATION = os.path.join(
+    os.path.dirname(__file__), "..", "migrations", "versions", "4d7f1b9e3a58_add_document_status_payloads.py"
+)
+
+def large_details():
+    return {
+        "validation": {"is_valid": True, "form_type": "Form 1040"},
+        "error": "Azure analysis failed: " + "x" * 5000,
+        "analysis": {"analyzeResult": {"content": "Form 1040 " * 1000}},
+    }
+
+@pytest.fixture(autouse=True)
+def inline_limit(monkeypatch):
+    monkeypatch.setattr(Config, "STATUS_DETAILS_INLINE_MAX_BYTES", 4096)
+
+def test_small_details_stay_in_row():
+    details = {"validation": {"is_valid": True}}
+    assert pack_details(details) == (details, None)
+    assert pack_details(None) == (None, None)
+
+def test_large_details_move_out_of_row_with_a_summary():
+    details = large_details()
+    summary, payload = pack_details(details)
+    assert summary["validation"] == details["validation"]
+    assert summary["error"] == details["error"][:1024] + "…"
+    assert "analysis" not in summary
+    assert payload.size > len(payload.data)
+    assert unpack_details(payload.codec, payload.data) == details
+
+def test_zlib_is_used_without_zstandard(monkeypatch):
+    monkeypatch.setattr(status_details, "zstandard", None)
+    details = large_details()
+    summary, payload = pack_details(details)
+    assert payload.codec == "zlib"
+    assert unpack_details("zlib", payload.data) == details
+
+def test_zstd_payloads_need_zstandard(monkeypatch):
+    monkeypatch.setattr(status_details, "zstandard", None)
+    with pytest.raises(RuntimeError, match="install zstandard"):
+        unpack_details("zstd", b"")
+    assert unpack_details("zlib", zlib.compress(b'{"a":1}')) == {"a": 1}
+
+def test_migration_summarizes_existing_rows_like_pack_details():
+    spec = importlib.util.spec_from_file_location("status_payloads_migration", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    assert migration._summary(large_details()) == pack_details(large_details())[0]
@@ -0,0 +1,53 @@
+import pytest
+from app.services import chatgpt_service
+from app.services.cache_service import ResultCache
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def cached(chatgpt, tmp_path):
+    def make(version: str = chatgpt_service.PROMPT_VERSION):
+        service = chatgpt()
+        service.cache = ResultCache("chatgpt_verification", version=version, max_bytes=1024 * 1024, db_path=str(tmp_path / "cache.db"))
+        return service
+    return make
+
+async def test_same_evidence_is_verified_once(cached):
+    service = cached()
+    first = await service.averify_tax_document("Form 1040 U.S. Individual Income Tax Return\nWages 52,000.00")
+    second = await service.averify_tax_document("Form 1040 U.S. Individual Income Tax Return\nWages 52,000.00")
+    assert first == second
+    assert first.form_type == "Form 1040"
+    assert len(service.requests) == 1
+    assert service.cache.stats()["hits"] == 1
+
+async def test_print_artifacts_do_not_change_the_key(cached):
+    service = cached()
+    await service.averify_tax_document("Form 1040 U.S. Individual Income Tax Return\nWages 52,000.00")
+    # Same evidence once boilerplate and dot leaders are removed
+    await service.averify_tax_document("Form 1040 U.S. Individual Income Tax Return\nSee separate instructions.\nWages . . . . 52,000.00")
+    assert len(service.requests) == 1
+
+async def test_different_content_is_verified_again(cached):
+    service = cached()
+    await service.averify_tax_document("Form 1040 U.S. Individual Income Tax Return")
+    await service.averify_tax_document("Form W-2 Wage and Tax Statement")
+    assert len(service.requests) == 2
+
+async def test_prompt_change_invalidates_cached_verdicts(cached):
+    service = cached()
+    await service.averify_tax_document("Form 1040 U.S. Individual Income Tax Return")
+    service = cached(version="next-prompt")
+    await service.averify_tax_document("Form 1040 U.S. Individual Income Tax Return")
+    assert len(service.requests) == 1
+
+def test_key_covers_model_temperature_and_prompt_version(chatgpt):
+    key = chatgpt()._cache_key("Form 1040")
+    assert key.split(":")[1:] == [chatgpt_service.MODEL, str(chatgpt_service.TEMPERATURE), chatgpt_service.PROMPT_VERSION]
+
+async def test_service_errors_are_not_cached(cached):
+    service = cached()
+    service.async_client = None
+    result = await service.averify_tax_document("Form 1040 U.S. Individual Income Tax Return")
+    assert result.form_type == "Unknown"
+    assert service.cache.stats()["entries"] == 0
@@ -0,0 +1,46 @@
+import json
+import time
+import pytest
+from app.models.responses import ValidationResult
+from app.routes import tax_routes
+
+pytestmark = pytest.mark.anyio
+
+VALIDATION = ValidationResult(is_valid=True, form_type="Form 1040", confidence=9, explanation="ok", issues="None")
+
+def ndjson(body: str) -> list:
+    """Parse newline-delimited JSON, insisting on one complete object per line"""
+    assert body.endswith("\n")
+    return [json.loads(line) for line in body[:-1].split("\n")]
+
+async def test_items_are_verified_concurrently(chatgpt):
+    service = chatgpt(delay=0.2)
+    started = time.monotonic()
+    results = [result async for result in service.verify_batch([f"Form 1040 copy {n}" for n in range(5)])]
+    assert time.monotonic() - started < 0.6
+    assert sorted(index for index, _, _ in results) == [0, 1, 2, 3, 4]
+    assert all(result.form_type == "Form 1040" and elapsed >= 0.2 for _, result, elapsed in results)
+    assert len(service.requests) == 5
+
+async def test_verify_batch_streams_one_line_per_item(api, monkeypatch):
+    async def verify_batch(items, timeout=None):
+        for position in reversed(range(len(items))):
+            yield position, VALIDATION, 0.25
+
+    monkeypatch.setattr(tax_routes.chatgpt_service, "verify_batch", verify_batch)
+    response = await api.post("/tax/verify/batch", json={"contents": ["Form 1040", "Form W-2"]})
+    assert response.status_code == 200
+    assert ndjson(response.text) == [
+        {"index": 1, "validation": VALIDATION.model_dump(), "elapsed_ms": 250.0},
+        {"index": 0, "validation": VALIDATION.model_dump(), "elapsed_ms": 250.0},
+    ]
+
+async def test_documents_without_an_analysis_get_an_error_line(api, add_document, chatgpt, monkeypatch):
+    monkeypatch.setattr(tax_routes, "chatgpt_service", chatgpt())
+    document_id = await add_document()
+    response = await api.post("/tax/verify/batch", json={"document_ids": [document_id]})
+    assert ndjson(response.text) == [{"index": 0, "document_id": document_id, "error": "No completed analysis for document"}]
+
+@pytest.mark.parametrize("body", [{}, {"contents": ["a"], "document_ids": ["b"]}, {"contents": []}])
+async def test_exactly_one_selector_is_required(api, body):
+    assert (await api.post("/tax/verify/batch", json=body)).status_code == 422
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 """
 Simple script to test Azure Document Intelligence pre-built US-Tax model.
-Usage: python tax_ping.py <pdf_file>
+Usage: python tax_ping.py [--base64] <pdf_file>
+
+By default the PDF is streamed to Azure as raw application/pdf bytes.
+--base64 sends the legacy JSON body with the file base64-encoded.
 """
 
 import os
@@ -25,39 +28,42 @@ def main():
         sys.exit("AZ_ENDPOINT or AZ_KEY env vars missing from .env file")
     
     # Check command line arguments
-    if len(sys.argv) != 2:
-        sys.exit("usage: tax_ping.py <pdf>")
+    args = sys.argv[1:]
+    use_base64 = "--base64" in args
+    args = [arg for arg in args if arg != "--base64"]
+    if len(args) != 1:
+        sys.exit("usage: tax_ping.py [--base64] <pdf>")
     
-    file_path = sys.argv[1]
+    file_path = args[0]
     
     # Check if file exists
     if not os.path.exists(file_path):
         sys.exit(f"File not found: {file_path}")
     
     try:
-        # Read and encode the PDF file
-        with open(file_path, "rb") as f:
-            pdf_content = f.read()
-            base64_content = base64.b64encode(pdf_content).decode('utf-8')
-        
         # Construct the analyze endpoint URL
         analyze_url = f"{endpoint}/documentintelligence/documentModels/prebuilt-tax.us.1040:analyze?_overload=analyzeDocument&api-version=2024-11-30"
         
-        # Set up headers
-        headers = {
-            "Ocp-Apim-Subscription-Key": key,
-            "Content-Type": "application/json"
-        }
-        
-        # Prepare the request body
-        request_body = {
-            "base64Source": base64_content
-        }
-        
         print("Submitting 1040 form for analysis...")
         
-        # Make the POST request to start analysis
-        response = requests.post(analyze_url, headers=headers, json=request_body)
+        with open(file_path, "rb") as f:
+            if use_base64:
+                # Legacy mode: whole file base64-encoded inside a JSON body
+                headers = {
+                    "Ocp-Apim-Subscription-Key": key,
+                    "Content-Type": "application/json"
+                }
+                request_body = {
+                    "base64Source": base64.b64encode(f.read()).decode('utf-8')
+                }
+                response = requests.post(analyze_url, headers=headers, json=request_body)
+            else:
+                # Raw bytes, streamed from disk by requests
+                headers = {
+                    "Ocp-Apim-Subscription-Key": key,
+                    "Content-Type": "application/pdf"
+                }
+                response = requests.post(analyze_url, headers=headers, data=f)
         
         if response.status_code == 202:
             # Get the operation location from headers